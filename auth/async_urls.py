@@ -0,0 +1,20 @@
+# Auth Async URLs
+from django.urls import path
+
+from auth import async_views
+from auth.urls import urlpatterns as sync_urlpatterns
+
+# Views with an async implementation, by URL name
+ASYNC_VIEWS = {
+    "token_obtain_pair": async_views.login,
+}
+
+# Same routes as auth.urls, served by the async views where they exist
+urlpatterns = [
+    path(
+        str(pattern.pattern),
+        ASYNC_VIEWS.get(pattern.name, pattern.callback),
+        name=pattern.name,
+    )
+    for pattern in sync_urlpatterns
+]
@@ -0,0 +1,78 @@
+# Auth Async Views
+import json
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import update_last_login
+from django.http import JsonResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from rest_framework import status
+from rest_framework_simplejwt.settings import api_settings
+
+from auth.backends import aauthenticate
+from auth.hashers import HashingBusy
+from auth.serializers import LoginSerializer
+
+
+def parse_credentials(request):
+    """
+    Username and password of a JSON or form login request
+
+    Returns:
+        tuple: (credentials, JsonResponse error or None)
+    """
+    if request.content_type == "application/json":
+        try:
+            data = json.loads(request.body)
+        except ValueError:
+            data = None
+        if not isinstance(data, dict):
+            return None, JsonResponse(
+                {"detail": "JSON parse error."}, status=status.HTTP_400_BAD_REQUEST
+            )
+    else:
+        data = request.POST
+    credentials = {field: data.get(field) for field in ("username", "password")}
+    errors = {
+        field: ["This field is required."]
+        for field, value in credentials.items()
+        if not isinstance(value, str) or not value
+    }
+    if errors:
+        return None, JsonResponse(errors, status=status.HTTP_400_BAD_REQUEST)
+    return credentials, None
+
+
+@csrf_exempt
+@require_POST
+async def login(request):
+    """
+    Async version of auth.views.LoginView
+
+    The password is checked in the hashing pool without holding a thread,
+    so a burst of logins doesn't queue the sync views of an ASGI server
+    behind its hashes.
+
+    Args:
+        request : username and password
+
+    Returns:
+        JSON: refresh, access
+    """
+    credentials, error = parse_credentials(request)
+    if error:
+        return error
+    try:
+        user = await aauthenticate(request, **credentials)
+    except HashingBusy as e:
+        return JsonResponse({"detail": str(e.detail)}, status=e.status_code)
+    if not api_settings.USER_AUTHENTICATION_RULE(user):
+        return JsonResponse(
+            {"detail": "No active account found with the given credentials"},
+            status=status.HTTP_401_UNAUTHORIZED,
+        )
+
+    refresh = LoginSerializer.get_token(user)
+    if api_settings.UPDATE_LAST_LOGIN:
+        await sync_to_async(update_last_login)(None, user)
+    return JsonResponse({"refresh": str(refresh), "access": str(refresh.access_token)})
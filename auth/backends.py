@@ -0,0 +1,91 @@
+# Auth Backends
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model, load_backend
+from django.contrib.auth.backends import ModelBackend
+
+from auth.hashers import (
+    amake_password,
+    averify_password,
+    make_password,
+    verify_password,
+)
+
+UserModel = get_user_model()
+
+
+class PooledModelBackend(ModelBackend):
+    """
+    ModelBackend verifying passwords in the hashing pool, see auth.hashers
+
+    Passwords hashed with another hasher or other parameters than the
+    preferred ones are rehashed on a successful login, like
+    User.check_password does.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = UserModel._default_manager.get_by_natural_key(username)
+        except UserModel.DoesNotExist:
+            # Take as long as for an existing user, so usernames can't be
+            # found by timing (Django #20760)
+            make_password(password)
+            return None
+
+        is_correct, rehashed = verify_password(password, user.password)
+        if not is_correct or not self.user_can_authenticate(user):
+            return None
+        if rehashed is not None:
+            user.password = rehashed
+            UserModel._default_manager.filter(pk=user.pk).update(password=rehashed)
+        return user
+
+    async def aauthenticate(self, request, username=None, password=None, **kwargs):
+        """
+        Async version of authenticate, awaiting the hashing pool
+        """
+        if username is None:
+            username = kwargs.get(UserModel.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = await UserModel._default_manager.aget(
+                **{UserModel.USERNAME_FIELD: username}
+            )
+        except UserModel.DoesNotExist:
+            await amake_password(password)
+            return None
+
+        is_correct, rehashed = await averify_password(password, user.password)
+        if not is_correct or not self.user_can_authenticate(user):
+            return None
+        if rehashed is not None:
+            user.password = rehashed
+            await UserModel._default_manager.filter(pk=user.pk).aupdate(
+                password=rehashed
+            )
+        return user
+
+
+async def aauthenticate(request, **credentials):
+    """
+    authenticate() for coroutines: backends with an aauthenticate method are
+    awaited, the others run in a worker thread
+
+    Returns:
+        User: the authenticated user, or None
+    """
+    for path in settings.AUTHENTICATION_BACKENDS:
+        backend = load_backend(path)
+        if hasattr(backend, "aauthenticate"):
+            user = await backend.aauthenticate(request, **credentials)
+        else:
+            user = await sync_to_async(backend.authenticate)(request, **credentials)
+        if user is not None:
+            user.backend = path
+            return user
+    return None
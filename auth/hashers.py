@@ -0,0 +1,224 @@
+# Auth Password hashing
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import django
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import hashers
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class TunedScryptPasswordHasher(hashers.ScryptPasswordHasher):
+    """
+    scrypt with the AUTH_SCRYPT_* parameters of the settings
+
+    Hashes made with other parameters are rehashed on the next login.
+    """
+
+    work_factor = settings.AUTH_SCRYPT_WORK_FACTOR
+    block_size = settings.AUTH_SCRYPT_BLOCK_SIZE
+    parallelism = settings.AUTH_SCRYPT_PARALLELISM
+
+
+class TunedArgon2PasswordHasher(hashers.Argon2PasswordHasher):
+    """
+    Argon2id with the AUTH_ARGON2_* parameters of the settings, needs
+    argon2-cffi (pip install argon2-cffi)
+
+    Hashes made with other parameters are rehashed on the next login.
+    """
+
+    time_cost = settings.AUTH_ARGON2_TIME_COST
+    memory_cost = settings.AUTH_ARGON2_MEMORY_COST
+    parallelism = settings.AUTH_ARGON2_PARALLELISM
+
+
+class HashingBusy(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "Too many logins in progress, try again shortly."
+    default_code = "hashing_busy"
+
+
+def configure(password_hashers):
+    """
+    Use the hashers of the web process in a pool worker, they may differ
+    from the settings module (e.g. override_settings)
+    """
+    password_hashers = list(password_hashers)
+    if settings.PASSWORD_HASHERS != password_hashers:
+        settings.PASSWORD_HASHERS = password_hashers
+        hashers.get_hashers.cache_clear()
+        hashers.get_hashers_by_algorithm.cache_clear()
+
+
+def run_verify(password_hashers, password, encoded):
+    """
+    Check a password and, if it must be rehashed, hash it with the preferred
+    hasher, in a pool worker
+
+    Returns:
+        tuple: (whether the password is correct, new encoded password or None)
+    """
+    configure(password_hashers)
+    is_correct, must_update = hashers.verify_password(password, encoded)
+    if is_correct and must_update:
+        return True, hashers.make_password(password)
+    return is_correct, None
+
+
+def run_make(password_hashers, password):
+    """
+    Hash a password with the preferred hasher, in a pool worker
+    """
+    configure(password_hashers)
+    return hashers.make_password(password)
+
+
+class HashingPool:
+    """
+    Process pool hashing passwords off the request workers
+
+    At most AUTH_PASSWORD_WORKERS passwords are hashed at once, so a burst
+    of logins uses that many cores and leaves the others to the rest of
+    the site, and the GIL of the web process is never held by a hasher.
+    AUTH_PASSWORD_QUEUE more requests may wait for a worker; beyond that,
+    they wait up to AUTH_PASSWORD_QUEUE_TIMEOUT seconds for a slot and then
+    fail with HashingBusy (503). With AUTH_PASSWORD_WORKERS = 0 passwords
+    are hashed inline.
+
+    Workers are spawned, not forked, so the pool is safe to start from a
+    threaded server; the pool of a forked web process is started anew.
+
+    run blocks its thread until the hash is ready. Under ASGI, sync views
+    share one thread, so async views (see auth.async_views) use arun,
+    which awaits the worker instead.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.executor = None
+        self.slots = None
+        self.pid = None
+
+    def get_executor(self):
+        with self.lock:
+            if self.executor is None or self.pid != os.getpid():
+                workers = settings.AUTH_PASSWORD_WORKERS
+                self.executor = ProcessPoolExecutor(
+                    workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=django.setup,
+                )
+                self.slots = threading.BoundedSemaphore(
+                    workers + settings.AUTH_PASSWORD_QUEUE
+                )
+                self.pid = os.getpid()
+            return self.executor, self.slots
+
+    def run(self, func, *args):
+        """
+        Run func(PASSWORD_HASHERS, *args) in a worker and return its result
+
+        Raises:
+            HashingBusy: if no slot frees up in time
+        """
+        if not settings.AUTH_PASSWORD_WORKERS:
+            return func(settings.PASSWORD_HASHERS, *args)
+        executor, slots = self.get_executor()
+        if not slots.acquire(timeout=settings.AUTH_PASSWORD_QUEUE_TIMEOUT):
+            raise HashingBusy()
+        try:
+            return executor.submit(func, settings.PASSWORD_HASHERS, *args).result()
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for memory): start a new pool
+            self.shutdown(executor)
+            raise
+        finally:
+            slots.release()
+
+    async def arun(self, func, *args):
+        """
+        Async version of run, awaiting the worker without holding a thread
+
+        Raises:
+            HashingBusy: if no slot frees up in time
+        """
+        if not settings.AUTH_PASSWORD_WORKERS:
+            hash_inline = sync_to_async(func, thread_sensitive=False)
+            return await hash_inline(settings.PASSWORD_HASHERS, *args)
+        executor, slots = self.get_executor()
+        if not slots.acquire(blocking=False):
+            acquire = sync_to_async(slots.acquire, thread_sensitive=False)
+            if not await acquire(timeout=settings.AUTH_PASSWORD_QUEUE_TIMEOUT):
+                raise HashingBusy()
+        try:
+            future = executor.submit(func, settings.PASSWORD_HASHERS, *args)
+            return await asyncio.wrap_future(future)
+        except BrokenProcessPool:
+            self.shutdown(executor)
+            raise
+        finally:
+            slots.release()
+
+    def shutdown(self, executor=None):
+        """
+        Stop the workers, the next call starts a new pool
+
+        Args:
+            executor: only stop the pool if it is still this executor
+        """
+        with self.lock:
+            if self.executor is None or executor not in (None, self.executor):
+                return
+            if self.pid == os.getpid():
+                self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+
+pool = HashingPool()
+
+
+def verify_password(password, encoded):
+    """
+    Check a password against its encoded hash in the hashing pool
+
+    Args:
+        password (str): raw password
+        encoded (str): hash stored for the user
+
+    Returns:
+        tuple: (whether the password is correct, new hash if it must be
+            rehashed with the preferred hasher, else None)
+    """
+    if password is None or not hashers.is_password_usable(encoded):
+        return False, None
+    return pool.run(run_verify, password, encoded)
+
+
+def make_password(password):
+    """
+    Hash a password with the preferred hasher in the hashing pool
+    """
+    return pool.run(run_make, password)
+
+
+async def averify_password(password, encoded):
+    """
+    Async version of verify_password
+    """
+    if password is None or not hashers.is_password_usable(encoded):
+        return False, None
+    return await pool.arun(run_verify, password, encoded)
+
+
+async def amake_password(password):
+    """
+    Async version of make_password
+    """
+    return await pool.arun(run_make, password)
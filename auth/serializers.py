@@ -2,19 +2,20 @@
 
 from django.contrib.auth.models import User
 from django.contrib.auth.password_validation import validate_password
+from django.db import IntegrityError, transaction
 from rest_framework import serializers
-from rest_framework.validators import UniqueValidator
 from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
 
+from auth.hashers import make_password
+from auth.users import email_exists
+
 
 class SignupSerializer(serializers.ModelSerializer):
     """
     SignupSerializer class
     """
 
-    email = serializers.EmailField(
-        required=True, validators=[UniqueValidator(queryset=User.objects.all())]
-    )
+    email = serializers.EmailField(required=True)
 
     password = serializers.CharField(
         write_only=True, required=True, validators=[validate_password]
@@ -36,6 +37,14 @@ class SignupSerializer(serializers.ModelSerializer):
             "last_name": {"required": True},
         }
 
+    def validate_email(self, value):
+        """
+        Validate that no user has the email, ignoring case
+        """
+        if email_exists(value):
+            raise serializers.ValidationError("This field must be unique.")
+        return value
+
     def validate(self, attrs):
         """
         Validate is both password matches
@@ -51,15 +60,22 @@ class SignupSerializer(serializers.ModelSerializer):
         """
         Create a new user.
         """
-        user = User.objects.create(
-            username=validated_data["username"],
-            email=validated_data["email"],
-            first_name=validated_data["first_name"],
-            last_name=validated_data["last_name"],
-        )
-
-        user.set_password(validated_data["password"])
-        user.save()
+        # Hashed in the hashing pool, see auth.hashers
+        password = make_password(validated_data["password"])
+        try:
+            with transaction.atomic():
+                user = User.objects.create(
+                    username=validated_data["username"],
+                    email=validated_data["email"],
+                    first_name=validated_data["first_name"],
+                    last_name=validated_data["last_name"],
+                    password=password,
+                )
+        except IntegrityError:
+            # A concurrent signup took the username or the email since
+            # they were validated
+            field = "email" if email_exists(validated_data["email"]) else "username"
+            raise serializers.ValidationError({field: ["This field must be unique."]})
 
         return user
 
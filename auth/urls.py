@@ -2,10 +2,11 @@
 from django.urls import path
 from rest_framework_simplejwt.views import TokenRefreshView
 
-from auth.views import LoginView, SignupView, get_health
+from auth.views import LoginView, ProvisionUsersView, SignupView, get_health
 
 urlpatterns = [
     path("login/", LoginView.as_view(), name="token_obtain_pair"),
     path("signup/", SignupView.as_view(), name="auth_register"),
+    path("users/bulk/", ProvisionUsersView.as_view(), name="provision_users"),
     path("healthcheck/", get_health, name="healthcheck"),
 ]
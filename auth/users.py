@@ -0,0 +1,215 @@
+# Auth Users
+import string
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.contrib.auth.models import User
+from django.contrib.auth.password_validation import validate_password
+from django.contrib.auth.validators import UnicodeUsernameValidator
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import IntegrityError, connections, router, transaction
+
+from auth.hashers import make_password
+
+# Case-insensitive unique index of auth_user.email, created by the notes
+# migration 0012_user_email_ci_unique: this package is not an installed app
+# (its label would clash with django.contrib.auth), so it has no
+# migrations of its own. Empty emails are not indexed.
+EMAIL_INDEX = "auth_user_email_ci_uniq"
+
+validate_username = UnicodeUsernameValidator()
+
+ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+
+def lower_email(email, using):
+    """
+    Email lowercased like LOWER() of the database, as compared by
+    EMAIL_INDEX: SQLite only lowercases ASCII letters
+    """
+    if connections[using].vendor == "sqlite":
+        return email.translate(ASCII_LOWER)
+    return email.lower()
+
+
+def taken_emails(emails):
+    """
+    Emails of a list that a user already has, ignoring case
+
+    The condition is spelled exactly like the predicate of EMAIL_INDEX so
+    the partial index is used instead of a table scan. It runs on the
+    primary: a lagging replica would let duplicates through.
+
+    Args:
+        emails (list): emails to look up
+
+    Returns:
+        set: the taken emails, as lowercased by the database, see lower_email
+    """
+    if not emails:
+        return set()
+    table = User._meta.db_table
+    placeholders = ", ".join(["LOWER(%s)"] * len(emails))
+    connection = connections[router.db_for_write(User)]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT LOWER(email) FROM {table} "
+            f"WHERE LOWER(email) IN ({placeholders}) AND email <> ''",
+            list(emails),
+        )
+        return {email for (email,) in cursor.fetchall()}
+
+
+def email_exists(email):
+    """
+    Whether a user has this email, ignoring case
+    """
+    return bool(taken_emails([email]))
+
+
+def validate_row(row):
+    """
+    Check a user to provision
+
+    Args:
+        row (dict): username, email, and optional first_name, last_name
+            and password (users without one cannot log in until it is set)
+
+    Returns:
+        dict: errors by field, empty if the row is valid
+    """
+    if not isinstance(row, dict):
+        return {"row": ["Must be an object."]}
+    errors = {}
+    username = row.get("username")
+    if not isinstance(username, str) or not username:
+        errors["username"] = ["This field is required."]
+    elif len(username) > 150:
+        errors["username"] = ["Ensure this field has no more than 150 characters."]
+    else:
+        try:
+            validate_username(username)
+        except ValidationError as e:
+            errors["username"] = e.messages
+    email = row.get("email")
+    if not isinstance(email, str) or not email:
+        errors["email"] = ["This field is required."]
+    else:
+        try:
+            validate_email(email)
+        except ValidationError as e:
+            errors["email"] = e.messages
+    for field in ("first_name", "last_name"):
+        value = row.get(field, "")
+        if not isinstance(value, str) or len(value) > 150:
+            errors[field] = ["Must be a string of at most 150 characters."]
+    password = row.get("password")
+    if password is not None:
+        try:
+            if not isinstance(password, str):
+                raise ValidationError("Must be a string.")
+            validate_password(password, User(username=username, email=email))
+        except ValidationError as e:
+            errors["password"] = e.messages
+    return errors
+
+
+def hash_password(password):
+    """
+    Hash a password in the hashing pool, None gives an unusable password
+    """
+    if password is None:
+        return hashers.make_password(None)
+    return make_password(password)
+
+
+def provision_users(rows, batch_size=500, workers=None):
+    """
+    Create many users, batch_size per INSERT
+
+    Rows are validated first, duplicates (of another row or of an existing
+    user, emails ignoring case) are skipped, then passwords are hashed once
+    each, workers at a time in the hashing pool, and every batch is
+    inserted with bulk_create in its own transaction.
+
+    Args:
+        rows (list): users, see validate_row
+        batch_size (int): users per INSERT
+        workers (int, optional): passwords hashed at once, defaults to
+            AUTH_PASSWORD_WORKERS; fewer leave pool workers to logins
+
+    Yields:
+        dict: running totals of created users, and of skipped and invalid
+            rows with their index and reason
+    """
+    totals = {"created": 0, "skipped": [], "invalid": []}
+    using = router.db_for_write(User)
+    valid, usernames, emails = [], set(), set()
+    for index, row in enumerate(rows):
+        errors = validate_row(row)
+        if errors:
+            totals["invalid"].append({"row": index, "errors": errors})
+            continue
+        email = lower_email(row["email"], using)
+        if row["username"] in usernames or email in emails:
+            totals["skipped"].append({"row": index, "reason": "duplicate row"})
+        else:
+            usernames.add(row["username"])
+            emails.add(email)
+            valid.append((index, row))
+
+    if workers is None:
+        workers = settings.AUTH_PASSWORD_WORKERS
+    workers = max(workers, 1)
+    with ThreadPoolExecutor(workers) as executor:
+        for offset in range(0, len(valid), batch_size):
+            batch = valid[offset : offset + batch_size]
+            taken = set(
+                User.objects.using(using)
+                .filter(username__in=[row["username"] for _, row in batch])
+                .values_list("username", flat=True)
+            )
+            taken_lower = taken_emails([row["email"] for _, row in batch])
+            new = []
+            for index, row in batch:
+                if row["username"] in taken:
+                    totals["skipped"].append(
+                        {"row": index, "reason": "username exists"}
+                    )
+                elif lower_email(row["email"], using) in taken_lower:
+                    totals["skipped"].append({"row": index, "reason": "email exists"})
+                else:
+                    new.append((index, row))
+
+            passwords = executor.map(
+                hash_password, [row.get("password") for _, row in new]
+            )
+            users = [
+                User(
+                    username=row["username"],
+                    email=row["email"],
+                    first_name=row.get("first_name", ""),
+                    last_name=row.get("last_name", ""),
+                    password=password,
+                )
+                for (_, row), password in zip(new, passwords)
+            ]
+            try:
+                with transaction.atomic(using=using):
+                    User.objects.bulk_create(users)
+                totals["created"] += len(users)
+            except IntegrityError:
+                # Taken by a concurrent signup since the check: insert the
+                # batch one user at a time to skip only the conflicts
+                for (index, _), user in zip(new, users):
+                    try:
+                        with transaction.atomic(using=using):
+                            user.save(force_insert=True)
+                        totals["created"] += 1
+                    except IntegrityError:
+                        totals["skipped"].append({"row": index, "reason": "conflict"})
+            yield totals
+    if not valid:
+        yield totals
@@ -1,11 +1,15 @@
 # Auth Views
+from django.conf import settings
 from django.contrib.auth.models import User
 from django.http import JsonResponse
-from rest_framework import generics
-from rest_framework.permissions import AllowAny
+from rest_framework import generics, status
+from rest_framework.permissions import AllowAny, IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
 from rest_framework_simplejwt.views import TokenObtainPairView
 
 from .serializers import LoginSerializer, SignupSerializer
+from .users import provision_users
 
 
 class LoginView(TokenObtainPairView):
@@ -27,6 +31,54 @@ class SignupView(generics.CreateAPIView):
     serializer_class = SignupSerializer
 
 
+class ProvisionUsersView(APIView):
+    """
+    ProvisionUsersView class
+
+    Create a few users in one request (admin only), see
+    auth.users.provision_users. The body is {"users": [...]} with up to
+    AUTH_PROVISION_MAX_USERS users, and an optional batch_size.
+
+    Passwords are hashed one at a time, so logins keep the other workers of
+    the hashing pool; larger imports use `manage.py provision_users`.
+    """
+
+    permission_classes = (IsAdminUser,)
+
+    def post(self, request):
+        if not isinstance(request.data, dict):
+            return Response(
+                {"non_field_errors": ["Expected an object."]},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        rows = request.data.get("users")
+        batch_size = request.data.get("batch_size", 500)
+        if not isinstance(rows, list) or not rows:
+            return Response(
+                {"users": ["A non-empty list is required."]},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if len(rows) > settings.AUTH_PROVISION_MAX_USERS:
+            return Response(
+                {
+                    "users": [
+                        "Ensure this field has no more than "
+                        f"{settings.AUTH_PROVISION_MAX_USERS} elements."
+                    ]
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        if not isinstance(batch_size, int) or batch_size < 1:
+            return Response(
+                {"batch_size": ["A positive integer is required."]},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        for totals in provision_users(rows, batch_size, workers=1):
+            pass
+        return Response(totals, status=status.HTTP_201_CREATED)
+
+
 def get_health(request):
     """
     HealthCheck request
@@ -12,5 +12,18 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "note_taking_app.settings")
+# Serve the notes API and logins with their async views under ASGI
+os.environ.setdefault("NOTES_ASYNC_VIEWS", "1")
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from notes.collab import websocket_application  # noqa: E402 (needs setup)
+
+
+async def application(scope, receive, send):
+    """
+    Serve WebSocket connections (collaborative editing) next to Django
+    """
+    if scope["type"] == "websocket":
+        return await websocket_application(scope, receive, send)
+    return await django_application(scope, receive, send)
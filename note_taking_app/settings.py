@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -41,11 +42,15 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "notes.metrics.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "notes.authentication.JWTAuthenticationMiddleware",
+    "notes.routers.PrimaryPinningMiddleware",
+    "notes.profiling.ProfilingMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -73,14 +78,132 @@ WSGI_APPLICATION = "note_taking_app.wsgi.application"
 
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
+# DB_ENGINE selects sqlite (default) or postgresql. Connections are kept
+# for DB_CONN_MAX_AGE seconds and checked before reuse. Set DB_PGBOUNCER=1
+# when PostgreSQL is reached through PgBouncer in transaction pooling mode.
+
+DB_ENGINE = os.environ.get("DB_ENGINE", "sqlite")
+
+DB_CONN_MAX_AGE = int(os.environ.get("DB_CONN_MAX_AGE", 60))
+
+if DB_ENGINE == "postgresql":
+    DATABASES = {
+        "default": {
+            "ENGINE": "django.db.backends.postgresql",
+            "NAME": os.environ.get("DB_NAME", "notes"),
+            "USER": os.environ.get("DB_USER", "notes"),
+            "PASSWORD": os.environ.get("DB_PASSWORD", ""),
+            "HOST": os.environ.get("DB_HOST", "127.0.0.1"),
+            "PORT": os.environ.get("DB_PORT", "5432"),
+            "CONN_MAX_AGE": DB_CONN_MAX_AGE,
+            "CONN_HEALTH_CHECKS": True,
+            "DISABLE_SERVER_SIDE_CURSORS": os.environ.get("DB_PGBOUNCER") == "1",
+            "OPTIONS": {"connect_timeout": 5},
+        }
+    }
+else:
+    DATABASES = {
+        "default": {
+            # SQLite with per-connection PRAGMAs, see notes/backends/sqlite3
+            "ENGINE": "notes.backends.sqlite3",
+            "NAME": os.environ.get("DB_NAME", BASE_DIR / "db.sqlite3"),
+            "CONN_MAX_AGE": DB_CONN_MAX_AGE,
+            "CONN_HEALTH_CHECKS": True,
+            "OPTIONS": {
+                # Seconds a writer waits for the database lock (busy timeout)
+                "timeout": int(os.environ.get("DB_BUSY_TIMEOUT", 20)),
+                "transaction_mode": os.environ.get(
+                    "DB_SQLITE_TRANSACTION_MODE", "IMMEDIATE"
+                ),
+                # WAL lets readers run while a write is in progress,
+                # synchronous=NORMAL only syncs at WAL checkpoints
+                "pragmas": {
+                    "journal_mode": os.environ.get("DB_SQLITE_JOURNAL_MODE", "WAL"),
+                    "synchronous": os.environ.get("DB_SQLITE_SYNCHRONOUS", "NORMAL"),
+                },
+            },
+        }
+    }
 
-DATABASES = {
-    "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+# Read replicas
+# DB_REPLICAS is a comma separated list of replica hosts (PostgreSQL) or
+# files (SQLite), used for notes reads of read-only requests. Users who
+# wrote stay on the primary for NOTES_REPLICA_STICKY_SECONDS.
+
+NOTES_DATABASE_REPLICAS = []
+
+for index, replica in enumerate(
+    filter(None, os.environ.get("DB_REPLICAS", "").split(","))
+):
+    alias = f"replica{index}"
+    DATABASES[alias] = {
+        **DATABASES["default"],
+        "HOST" if DB_ENGINE == "postgresql" else "NAME": replica,
+        "TEST": {"MIRROR": "default"},
     }
+    NOTES_DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ["notes.routers.ReplicaRouter"]
+
+NOTES_REPLICA_STICKY_SECONDS = int(os.environ.get("NOTES_REPLICA_STICKY_SECONDS", 10))
+
+
+# Password hashing
+# https://docs.djangoproject.com/en/5.0/topics/auth/passwords/
+# AUTH_PASSWORD_PROFILE picks the preferred hasher: pbkdf2 (Django's
+# default), scrypt, or argon2 (pip install argon2-cffi). Every profile can
+# check the others' hashes, which are rehashed on the next login.
+
+AUTH_PASSWORD_PROFILE = os.environ.get("AUTH_PASSWORD_PROFILE", "pbkdf2")
+
+AUTH_SCRYPT_WORK_FACTOR = int(os.environ.get("AUTH_SCRYPT_WORK_FACTOR", 2**14))
+
+AUTH_SCRYPT_BLOCK_SIZE = int(os.environ.get("AUTH_SCRYPT_BLOCK_SIZE", 8))
+
+AUTH_SCRYPT_PARALLELISM = int(os.environ.get("AUTH_SCRYPT_PARALLELISM", 1))
+
+AUTH_ARGON2_TIME_COST = int(os.environ.get("AUTH_ARGON2_TIME_COST", 2))
+
+# KiB
+AUTH_ARGON2_MEMORY_COST = int(os.environ.get("AUTH_ARGON2_MEMORY_COST", 102400))
+
+AUTH_ARGON2_PARALLELISM = int(os.environ.get("AUTH_ARGON2_PARALLELISM", 8))
+
+PASSWORD_HASHER_PROFILES = {
+    "pbkdf2": "django.contrib.auth.hashers.PBKDF2PasswordHasher",
+    "scrypt": "auth.hashers.TunedScryptPasswordHasher",
+    "argon2": "auth.hashers.TunedArgon2PasswordHasher",
 }
 
+PASSWORD_HASHERS = [
+    PASSWORD_HASHER_PROFILES[AUTH_PASSWORD_PROFILE],
+    *(
+        hasher
+        for profile, hasher in PASSWORD_HASHER_PROFILES.items()
+        if profile != AUTH_PASSWORD_PROFILE
+    ),
+    "django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher",
+]
+
+# Passwords are hashed and checked by a pool of this many processes, off
+# the request workers (auth.hashers.HashingPool), 0 hashes them inline.
+# AUTH_PASSWORD_QUEUE more logins wait for a worker, further ones wait up
+# to AUTH_PASSWORD_QUEUE_TIMEOUT seconds for a slot and then get a 503.
+
+AUTH_PASSWORD_WORKERS = int(os.environ.get("AUTH_PASSWORD_WORKERS", 2))
+
+AUTH_PASSWORD_QUEUE = int(os.environ.get("AUTH_PASSWORD_QUEUE", 64))
+
+AUTH_PASSWORD_QUEUE_TIMEOUT = 10
+
+AUTHENTICATION_BACKENDS = ["auth.backends.PooledModelBackend"]
+
+# Users created per request of the admin provisioning API. Their passwords
+# are hashed one at a time (about 0.3 s each with pbkdf2), so a request
+# stays within proxy timeouts; larger onboardings use
+# `manage.py provision_users`.
+AUTH_PROVISION_MAX_USERS = 25
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -122,3 +245,169 @@ STATIC_URL = "static/"
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
+
+
+# Caches
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+# Set NOTES_CACHE_URL (e.g. redis://127.0.0.1:6379/0) to share the notes
+# cache between processes, a per-process locmem cache is used otherwise.
+
+NOTES_CACHE_URL = os.environ.get("NOTES_CACHE_URL")
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+    "notes": (
+        {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": NOTES_CACHE_URL,
+        }
+        if NOTES_CACHE_URL
+        else {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "notes",
+        }
+    ),
+}
+
+# Note GETs are served from the notes cache when the timeout is above 0
+
+NOTES_CACHE_ALIAS = "notes"
+
+NOTES_CACHE_TIMEOUT = int(os.environ.get("NOTES_CACHE_TIMEOUT", 0))
+
+
+# Notes history storage
+# Versions are stored as deltas against the previous version, with a full
+# content keyframe every NOTES_HISTORY_KEYFRAME_INTERVAL versions.
+
+NOTES_HISTORY_DELTA = True
+
+NOTES_HISTORY_KEYFRAME_INTERVAL = 20
+
+# Store new versions as keyframes and encode their delta in a background
+# task (notes.history.encode_update), off the request path
+NOTES_HISTORY_DEFER_DELTA = os.environ.get("NOTES_HISTORY_DEFER_DELTA") == "1"
+
+# Retention applied by `manage.py compact_history`: (max age in days, bucket
+# in seconds) tiers. Versions are kept if their bucket is None, otherwise
+# only the latest version of each bucket is: every version for 7 days, one
+# per hour up to 30 days, one per day beyond.
+NOTES_HISTORY_RETENTION = [
+    (7, None),
+    (30, 3600),
+    (None, 86400),
+]
+
+
+# Notes permission cache
+# (user, note) access levels are cached in a per-process LRU and in the
+# NOTES_PERMISSION_CACHE_ALIAS cache when the timeout is above 0.
+
+NOTES_PERMISSION_CACHE_TIMEOUT = int(
+    os.environ.get("NOTES_PERMISSION_CACHE_TIMEOUT", 0)
+)
+
+NOTES_PERMISSION_CACHE_ALIAS = "notes"
+
+NOTES_PERMISSION_LOCAL_CACHE_SIZE = 4096
+
+NOTES_PERMISSION_LOCAL_CACHE_TTL = 5
+
+
+# Notes search
+# Dotted path of a notes.search.SearchBackend subclass, picked from the
+# database vendor when None (SQLite FTS5, PostgreSQL full text search, LIKE
+# queries elsewhere).
+
+NOTES_SEARCH_BACKEND = None
+
+
+# Notes async views
+# Serve the notes routes and logins with their async views (notes.async_urls,
+# auth.async_urls), enabled by default in the ASGI profile
+# (note_taking_app/asgi.py).
+
+NOTES_ASYNC_VIEWS = os.environ.get("NOTES_ASYNC_VIEWS") == "1"
+
+
+# Notes JWT authentication
+# Requests with a bearer access token are authenticated from its claims.
+# When stateless, read requests use the claims alone and never load the
+# user row: a deactivated user keeps read access until the token expires.
+
+NOTES_JWT_STATELESS = os.environ.get("NOTES_JWT_STATELESS") == "1"
+
+
+# Notes collaborative editing
+# Live sessions are saved as a new note version this many seconds after the
+# last edit, and at least every NOTES_COLLAB_CHECKPOINT_MAX_DELAY seconds.
+
+NOTES_COLLAB_CHECKPOINT_DELAY = 5
+
+NOTES_COLLAB_CHECKPOINT_MAX_DELAY = 30
+
+# Operations kept per session to merge edits made against older revisions
+NOTES_COLLAB_HISTORY_SIZE = 1000
+
+
+# Notes change feed
+# Long polls and event streams check the change log every
+# NOTES_CHANGES_POLL_INTERVAL seconds.
+
+NOTES_CHANGES_POLL_INTERVAL = 1
+
+NOTES_CHANGES_MAX_WAIT = 30
+
+NOTES_CHANGES_HEARTBEAT = 15
+
+# Changes are served this many seconds after they are logged, so a cursor
+# never moves past a change whose transaction has not committed yet (ids
+# are assigned at INSERT on PostgreSQL). Keep it above the longest write
+# transaction. SQLite serializes writers and needs none.
+NOTES_CHANGES_SETTLE_TIME = 2 if DB_ENGINE == "postgresql" else 0
+
+# Days the change log is kept, pruned by `manage.py compact_history`.
+# Clients with an older cursor get a 410 and sync from scratch.
+NOTES_CHANGES_RETENTION = 30
+
+
+# Notes background tasks
+# Dotted path of the notes.tasks backend running post-write work:
+# ThreadPoolBackend runs tasks in threads of the web process (development
+# and tests), DatabaseBackend queues them for `manage.py run_tasks` workers.
+NOTES_TASKS_BACKEND = os.environ.get(
+    "NOTES_TASKS_BACKEND", "notes.tasks.ThreadPoolBackend"
+)
+
+NOTES_TASKS_THREADS = int(os.environ.get("NOTES_TASKS_THREADS", 4))
+
+# Seconds after which a job left running by a dead worker is run again
+NOTES_TASKS_TIMEOUT = int(os.environ.get("NOTES_TASKS_TIMEOUT", 300))
+
+
+# Notes metrics
+# Request metrics are served in the Prometheus text format on /metrics.
+# With several worker processes, set NOTES_METRICS_DIR to a directory they
+# share (emptied on deploy): each worker writes its samples there every
+# NOTES_METRICS_FLUSH_INTERVAL seconds and scrapes add them up.
+
+NOTES_METRICS_DIR = os.environ.get("NOTES_METRICS_DIR")
+
+NOTES_METRICS_FLUSH_INTERVAL = 1
+
+
+# Notes request profiling
+# Single requests are profiled when they carry a signed X-Notes-Profile
+# header (`manage.py profile_token`) or, for staff users, the profile query
+# parameter. Profiles are stored in the database, the latest
+# NOTES_PROFILE_KEEP are kept.
+
+NOTES_PROFILE_TOKEN_MAX_AGE = 3600
+
+NOTES_PROFILE_SAMPLE_INTERVAL = 0.005
+
+NOTES_PROFILE_KEEP = 100
+
+NOTES_PROFILE_MAX_QUERIES = 1000
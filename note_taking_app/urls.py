@@ -15,10 +15,20 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 
+from django.conf import settings
 from django.contrib import admin
 from django.urls import include, path
 
+from notes.views import get_metrics
+
 urlpatterns = [
-    path("", include("auth.urls")),
-    path("notes/", include("notes.urls")),
+    path(
+        "",
+        include("auth.async_urls" if settings.NOTES_ASYNC_VIEWS else "auth.urls"),
+    ),
+    path("metrics", get_metrics, name="metrics"),
+    path(
+        "notes/",
+        include("notes.async_urls" if settings.NOTES_ASYNC_VIEWS else "notes.urls"),
+    ),
 ]
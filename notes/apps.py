@@ -1,6 +1,23 @@
 from django.apps import AppConfig
+from django.core import checks
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, pre_delete
 
 
 class NotesConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "notes"
+
+    def ready(self):
+        from notes import metrics, profiling
+        from notes.blobs import collect_note_blobs, release_note_blobs
+        from notes.changes import record_deletion
+        from notes.models import Note
+        from notes.search import check_search_index
+
+        pre_delete.connect(record_deletion, sender=Note)
+        pre_delete.connect(collect_note_blobs, sender=Note)
+        post_delete.connect(release_note_blobs, sender=Note)
+        connection_created.connect(metrics.install_query_wrapper)
+        connection_created.connect(profiling.install_query_wrapper)
+        checks.register(check_search_index, checks.Tags.database)
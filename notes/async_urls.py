@@ -0,0 +1,28 @@
+# Notes Async URLs
+from django.urls import path
+
+from notes import async_views
+from notes.urls import urlpatterns as sync_urlpatterns
+
+# Views with an async implementation, by URL name
+ASYNC_VIEWS = {
+    "create_note": async_views.create_note,
+    "get_or_update_note": async_views.get_or_update_note,
+    "share_note": async_views.share_note,
+    "get_note_history": async_views.get_note_history,
+    "get_note_version": async_views.get_note_version,
+}
+
+# Same routes as notes.urls, served by the async views where they exist
+urlpatterns = [
+    path(
+        str(pattern.pattern),
+        ASYNC_VIEWS.get(pattern.name, pattern.callback),
+        name=pattern.name,
+    )
+    for pattern in sync_urlpatterns
+] + [
+    # Endless responses, only served under ASGI: WSGI servers would read
+    # the whole stream before sending anything
+    path("notes/changes/stream/", async_views.stream_changes, name="stream_changes"),
+]
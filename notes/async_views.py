@@ -0,0 +1,350 @@
+# Notes Async Views
+import asyncio
+import functools
+import json
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.views import redirect_to_login
+from django.core.handlers.asgi import ASGIRequest
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
+from rest_framework import status
+
+from notes.cache import aget_note_data
+from notes.changes import acursor_expired, aget_changes, aget_head
+from notes.history import (
+    aget_history_page,
+    aget_version,
+    commit_version,
+    create_with_history,
+)
+from notes.models import Note
+from notes.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from notes.permissions import CAN_GET, CAN_READ, CAN_SHARE, CAN_WRITE, aget_access
+from notes.sharing import ashare_with
+from notes.validators import validate_content, validate_title
+from notes.views import (
+    access_error,
+    expired_error,
+    note_response,
+    parse_history,
+    parse_share,
+    parse_update,
+    self_share_error,
+    share_response,
+    update_response,
+    version_response,
+)
+
+# Django's async ORM has no transactions yet, so writes that must be atomic
+# run the sync implementation in a worker thread.
+acreate_with_history = sync_to_async(create_with_history)
+acommit_version = sync_to_async(commit_version)
+
+
+def async_login_required(view):
+    """
+    login_required for coroutine views, the user is loaded without blocking
+    """
+
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        user = await request.auser()
+        if not user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        request.user = user
+        return await view(request, *args, **kwargs)
+
+    return wrapper
+
+
+async def check_note_access(request, note_id, allowed, action):
+    """
+    Async version of notes.views.check_note_access
+    """
+    return access_error(await aget_access(request.user, note_id), allowed, action)
+
+
+@csrf_exempt
+@async_login_required
+async def create_note(request):
+    """
+    Create a new id with title and its content
+
+    Args:
+        request : user request
+
+    Returns:
+        JSON: message, note_id
+    """
+    if request.method == "POST":
+        title = request.POST.get("title")
+        content = request.POST.get("content")
+
+        error = validate_title(title) or validate_content(content)
+        if error:
+            return JsonResponse({"error": error}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            note = await acreate_with_history(request.user, title, content)
+            return JsonResponse(
+                {"message": "Note created successfully", "note_id": note.id}
+            )
+        except Exception as e:
+            # Error handling: return a 500 status code and the error message
+            return JsonResponse(
+                {"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+
+@async_login_required
+async def get_or_update_note(request, note_id):
+    """
+    Get or update a note
+
+    Args:
+        request : user request
+        note_id (int:pk): note id to get or update note.
+
+    Returns:
+        JSON: title, content, version
+    """
+    if request.method == "GET":
+        # Check if the logged-in user is the owner of the note
+        error = await check_note_access(request, note_id, CAN_GET, "view")
+        if error:
+            return error
+
+        return note_response(request, note_id, await aget_note_data(note_id))
+    elif request.method == "PUT":
+        # Check if the logged-in user has access to the note
+        error = await check_note_access(request, note_id, CAN_WRITE, "edit")
+        if error:
+            return error
+
+        note = await Note.objects.filter(id=note_id).afirst()
+        if note is None:
+            raise Http404("No Note matches the given query.")
+        new_content, expected_version, error = parse_update(request, note.version)
+        if error:
+            return error
+
+        update = await acommit_version(note, new_content, expected_version)
+        return update_response(update, note)
+
+
+@csrf_exempt
+@require_POST
+@async_login_required
+async def share_note(request):
+    """
+    Share a note with other existing users
+
+    Args:
+        request : user request
+
+    Returns:
+        JSON: message, added, skipped, unknown
+    """
+    note_id, usernames, error = parse_share(request)
+    if error:
+        return error
+
+    # Check if logged user is owner of this note
+    error = await check_note_access(request, note_id, CAN_SHARE, "share")
+    if error:
+        return error
+
+    # check if user is sharing note with self
+    error = self_share_error(request, usernames)
+    if error:
+        return error
+
+    note = Note(id=note_id, owner_id=request.user.id)
+    return share_response(await ashare_with(note, usernames))
+
+
+@async_login_required
+async def get_note_history(request, note_id):
+    """
+    Get note history, newest first
+
+    Args:
+        request : user request, with optional cursor, limit, since, until
+            and fields (full or meta) query parameters.
+        note_id (int:pk): note id to get fetch history for.
+
+    Returns:
+        JSON: results, next_cursor
+    """
+    params, error = parse_history(request)
+    if error:
+        return error
+
+    # Check if the logged-in user has access to the note
+    error = await check_note_access(request, note_id, CAN_READ, "view")
+    if error:
+        return error
+
+    results, next_cursor = await aget_history_page(Note(id=note_id), **params)
+    return JsonResponse({"results": results, "next_cursor": next_cursor})
+
+
+@async_login_required
+async def get_note_version(request, note_id, version):
+    """
+    Get a single version of a note from its history
+
+    Args:
+        request : user request
+        note_id (int:pk): note id to fetch the version for.
+        version (int): version number to rebuild.
+
+    Returns:
+        JSON: version, content, timestamp
+    """
+    # Check if the logged-in user has access to the note
+    error = await check_note_access(request, note_id, CAN_READ, "view")
+    if error:
+        return error
+    return version_response(await aget_version(Note(id=note_id), version))
+
+
+def parse_feed(request, cursor):
+    """
+    Read and validate the limit and wait parameters of a change feed request
+
+    Args:
+        request : user request with optional limit and wait (seconds)
+            query parameters
+        cursor (str): cursor parameter, an integer or "latest"
+
+    Returns:
+        tuple: (cursor, limit, wait, None) or (None, None, None, error response)
+    """
+    try:
+        cursor = None if cursor in (None, "", "latest") else int(cursor)
+        limit = int(request.GET.get("limit", DEFAULT_PAGE_SIZE))
+        wait = int(request.GET.get("wait", 0))
+    except ValueError:
+        cursor = limit = wait = -1
+    if (cursor is not None and cursor < 0) or limit < 1 or wait < 0:
+        return (
+            None,
+            None,
+            None,
+            JsonResponse(
+                {"error": "cursor, limit and wait must be positive integers"},
+                status=status.HTTP_400_BAD_REQUEST,
+            ),
+        )
+    return (
+        cursor,
+        min(limit, MAX_PAGE_SIZE),
+        min(wait, settings.NOTES_CHANGES_MAX_WAIT),
+        None,
+    )
+
+
+@require_GET
+@async_login_required
+async def get_changes(request):
+    """
+    Changes to the notes owned by or shared with the user, oldest first
+
+    With wait, the request is held until a change is logged or wait seconds
+    passed (long polling). cursor=latest returns no change and the cursor of
+    the latest one, to follow the feed from now on. Changes are served
+    NOTES_CHANGES_SETTLE_TIME seconds after they are logged (see
+    notes.changes.settled_before), and a cursor older than the retention
+    window gets a 410.
+
+    Args:
+        request : user request, with optional cursor, limit and wait query
+            parameters.
+
+    Returns:
+        JSON: results, cursor, has_more
+    """
+    cursor_param = request.GET.get("cursor")
+    cursor, limit, wait, error = parse_feed(request, cursor_param)
+    if error:
+        return error
+    if cursor_param == "latest":
+        return JsonResponse(
+            {"results": [], "cursor": await aget_head(request.user), "has_more": False}
+        )
+    if await acursor_expired(cursor):
+        return expired_error()
+
+    deadline = time.monotonic() + wait
+    while True:
+        results, cursor, has_more = await aget_changes(request.user, cursor, limit)
+        if results or time.monotonic() >= deadline:
+            break
+        await asyncio.sleep(settings.NOTES_CHANGES_POLL_INTERVAL)
+    return JsonResponse({"results": results, "cursor": cursor, "has_more": has_more})
+
+
+async def iter_events(user, cursor):
+    """
+    Server-sent events of the change feed of user after cursor, forever
+    """
+    yield f"retry: {settings.NOTES_CHANGES_POLL_INTERVAL * 1000}\n\n"
+    idle = 0
+    while True:
+        results, cursor, has_more = await aget_changes(user, cursor, MAX_PAGE_SIZE)
+        for change in results:
+            data = json.dumps(change, cls=DjangoJSONEncoder)
+            yield f"id: {change['id']}\nevent: change\ndata: {data}\n\n"
+        if has_more:
+            continue
+        idle = 0 if results else idle + settings.NOTES_CHANGES_POLL_INTERVAL
+        if idle >= settings.NOTES_CHANGES_HEARTBEAT:
+            # Keeps proxies from closing the idle connection
+            idle = 0
+            yield ": heartbeat\n\n"
+        await asyncio.sleep(settings.NOTES_CHANGES_POLL_INTERVAL)
+
+
+@require_GET
+@async_login_required
+async def stream_changes(request):
+    """
+    Stream the change feed of the user as server-sent events
+
+    Reconnecting clients resume after the Last-Event-ID header, or the
+    cursor query parameter ("latest" to only get new changes). Only served
+    under ASGI (notes.async_urls): a WSGI server reads the whole endless
+    stream before sending anything, so it gets a 501.
+
+    Args:
+        request : user request
+
+    Returns:
+        text/event-stream: change events
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse(
+            {"error": "The event stream is only served under ASGI, use get_changes"},
+            status=status.HTTP_501_NOT_IMPLEMENTED,
+        )
+    cursor_param = request.headers.get("Last-Event-ID") or request.GET.get("cursor")
+    cursor, _, _, error = parse_feed(request, cursor_param)
+    if error:
+        return error
+    if cursor_param == "latest":
+        cursor = await aget_head(request.user)
+    elif await acursor_expired(cursor):
+        return expired_error()
+
+    response = StreamingHttpResponse(
+        iter_events(request.user, cursor), content_type="text/event-stream"
+    )
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
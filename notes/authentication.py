@@ -0,0 +1,122 @@
+# Notes Authentication
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser, User
+from django.http import JsonResponse
+from django.utils.functional import SimpleLazyObject
+from rest_framework import status
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+# Methods served from the token claims alone in stateless mode
+READ_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+def stateless_enabled():
+    """
+    Whether read requests skip the user row, see NOTES_JWT_STATELESS
+    """
+    return getattr(settings, "NOTES_JWT_STATELESS", False)
+
+
+def get_bearer_token(request):
+    """
+    Raw JWT of the Authorization header, or None if there is none
+    """
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    return token.strip()
+
+
+def user_query(token):
+    return User.objects.filter(id=token[api_settings.USER_ID_CLAIM], is_active=True)
+
+
+def get_token_user(token):
+    """
+    Active user of a validated token, or AnonymousUser if it is gone
+    """
+    return user_query(token).first() or AnonymousUser()
+
+
+async def aget_token_user(token):
+    """
+    Async version of get_token_user
+    """
+    return await user_query(token).afirst() or AnonymousUser()
+
+
+class JWTAuthenticationMiddleware:
+    """
+    Authenticate requests carrying an access token issued by LoginView
+
+    Requests with an ``Authorization: Bearer <token>`` header get their user
+    from the token instead of the session, so the session table is never
+    read. The user row is loaded lazily on first use, or not at all for
+    read requests when NOTES_JWT_STATELESS is set: request.user is then a
+    TokenUser built from the user id and username claims.
+
+    Requests without a bearer token keep the session user. Invalid or
+    expired tokens get a 401 response.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.authenticate(request) or self.get_response(request)
+
+    async def __acall__(self, request):
+        return self.authenticate(request) or await self.get_response(request)
+
+    def authenticate(self, request):
+        """
+        Set request.user from the bearer token if there is one
+
+        Returns:
+            JsonResponse: 401 response if the token is invalid, else None
+        """
+        raw_token = get_bearer_token(request)
+        if raw_token is None:
+            return None
+        try:
+            token = AccessToken(raw_token)
+            token[api_settings.USER_ID_CLAIM]
+        except (TokenError, KeyError):
+            return JsonResponse(
+                {"error": "Invalid or expired token"},
+                status=status.HTTP_401_UNAUTHORIZED,
+            )
+
+        if stateless_enabled() and request.method in READ_METHODS:
+            user = TokenUser(token)
+            request.user = user
+
+            async def auser():
+                return user
+
+        else:
+            request.user = SimpleLazyObject(lambda: get_token_user(token))
+
+            async def auser():
+                if not hasattr(request, "_acached_user"):
+                    request._acached_user = await aget_token_user(token)
+                return request._acached_user
+
+        request.auser = auser
+        # Routes reads after the user's writes to the primary, see
+        # notes.routers.PrimaryPinningMiddleware
+        request.token_user_id = token[api_settings.USER_ID_CLAIM]
+        # Bearer tokens are not sent automatically by browsers
+        request._dont_enforce_csrf_checks = True
+        return None
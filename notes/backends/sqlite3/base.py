@@ -0,0 +1,33 @@
+# Notes SQLite backend
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    SQLite backend with per-connection PRAGMAs and a transaction mode
+
+    Two extra OPTIONS are read, and not passed to sqlite3.connect:
+
+    * pragmas: dict of PRAGMAs run on every new connection, e.g.
+      {"journal_mode": "WAL", "synchronous": "NORMAL"}
+    * transaction_mode: DEFERRED (SQLite default), IMMEDIATE or EXCLUSIVE.
+      IMMEDIATE takes the write lock at BEGIN, so concurrent writers wait
+      for the busy timeout instead of failing with "database is locked"
+      when a read lock can not be upgraded.
+    """
+
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        kwargs.pop("pragmas", None)
+        kwargs.pop("transaction_mode", None)
+        return kwargs
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.settings_dict["OPTIONS"].get("pragmas", {}).items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        mode = self.settings_dict["OPTIONS"].get("transaction_mode")
+        self.cursor().execute(f"BEGIN {mode}" if mode else "BEGIN")
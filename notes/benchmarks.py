@@ -0,0 +1,1268 @@
+# Notes Benchmarks
+import asyncio
+import http.client
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+from importlib import import_module
+from urllib.parse import urlencode, urlsplit
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+from django.core.wsgi import get_wsgi_application
+from django.db import OperationalError, connection, connections, transaction
+from django.test import Client, RequestFactory
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import AccessToken
+
+from auth.hashers import pool as hashing_pool
+from notes import ot
+from notes.collab import websocket_application
+from notes.corpus import (
+    WORDS,
+    delete_corpus,
+    edit_content,
+    make_content,
+    make_vocabulary,
+    seed_corpus,
+)
+from notes.history import (
+    build_update,
+    commit_version,
+    create_with_history,
+    get_version,
+    iter_range,
+)
+from notes.models import Blob, Job, Note, NoteUpdate
+from notes.search import get_search_backend
+from notes.tasks import DatabaseBackend
+from notes.views import bulk_notes, create_note
+
+
+def percentile(values, pct):
+    """
+    Nearest rank percentile of values, in the same unit
+    """
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(timings):
+    """
+    Latency summary in milliseconds for a list of durations in seconds
+    """
+    millis = [timing * 1000 for timing in timings]
+    return {
+        "mean_ms": round(statistics.mean(millis), 3),
+        "p50_ms": round(percentile(millis, 50), 3),
+        "p95_ms": round(percentile(millis, 95), 3),
+        "p99_ms": round(percentile(millis, 99), 3),
+    }
+
+
+def history_bytes(updates):
+    """
+    Bytes stored for history rows: inline contents and the blobs they use
+    """
+    inline = sum(
+        len(content.encode())
+        for content in updates.values_list("content", flat=True).iterator()
+    )
+    blobs = Blob.objects.filter(hash__in=updates.values("blob_id"))
+    return inline + sum(len(data) for data in blobs.values_list("data", flat=True))
+
+
+def bench_history(size=200_000, edits=500, interval=20, samples=100, seed=0):
+    """
+    Compare full snapshot and delta history storage
+
+    Every run happens in a transaction that is rolled back, so the
+    configured database is left untouched.
+    """
+    results = {}
+    for mode, delta in (("full", False), ("delta", True)):
+        rng = random.Random(seed)
+        with override_settings(
+            NOTES_HISTORY_DELTA=delta, NOTES_HISTORY_KEYFRAME_INTERVAL=interval
+        ), transaction.atomic():
+            owner = User.objects.create(username=f"benchmark-history-{mode}")
+            content = make_content(rng, size)
+            note = Note.objects.create(
+                title=mode, content=content, owner=owner, version=1
+            )
+            build_update(note, 1, content).save()
+
+            writes = []
+            for _ in range(edits):
+                new_content = edit_content(rng, content)
+                start = time.perf_counter()
+                commit_version(note, new_content)
+                writes.append(time.perf_counter() - start)
+                content = new_content
+
+            stored = history_bytes(note.updates.all())
+
+            reads = []
+            for _ in range(samples):
+                version = rng.randint(1, edits + 1)
+                start = time.perf_counter()
+                get_version(note, version)
+                reads.append(time.perf_counter() - start)
+
+            results[mode] = {
+                "versions": edits + 1,
+                "stored_bytes": stored,
+                "write": summarize(writes),
+                "reconstruct": summarize(reads),
+            }
+            transaction.set_rollback(True)
+
+    results["compression_ratio"] = round(
+        results["full"]["stored_bytes"] / max(1, results["delta"]["stored_bytes"]), 2
+    )
+    return results
+
+
+def bench_updates(notes=100_000, edits=200, size=2_000, steps=3, seed=0):
+    """
+    Measure note update latency while the notes table grows
+
+    The table is grown to notes rows in steps, timing edits of random notes
+    at each size. Latency should stay flat as the table grows.
+    """
+    rng = random.Random(seed)
+    results = {"steps": []}
+    with transaction.atomic():
+        owner = User.objects.create(username="benchmark-updates")
+        content = make_content(rng, size)
+        total = 0
+        for step in range(1, steps + 1):
+            target = notes * step // steps
+            Note.objects.bulk_create(
+                (
+                    Note(title=f"note {index}", content=content, owner=owner)
+                    for index in range(total, target)
+                ),
+                batch_size=1000,
+            )
+            total = target
+            ids = list(Note.objects.filter(owner=owner).values_list("id", flat=True))
+
+            writes = []
+            for _ in range(edits):
+                note = Note.objects.get(id=rng.choice(ids))
+                new_content = edit_content(rng, note.content)
+                start = time.perf_counter()
+                commit_version(note, new_content)
+                writes.append(time.perf_counter() - start)
+
+            results["steps"].append({"notes": total, "update": summarize(writes)})
+        transaction.set_rollback(True)
+    return results
+
+
+def bench_bulk(notes=5_000, batch=500, size=1_000, seed=0):
+    """
+    Compare creating notes one request at a time with the bulk endpoint
+
+    Views are called directly with a RequestFactory, so both paths pay the
+    same view overhead but no middleware or network cost. Each request
+    commits on its own like in production, the benchmark user and its notes
+    are deleted afterwards.
+    """
+    rng = random.Random(seed)
+    factory = RequestFactory()
+    contents = [make_content(rng, size) for _ in range(notes)]
+    results = {}
+    owner = User.objects.create(username="benchmark-bulk")
+    try:
+        start = time.perf_counter()
+        for index, content in enumerate(contents):
+            request = factory.post(
+                "/notes/create/", {"title": f"note {index}", "content": content}
+            )
+            request.user = owner
+            create_note(request)
+        single = time.perf_counter() - start
+
+        start = time.perf_counter()
+        for offset in range(0, notes, batch):
+            items = [
+                {"title": f"note {index}", "content": content}
+                for index, content in enumerate(
+                    contents[offset : offset + batch], start=offset
+                )
+            ]
+            request = factory.post(
+                "/notes/bulk/",
+                json.dumps({"create": items}),
+                content_type="application/json",
+            )
+            request.user = owner
+            bulk_notes(request)
+        bulk = time.perf_counter() - start
+    finally:
+        owner.delete()
+
+    results["single_notes_per_sec"] = round(notes / single, 1)
+    results["bulk_notes_per_sec"] = round(notes / bulk, 1)
+    results["speedup"] = round(single / bulk, 2)
+    return results
+
+
+def bench_writes(editors=8, edits=200, shared=0, size=2_000, seed=0):
+    """
+    Measure write throughput of concurrent editors on the configured database
+
+    Each editor is a thread with its own connection, committing edits with
+    optimistic concurrency like PUT /notes/<id>/. Editors work on their own
+    note, or all on one note when shared is set, in which case stale edits
+    are retried. The benchmark user and its notes are deleted afterwards.
+    """
+    rng = random.Random(seed)
+    owner = User.objects.create(username="benchmark-writes")
+    content = make_content(rng, size)
+    lock = threading.Lock()
+    timings = []
+    counts = {"conflicts": 0, "errors": 0}
+
+    def editor(note_id, seed):
+        rng = random.Random(seed)
+        try:
+            done = 0
+            while done < edits:
+                note = Note.objects.get(id=note_id)
+                start = time.perf_counter()
+                try:
+                    update = commit_version(note, edit_content(rng, note.content))
+                except OperationalError:
+                    # SQLite busy timeout exceeded
+                    update = None
+                    with lock:
+                        counts["errors"] += 1
+                elapsed = time.perf_counter() - start
+                with lock:
+                    if update is None:
+                        counts["conflicts"] += 1
+                    else:
+                        timings.append(elapsed)
+                done += update is not None
+        finally:
+            connections.close_all()
+
+    try:
+        note_ids = [
+            create_with_history(owner, f"note {index}", content).id
+            for index in range(1 if shared else editors)
+        ]
+        threads = [
+            threading.Thread(
+                target=editor, args=(note_ids[index % len(note_ids)], seed + index)
+            )
+            for index in range(editors)
+        ]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        wall = time.perf_counter() - start
+    finally:
+        owner.delete()
+
+    profile = {"vendor": connection.vendor}
+    if connection.vendor == "sqlite":
+        with connection.cursor() as cursor:
+            for pragma in ("journal_mode", "synchronous", "busy_timeout"):
+                profile[pragma] = cursor.execute(f"PRAGMA {pragma}").fetchone()[0]
+    return {
+        "profile": profile,
+        "editors": editors,
+        "edits_per_sec": round(len(timings) / wall, 1),
+        "conflicts": counts["conflicts"] - counts["errors"],
+        "errors": counts["errors"],
+        "commit": summarize(timings),
+    }
+
+
+def bench_search(notes=100_000, users=100, queries=200, size=500, words=20_000, seed=0):
+    """
+    Measure search latency over a synthetic corpus
+
+    Notes use a Zipf distributed vocabulary and are spread over users, each
+    query runs as a random user for one or two vocabulary words. Everything
+    is rolled back afterwards.
+    """
+    rng = random.Random(seed)
+    backend = get_search_backend()
+    vocabulary = make_vocabulary(rng, words)
+    with transaction.atomic():
+        owners = User.objects.bulk_create(
+            User(username=f"benchmark-search-{index}") for index in range(users)
+        )
+        Note.objects.bulk_create(
+            (
+                Note(
+                    title=" ".join(
+                        rng.choices(vocabulary[0], cum_weights=vocabulary[1], k=4)
+                    ),
+                    content=make_content(rng, size, vocabulary),
+                    owner=rng.choice(owners),
+                )
+                for _ in range(notes)
+            ),
+            batch_size=1000,
+        )
+
+        timings = []
+        hits = 0
+        for _ in range(queries):
+            terms = rng.choices(
+                vocabulary[0], cum_weights=vocabulary[1], k=rng.randint(1, 2)
+            )
+            query = " ".join(terms)
+            start = time.perf_counter()
+            hits += len(backend.search(rng.choice(owners), query))
+            timings.append(time.perf_counter() - start)
+        transaction.set_rollback(True)
+
+    return {
+        "backend": type(backend).__name__,
+        "notes": notes,
+        "mean_hits": round(hits / queries, 1),
+        "search": summarize(timings),
+    }
+
+
+async def http_get(host, port, connection, path, cookie):
+    """
+    GET path over a keep-alive HTTP/1.1 connection, reopened when needed
+
+    Args:
+        connection (list): [reader, writer] reused between calls, or Nones
+
+    Returns:
+        int: response status code
+    """
+    if connection[0] is None or connection[0].at_eof():
+        connection[:] = await asyncio.open_connection(host, port)
+    reader, writer = connection
+    writer.write(
+        f"GET {path} HTTP/1.1\r\nHost: {host}\r\nCookie: {cookie}\r\n\r\n".encode()
+    )
+    await writer.drain()
+
+    head = await reader.readuntil(b"\r\n\r\n")
+    status_line, *header_lines = head.decode("latin-1").split("\r\n")
+    headers = dict(line.lower().split(": ", 1) for line in header_lines if ": " in line)
+    await reader.readexactly(int(headers.get("content-length", 0)))
+    if headers.get("connection") == "close":
+        writer.close()
+        connection[:] = [None, None]
+    return int(status_line.split()[1])
+
+
+async def run_http_load(url, paths, cookie, concurrency, requests):
+    """
+    Send requests GETs spread over concurrency connections
+
+    Returns:
+        tuple: (latencies in seconds, error count, wall time in seconds)
+    """
+    parts = urlsplit(url)
+    host, port = parts.hostname, parts.port or 80
+    timings = []
+    errors = 0
+    queue = iter(range(requests))
+
+    async def client():
+        nonlocal errors
+        connection = [None, None]
+        for index in queue:
+            start = time.perf_counter()
+            try:
+                code = await http_get(
+                    host, port, connection, paths[index % len(paths)], cookie
+                )
+            except (OSError, asyncio.IncompleteReadError):
+                code = None
+                connection[:] = [None, None]
+            timings.append(time.perf_counter() - start)
+            if code != 200:
+                errors += 1
+        if connection[1] is not None:
+            connection[1].close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return timings, errors, time.perf_counter() - start
+
+
+def bench_http(
+    url="http://127.0.0.1:8000", concurrency=1000, requests=20_000, notes=100, seed=0
+):
+    """
+    Load test the note read endpoints of a running server
+
+    Start the server first, under WSGI (gunicorn) or ASGI (uvicorn, async
+    views) against the same database, then compare the results. Requests
+    alternate between note GETs and history pages of a benchmark user
+    logged in with a database session; the user, its notes and its session
+    are deleted afterwards.
+    """
+    rng = random.Random(seed)
+    owner = User.objects.create(username="benchmark-http")
+    session = SessionStore()
+    try:
+        note_ids = [
+            create_with_history(owner, f"note {index}", make_content(rng, 2_000)).id
+            for index in range(notes)
+        ]
+        session[SESSION_KEY] = str(owner.pk)
+        session[BACKEND_SESSION_KEY] = "django.contrib.auth.backends.ModelBackend"
+        session[HASH_SESSION_KEY] = owner.get_session_auth_hash()
+        session.create()
+
+        paths = []
+        for note_id in note_ids:
+            paths.append(f"/notes/notes/{note_id}/")
+            paths.append(f"/notes/notes/version-history/{note_id}/")
+        timings, errors, wall = asyncio.run(
+            run_http_load(
+                url,
+                paths,
+                f"sessionid={session.session_key}",
+                concurrency,
+                requests,
+            )
+        )
+    finally:
+        if session.session_key:
+            session.delete()
+        owner.delete()
+
+    return {
+        "url": url,
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": errors,
+        "requests_per_sec": round(requests / wall, 1),
+        "latency": summarize(timings),
+    }
+
+
+class CollabClient:
+    """
+    Minimal collaborative editing client keeping one operation in flight
+    """
+
+    def __init__(self):
+        self.content = None
+        self.revision = 0
+        self.outstanding = None
+        self.sent = 0
+        self.received = 0
+
+    def handle(self, text):
+        self.received += len(text)
+        message = json.loads(text)
+        if message["type"] == "init":
+            self.content = message["content"]
+            self.revision = message["revision"]
+        elif message["type"] == "ack":
+            self.outstanding = None
+            self.revision = message["revision"]
+        elif message["type"] == "op":
+            ops = message["ops"]
+            if self.outstanding is not None:
+                self.outstanding, ops = ot.transform(self.outstanding, ops)
+            self.content = ot.apply(self.content, ops)
+            self.revision = message["revision"]
+
+    def edit(self, rng):
+        """
+        Type or delete one character, returning the message to send
+        """
+        position = rng.randrange(len(self.content))
+        if rng.random() < 0.8:
+            ops = [position, rng.choice("abcdefghijklmnopqrstuvwxyz ")]
+        else:
+            ops = [position, -1]
+        ops.append(len(self.content) - position - (ops[1] == -1))
+        ops = [op for op in ops if op]
+        self.content = ot.apply(self.content, ops)
+        self.outstanding = ops
+        text = json.dumps({"type": "op", "revision": self.revision, "ops": ops})
+        self.sent += len(text)
+        return text
+
+
+async def run_collab(note_id, users, seconds, rate, seed):
+    """
+    Run one editing client per user against the WebSocket application
+
+    Returns:
+        tuple: CollabClient of each user, number of edits made and whether
+            every client ended with the same content
+    """
+    rng = random.Random(seed)
+    clients = []
+    edits = 0
+
+    async def editor(user):
+        nonlocal edits
+        client = CollabClient()
+        clients.append(client)
+        inputs = asyncio.Queue()
+
+        async def send(message):
+            if message["type"] == "websocket.send":
+                client.handle(message["text"])
+
+        scope = {
+            "type": "websocket",
+            "path": f"/notes/notes/{note_id}/collab/",
+            "query_string": f"token={AccessToken.for_user(user)}".encode(),
+            "headers": [],
+        }
+        await inputs.put({"type": "websocket.connect"})
+        task = asyncio.ensure_future(websocket_application(scope, inputs.get, send))
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            await asyncio.sleep(rng.expovariate(rate))
+            if client.content and client.outstanding is None:
+                await inputs.put(
+                    {"type": "websocket.receive", "text": client.edit(rng)}
+                )
+                edits += 1
+        # Let every editor get its last edit acknowledged before leaving
+        while client.outstanding is not None:
+            await asyncio.sleep(0.01)
+        typing.discard(user)
+        while typing:
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.1)
+        contents.append(client.content)
+        await inputs.put({"type": "websocket.disconnect"})
+        await task
+
+    typing = set(users)
+    contents = []
+    await asyncio.gather(*(editor(user) for user in users))
+    return clients, edits, len(set(contents)) == 1
+
+
+def bench_collab(editors=5, seconds=10, rate=5, size=2_000, delay=5, seed=0):
+    """
+    Compare collaborative editing with whole-note PUTs for the same edits
+
+    editors type rate characters per second each on one shared note for
+    seconds, through the WebSocket application in-process. The PUT baseline
+    uploads the full content and writes a history row for every edit. The
+    benchmark users and note are deleted afterwards.
+    """
+    rng = random.Random(seed)
+    users = [
+        User.objects.create(username=f"benchmark-collab-{index}")
+        for index in range(editors)
+    ]
+    try:
+        note = create_with_history(users[0], "collab", make_content(rng, size))
+        note.shared_with.add(*users[1:])
+        with override_settings(
+            NOTES_COLLAB_CHECKPOINT_DELAY=delay,
+            NOTES_COLLAB_CHECKPOINT_MAX_DELAY=max(delay, 30),
+        ):
+            clients, edits, converged = asyncio.run(
+                run_collab(note.id, users, seconds, rate, seed)
+            )
+        writes = NoteUpdate.objects.filter(note=note).count() - 1
+        note.refresh_from_db()
+    finally:
+        for user in users:
+            user.delete()
+
+    per_minute = 60 / seconds
+    sent = sum(client.sent for client in clients)
+    received = sum(client.received for client in clients)
+    return {
+        "editors": editors,
+        "edits_per_min": round(edits * per_minute),
+        "converged": converged
+        and all(client.content == note.content for client in clients),
+        "collab": {
+            "upload_bytes_per_min": round(sent * per_minute),
+            "download_bytes_per_min": round(received * per_minute),
+            "db_writes_per_min": round(writes * per_minute, 1),
+        },
+        "put": {
+            "upload_bytes_per_min": round(edits * len(note.content) * per_minute),
+            "db_writes_per_min": round(edits * per_minute),
+        },
+    }
+
+
+def bench_tasks(size=50_000, edits=300, interval=20, seed=0):
+    """
+    Compare encoding history deltas inline with deferring them to the
+    database task queue (NOTES_HISTORY_DEFER_DELTA)
+
+    Commit latency is what a PUT waits for; the deferred run then drains
+    the queue like a run_tasks worker. Every run is rolled back.
+    """
+    results = {}
+    for mode, defer in (("inline", False), ("deferred", True)):
+        rng = random.Random(seed)
+        with override_settings(
+            NOTES_HISTORY_DELTA=True,
+            NOTES_HISTORY_KEYFRAME_INTERVAL=interval,
+            NOTES_HISTORY_DEFER_DELTA=defer,
+            NOTES_TASKS_BACKEND="notes.tasks.DatabaseBackend",
+        ), transaction.atomic():
+            owner = User.objects.create(username=f"benchmark-tasks-{mode}")
+            content = make_content(rng, size)
+            note = create_with_history(owner, mode, content)
+
+            writes = []
+            for _ in range(edits):
+                new_content = edit_content(rng, content)
+                start = time.perf_counter()
+                commit_version(note, new_content)
+                writes.append(time.perf_counter() - start)
+                content = new_content
+
+            start = time.perf_counter()
+            jobs = Job.objects.count()
+            DatabaseBackend().run_pending()
+            drain = time.perf_counter() - start
+
+            results[mode] = {
+                "commit": summarize(writes),
+                "jobs": jobs,
+                "drain_ms": round(drain * 1000, 3),
+                "stored_bytes": history_bytes(note.updates.all()),
+            }
+            transaction.set_rollback(True)
+    return results
+
+
+def bench_blobs(notes=2_000, templates=20, edits=2_000, noop=0.3, revert=0.2, seed=0):
+    """
+    Measure history storage of notes created from shared templates, with
+    no-op saves and reverts, against storing every row inline
+
+    Every run happens in a transaction that is rolled back.
+    """
+    rng = random.Random(seed)
+    with transaction.atomic():
+        owner = User.objects.create(username="benchmark-blobs")
+        bodies = [make_content(rng, 2_000) for _ in range(templates)]
+        created = [
+            create_with_history(owner, f"note {index}", rng.choice(bodies))
+            for index in range(notes)
+        ]
+
+        saves = {"noop": [], "revert": [], "edit": []}
+        previous = {}
+        for _ in range(edits):
+            note = rng.choice(created)
+            draw = rng.random()
+            if draw < noop:
+                kind, content = "noop", note.content
+            elif draw < noop + revert and note.id in previous:
+                kind, content = "revert", previous[note.id]
+            else:
+                kind, content = "edit", edit_content(rng, note.content)
+            previous[note.id] = note.content
+            start = time.perf_counter()
+            commit_version(note, content)
+            saves[kind].append(time.perf_counter() - start)
+
+        updates = NoteUpdate.objects.filter(note__owner=owner)
+        logical = 0
+        for note in created:
+            for update, content in iter_range(note, 1, note.version):
+                logical += len(
+                    (content if update.is_keyframe else update.content).encode()
+                )
+        results = {
+            "history_rows": updates.count(),
+            "blobs": Blob.objects.filter(hash__in=updates.values("blob_id")).count(),
+            "inline_bytes": logical,
+            "stored_bytes": history_bytes(updates),
+            "save": {kind: summarize(timings) for kind, timings in saves.items()},
+        }
+        results["ratio"] = round(logical / max(1, results["stored_bytes"]), 2)
+        transaction.set_rollback(True)
+    return results
+
+
+# Endpoints bench_endpoints does not measure, and why
+SKIPPED_ENDPOINTS = {
+    "stream_changes": "endless server-sent event stream, see get_changes",
+    "list_profiles": "staff only diagnostics, see notes.profiling",
+    "get_profile": "staff only diagnostics, see notes.profiling",
+    "provision_users": "admin only bulk writes, see provision_users command",
+}
+
+
+def json_body(data):
+    return "application/json", json.dumps(data).encode()
+
+
+def form_body(data):
+    return "application/x-www-form-urlencoded", urlencode(data, doseq=True).encode()
+
+
+def endpoint_scenarios(corpus, rng, target, size):
+    """
+    Request builders of bench_endpoints, by label
+
+    Returns:
+        dict: label -> (URL name, builder); a builder takes the request
+            index and returns (user or None, method, path, body) where body
+            is None or a (content type, bytes) pair
+    """
+    users = corpus.users
+
+    def pick(index):
+        user = users[index % len(users)]
+        return user, rng.choice(corpus.notes[user.id])
+
+    def note_path(index, name, *args):
+        user, note_id = pick(index)
+        return user, "GET", reverse(name, args=[note_id, *args]), None
+
+    def update(index):
+        user, note_id = pick(index)
+        content = make_content(rng, size)
+        path = reverse("get_or_update_note", args=[note_id])
+        return user, "PUT", path, json_body({"content": content})
+
+    def pick_shared(index, shared):
+        """
+        A note of a user and another user for which shared(note, user)
+        holds, starting with the user of the request index
+
+        Raises:
+            RuntimeError: if no note and user qualify, rather than timing
+                the 400 of a user sharing with themselves
+        """
+        for offset in range(len(users)):
+            user = users[(index + offset) % len(users)]
+            note_ids = corpus.notes[user.id][:]
+            rng.shuffle(note_ids)
+            for note_id in note_ids:
+                recipients = [
+                    other for other in users if other != user and shared(note_id, other)
+                ]
+                if recipients:
+                    return user, note_id, rng.choice(recipients)
+        raise RuntimeError(
+            "No note of the corpus can be shared or unshared, "
+            "seed more users or shares"
+        )
+
+    def share(index):
+        user, note_id, recipient = pick_shared(
+            index, lambda note_id, other: other.id not in corpus.shares[note_id]
+        )
+        corpus.shares[note_id].add(recipient.id)
+        body = form_body({"note_id": note_id, "usernames": [recipient.username]})
+        return user, "POST", reverse("share_note"), body
+
+    def unshare(index):
+        user, note_id, recipient = pick_shared(
+            index, lambda note_id, other: other.id in corpus.shares[note_id]
+        )
+        corpus.shares[note_id].discard(recipient.id)
+        body = form_body({"note_id": note_id, "usernames": [recipient.username]})
+        return user, "POST", reverse("unshare_note"), body
+
+    def signup(index):
+        username = f"{corpus.prefix}-signup-{target}-{index}"
+        body = json_body(
+            {
+                "username": username,
+                "password": corpus.password,
+                "password2": corpus.password,
+                "email": f"{username}@example.com",
+                "first_name": "Bench",
+                "last_name": "Mark",
+            }
+        )
+        return None, "POST", reverse("auth_register"), body
+
+    def login(index):
+        user = users[index % len(users)]
+        body = json_body({"username": user.username, "password": corpus.password})
+        return None, "POST", reverse("token_obtain_pair"), body
+
+    def create(index):
+        body = form_body({"title": "Created", "content": make_content(rng, size)})
+        return users[index % len(users)], "POST", reverse("create_note"), body
+
+    def bulk(index):
+        items = [{"title": "Bulk", "content": make_content(rng, size)}] * 10
+        body = json_body({"create": items})
+        return users[index % len(users)], "POST", reverse("bulk_notes"), body
+
+    def get(name, query=""):
+        def builder(index):
+            path = reverse(name) + (f"?{query}" if query else "")
+            return users[index % len(users)], "GET", path, None
+
+        return builder
+
+    def search(index):
+        path = f"{reverse('search_notes')}?q={rng.choice(WORDS)}"
+        return users[index % len(users)], "GET", path, None
+
+    scenarios = {
+        "healthcheck": (
+            "healthcheck",
+            lambda index: (None, "GET", "/healthcheck/", None),
+        ),
+        "signup": ("auth_register", signup),
+        "login": ("token_obtain_pair", login),
+        "list_notes": ("list_notes", get("list_notes")),
+        "create_note": ("create_note", create),
+        "search_notes": ("search_notes", search),
+        "bulk_create": ("bulk_notes", bulk),
+        "get_note": (
+            "get_or_update_note",
+            lambda index: note_path(index, "get_or_update_note"),
+        ),
+        "update_note": ("get_or_update_note", update),
+        "share_note": ("share_note", share),
+        "unshare_note": ("unshare_note", unshare),
+        "export_notes": ("export_notes", get("export_notes", "format=ndjson")),
+        "sync_notes": ("sync_notes", get("sync_notes")),
+        "get_changes": ("get_changes", get("get_changes", "cursor=0")),
+        "note_history": (
+            "get_note_history",
+            lambda index: note_path(index, "get_note_history"),
+        ),
+        "note_version": (
+            "get_note_version",
+            lambda index: note_path(index, "get_note_version", 1),
+        ),
+    }
+    for label, (name, _) in list(scenarios.items()):
+        if name in corpus_skips(corpus):
+            del scenarios[label]
+    return scenarios
+
+
+def corpus_skips(corpus):
+    """
+    Endpoints the corpus cannot exercise, by URL name, with the reason
+    """
+    if len(corpus.users) > 1:
+        return {}
+    reason = "needs a second corpus user, users can't share with themselves"
+    return {"share_note": reason, "unshare_note": reason}
+
+
+class InProcessTarget:
+    """
+    Send requests through Django's test client, in this thread
+    """
+
+    count_queries = True
+
+    def __init__(self):
+        self.client = Client()
+
+    def request(self, method, path, body, headers):
+        content_type, data = body or ("application/octet-stream", b"")
+        response = self.client.generic(
+            method, path, data, content_type=content_type, headers=headers
+        )
+        if response.streaming:
+            for _ in response.streaming_content:
+                pass
+        return response.status_code
+
+
+class HTTPTarget:
+    """
+    Send requests to a running server, one keep-alive connection per thread
+    """
+
+    count_queries = False
+
+    def __init__(self, url):
+        parts = urlsplit(url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.local = threading.local()
+
+    def request(self, method, path, body, headers):
+        headers = dict(headers)
+        if body:
+            headers["Content-Type"] = body[0]
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            connection = http.client.HTTPConnection(self.host, self.port, timeout=60)
+            connection.connect()
+            connection.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self.local.connection = connection
+        try:
+            connection.request(method, path, body and body[1], headers)
+            response = connection.getresponse()
+            response.read()
+            return response.status
+        except (OSError, http.client.HTTPException):
+            connection.close()
+            self.local.connection = None
+            return None
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    def setup(self):
+        super().setup()
+        # Small responses are not held back by Nagle's algorithm
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_wsgi_server():
+    """
+    Serve the project with Django's threaded WSGI server on a free port
+
+    Returns:
+        tuple: (server, URL)
+    """
+    server = ThreadedWSGIServer(("127.0.0.1", 0), QuietRequestHandler)
+    server.set_app(get_wsgi_application())
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def start_asgi_server():
+    """
+    Serve the project with uvicorn (pip install uvicorn) on a free port
+
+    Returns:
+        tuple: (server, URL)
+    """
+    import uvicorn
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = uvicorn.Server(
+        uvicorn.Config(
+            "note_taking_app.asgi:application",
+            host="127.0.0.1",
+            port=port,
+            log_level="warning",
+            lifespan="off",
+        )
+    )
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server, f"http://127.0.0.1:{port}"
+
+
+def uncovered_endpoints(scenarios, skipped=SKIPPED_ENDPOINTS):
+    """
+    Names of the notes and auth URLs no scenario requests
+    """
+    covered = {name for name, _ in scenarios.values()} | set(skipped)
+    return sorted(
+        pattern.name
+        for module in ("notes.urls", "auth.urls")
+        for pattern in import_module(module).urlpatterns
+        if pattern.name not in covered
+    )
+
+
+def run_endpoint(target, builder, tokens, requests, concurrency):
+    """
+    Send requests built by builder, concurrency at a time
+
+    Returns:
+        dict: throughput, latency, errors and queries per request
+    """
+    timings = []
+    counts = {"queries": 0}
+    statuses = {}
+    lock = threading.Lock()
+
+    def send(index):
+        user, method, path, body = builder(index)
+        headers = {}
+        if user is not None:
+            headers["Authorization"] = f"Bearer {tokens[user.id]}"
+        with ExitStack() as stack:
+            captures = []
+            if target.count_queries:
+                captures = [
+                    stack.enter_context(CaptureQueriesContext(connections[alias]))
+                    for alias in connections
+                ]
+            start = time.perf_counter()
+            code = target.request(method, path, body, headers)
+            elapsed = time.perf_counter() - start
+        with lock:
+            timings.append(elapsed)
+            counts["queries"] += sum(len(capture) for capture in captures)
+            statuses[code] = statuses.get(code, 0) + 1
+
+    start = time.perf_counter()
+    if concurrency > 1:
+        with ThreadPoolExecutor(concurrency) as executor:
+            list(executor.map(send, range(requests)))
+    else:
+        for index in range(requests):
+            send(index)
+    wall = time.perf_counter() - start
+
+    result = {
+        "requests": requests,
+        "errors": sum(
+            count for code, count in statuses.items() if code is None or code >= 400
+        ),
+        "statuses": {
+            str(code): count for code, count in sorted(statuses.items(), key=str)
+        },
+        "requests_per_sec": round(requests / wall, 1),
+        "latency": summarize(timings),
+        "queries": None,
+    }
+    if target.count_queries:
+        result["queries"] = round(counts["queries"] / requests, 2)
+    return result
+
+
+def get_revision():
+    """
+    Short git revision of the checkout, to compare results across commits
+    """
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=settings.BASE_DIR,
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def bench_endpoints(
+    users=20,
+    notes=20,
+    shares=3,
+    history=10,
+    size=2_000,
+    requests=100,
+    auth_requests=10,
+    concurrency=1,
+    targets="inprocess,wsgi",
+    url="",
+    seed=0,
+):
+    """
+    Measure every notes and auth endpoint against a synthetic corpus
+
+    A corpus of users owning notes with history, each note shared with
+    shares users, is seeded in the configured database, then every
+    endpoint gets requests requests (auth_requests for signup and login,
+    dominated by password hashing) from corpus users authenticated with
+    access tokens. Targets are comma separated:
+
+    - inprocess: Django's test client, with SQL query counts
+    - wsgi: Django's threaded WSGI server started on a free port
+    - asgi: uvicorn started on a free port, if installed
+    - url: a server started separately (e.g. gunicorn) at url
+
+    The same seed sends the same requests, so results of two commits can
+    be compared. The corpus is deleted afterwards.
+    """
+    prefix = "bench-endpoints"
+    delete_corpus(prefix)
+    corpus = seed_corpus(prefix, users, notes, shares, history, size, seed=seed)
+    tokens = {user.id: str(AccessToken.for_user(user)) for user in corpus.users}
+    names = [name for name in targets.split(",") if name]
+    if url:
+        names.append("url")
+
+    results = {
+        "revision": get_revision(),
+        "database": connection.vendor,
+        "corpus": {
+            "users": users,
+            "notes": users * notes,
+            "shares": shares,
+            "history": history,
+            "size": size,
+        },
+        "concurrency": concurrency,
+        "skipped": {**SKIPPED_ENDPOINTS, **corpus_skips(corpus)},
+        "targets": {},
+    }
+    # Hosts of the test client and of the servers started here
+    hosts = override_settings(
+        ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver", "127.0.0.1"]
+    )
+    try:
+        hosts.enable()
+        for name in names:
+            server = None
+            if name == "inprocess":
+                target = InProcessTarget()
+            elif name == "wsgi":
+                server, address = start_wsgi_server()
+                target = HTTPTarget(address)
+            elif name == "asgi":
+                try:
+                    server, address = start_asgi_server()
+                except ImportError:
+                    results["targets"][name] = {"error": "uvicorn is not installed"}
+                    continue
+                target = HTTPTarget(address)
+            elif name == "url":
+                target = HTTPTarget(url)
+            else:
+                raise TypeError(f"Unknown target {name!r}")
+
+            scenarios = endpoint_scenarios(corpus, random.Random(seed), name, size)
+            results["uncovered"] = uncovered_endpoints(scenarios, results["skipped"])
+            endpoints = {}
+            try:
+                for label, (_, builder) in scenarios.items():
+                    count = auth_requests if label in ("signup", "login") else requests
+                    endpoints[label] = run_endpoint(
+                        target, builder, tokens, count, concurrency
+                    )
+            finally:
+                if name == "wsgi":
+                    server.shutdown()
+                    server.server_close()
+                elif server is not None:
+                    server.should_exit = True
+            results["targets"][name] = endpoints
+    finally:
+        hosts.disable()
+        delete_corpus(prefix)
+    return results
+
+
+def bench_logins(
+    users=8, requests=200, concurrency=8, workers="0,1,2", profiles="pbkdf2", seed=0
+):
+    """
+    Measure logins per second through a WSGI server, per hashing profile
+    and hashing pool size (0 hashes inline in the request threads)
+
+    While logins run, the health check is requested every 10 ms to show
+    how the rest of the site responds during a login storm. Per core rates
+    divide by the cores hashing: the pool workers, or every core inline.
+    """
+    rng = random.Random(seed)
+    password = f"aB@#{rng.random()}"
+    cores = os.cpu_count()
+    results = {
+        "revision": get_revision(),
+        "cores": cores,
+        "concurrency": concurrency,
+        "profiles": {},
+    }
+    hosts = override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "127.0.0.1"])
+    hosts.enable()
+    server, address = start_wsgi_server()
+    try:
+        for profile in profiles.split(","):
+            preferred = settings.PASSWORD_HASHER_PROFILES[profile]
+            hashers = [preferred] + [
+                hasher for hasher in settings.PASSWORD_HASHERS if hasher != preferred
+            ]
+            results["profiles"][profile] = {}
+            for count in map(int, workers.split(",")):
+                with override_settings(
+                    PASSWORD_HASHERS=hashers, AUTH_PASSWORD_WORKERS=count
+                ):
+                    hashing_pool.shutdown()
+                    User.objects.filter(username__startswith="bench-logins-").delete()
+                    encoded = make_password(password)
+                    created = User.objects.bulk_create(
+                        User(username=f"bench-logins-{index}", password=encoded)
+                        for index in range(users)
+                    )
+
+                    def login(index):
+                        user = created[index % len(created)]
+                        body = json_body(
+                            {"username": user.username, "password": password}
+                        )
+                        return None, "POST", reverse("token_obtain_pair"), body
+
+                    target = HTTPTarget(address)
+                    # Starts the pool workers
+                    run_endpoint(target, login, {}, max(count, 1), max(count, 1))
+
+                    probe, probe_timings = HTTPTarget(address), []
+                    stop = threading.Event()
+
+                    def check_health():
+                        while not stop.wait(0.01):
+                            start = time.perf_counter()
+                            probe.request("GET", reverse("healthcheck"), None, {})
+                            probe_timings.append(time.perf_counter() - start)
+
+                    prober = threading.Thread(target=check_health)
+                    prober.start()
+                    try:
+                        result = run_endpoint(target, login, {}, requests, concurrency)
+                    finally:
+                        stop.set()
+                        prober.join()
+                    hashing = min(count or cores, cores)
+                    result["logins_per_sec_per_core"] = round(
+                        result["requests_per_sec"] / hashing, 1
+                    )
+                    result["healthcheck_latency"] = (
+                        summarize(probe_timings) if probe_timings else None
+                    )
+                    results["profiles"][profile][f"workers={count}"] = result
+    finally:
+        server.shutdown()
+        server.server_close()
+        hosts.disable()
+        hashing_pool.shutdown()
+        User.objects.filter(username__startswith="bench-logins-").delete()
+    return results
+
+
+BENCHMARKS = {
+    "history": bench_history,
+    "updates": bench_updates,
+    "bulk": bench_bulk,
+    "writes": bench_writes,
+    "search": bench_search,
+    "http": bench_http,
+    "collab": bench_collab,
+    "tasks": bench_tasks,
+    "blobs": bench_blobs,
+    "endpoints": bench_endpoints,
+    "logins": bench_logins,
+}
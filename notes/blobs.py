@@ -0,0 +1,141 @@
+# Notes Blobs
+import hashlib
+import zlib
+from collections import Counter, defaultdict
+
+from django.db.models import F
+
+from notes.models import Blob, NoteUpdate
+
+
+def content_hash(text) -> str:
+    """
+    Address of a text in the blob table
+    """
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def make_blob(text) -> Blob:
+    """
+    Unsaved, unreferenced blob of a text
+    """
+    data = text.encode()
+    return Blob(
+        hash=hashlib.sha256(data).hexdigest(),
+        data=zlib.compress(data),
+        size=len(data),
+    )
+
+
+def group_counts(counts):
+    """
+    Group a Counter of hashes by count, so each group is one UPDATE
+    """
+    groups = defaultdict(list)
+    for hash, count in counts.items():
+        groups[count].append(hash)
+    return groups
+
+
+def acquire(texts):
+    """
+    Take one blob reference per text, storing the texts not stored yet
+
+    New blobs are inserted with no reference, then every count is bumped
+    with an UPDATE, so concurrent writers of the same text never lose a
+    reference. A blob deleted by release meanwhile is inserted again.
+
+    Args:
+        texts (list): texts to reference, duplicates take one reference each
+
+    Returns:
+        tuple: (list of hashes in the order of texts, bytes of new blobs)
+    """
+    hashes = [content_hash(text) for text in texts]
+    bodies = dict(zip(hashes, texts))
+    pending = Counter(hashes)
+    stored = 0
+    while pending:
+        existing = set(
+            Blob.objects.filter(hash__in=pending).values_list("hash", flat=True)
+        )
+        missing = [make_blob(bodies[hash]) for hash in pending if hash not in existing]
+        Blob.objects.bulk_create(missing, ignore_conflicts=True)
+        stored += sum(len(blob.data) for blob in missing)
+
+        retry = Counter()
+        for count, group in group_counts(pending).items():
+            updated = Blob.objects.filter(hash__in=group).update(
+                refcount=F("refcount") + count
+            )
+            if updated < len(group):
+                found = set(
+                    Blob.objects.filter(hash__in=group).values_list("hash", flat=True)
+                )
+                retry.update({hash: count for hash in group if hash not in found})
+        pending = retry
+    return hashes, stored
+
+
+def release(hashes):
+    """
+    Drop one blob reference per hash, deleting blobs nothing references
+
+    Call it once the rows referencing the blobs are deleted or changed.
+
+    Args:
+        hashes (iterable): hashes of the released references
+
+    Returns:
+        int: bytes of the deleted blobs
+    """
+    counts = Counter(hash for hash in hashes if hash)
+    if not counts:
+        return 0
+    for count, group in group_counts(counts).items():
+        Blob.objects.filter(hash__in=group).update(refcount=F("refcount") - count)
+    unused = Blob.objects.filter(hash__in=counts, refcount=0)
+    freed = sum(len(data) for data in unused.values_list("data", flat=True))
+    unused.delete()
+    return freed
+
+
+def attach(updates):
+    """
+    Move the content of unsaved keyframe rows into blobs
+
+    Args:
+        updates (list): unsaved NoteUpdate rows, e.g. from build_update
+
+    Returns:
+        int: bytes of new blobs
+    """
+    keyframes = [
+        update for update in updates if update.is_keyframe and update.blob_id is None
+    ]
+    if not keyframes:
+        return 0
+    hashes, stored = acquire([update.content for update in keyframes])
+    for update, hash in zip(keyframes, hashes):
+        update.blob_id = hash
+        update.content = ""
+    return stored
+
+
+def collect_note_blobs(sender, instance, **kwargs):
+    """
+    pre_delete receiver of Note remembering the blobs its history references,
+    connected in NotesConfig.ready
+    """
+    instance._blob_hashes = list(
+        NoteUpdate.objects.filter(note_id=instance.id, blob__isnull=False).values_list(
+            "blob_id", flat=True
+        )
+    )
+
+
+def release_note_blobs(sender, instance, **kwargs):
+    """
+    post_delete receiver of Note releasing the blobs of its deleted history
+    """
+    release(getattr(instance, "_blob_hashes", ()))
@@ -0,0 +1,154 @@
+# Notes Bulk operations
+from django.db import transaction
+from django.utils import timezone
+
+from notes.blobs import attach
+from notes.cache import cache_notes
+from notes.changes import record_changes
+from notes.history import build_update
+from notes.models import Note, NoteChange, NoteUpdate
+from notes.validators import validate_content, validate_title
+
+MAX_BULK_ITEMS = 5000
+BATCH_SIZE = 500
+
+
+def is_id(value):
+    """
+    Check that value is a usable note id
+    """
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def is_version(value):
+    """
+    Check that value is a usable note version number
+    """
+    return isinstance(value, int) and not isinstance(value, bool) and value >= 0
+
+
+def bulk_create_notes(user, items):
+    """
+    Create many notes, with their first history row, in one transaction
+
+    Every item is validated first, invalid items are reported and skipped.
+
+    Args:
+        user (User): owner of the new notes
+        items (list): dicts with title and content
+
+    Returns:
+        list: one dict per item, with either note_id or error
+    """
+    results = [{"index": index} for index in range(len(items))]
+    notes = []
+    for result, item in zip(results, items):
+        if not isinstance(item, dict):
+            result["error"] = "Invalid item"
+            continue
+        title, content = item.get("title"), item.get("content")
+        error = validate_title(title) or validate_content(content)
+        if error:
+            result["error"] = error
+            continue
+        notes.append(
+            (result, Note(title=title, content=content, owner=user, version=1))
+        )
+
+    with transaction.atomic():
+        created = Note.objects.bulk_create(
+            [note for _, note in notes], batch_size=BATCH_SIZE
+        )
+        history = [build_update(note, 1, note.content) for note in created]
+        attach(history)
+        NoteUpdate.objects.bulk_create(history, batch_size=BATCH_SIZE)
+        record_changes([note.id for note in created], NoteChange.CREATED, shared=False)
+
+    for result, note in notes:
+        result["note_id"] = note.id
+    return results
+
+
+def bulk_update_notes(user, items):
+    """
+    Update the content of many notes in one transaction
+
+    Notes are locked while versions are checked, so an item whose version
+    does not match the stored one is reported as a conflict instead of
+    overwriting a newer edit. Items that do not change the content keep
+    the current version.
+
+    Args:
+        user (User): user editing the notes, must own or share each note
+        items (list): dicts with id, content and optional version
+
+    Returns:
+        list: one dict per item, with either version or error
+    """
+    results = [{"index": index} for index in range(len(items))]
+    # Index of the first item of each id, valid or not: later items with
+    # the same id are duplicates even if the first one is invalid
+    first = {}
+    for index, item in enumerate(items):
+        if isinstance(item, dict) and is_id(item.get("id")):
+            first.setdefault(item["id"], index)
+    valid = []
+    seen = set()
+    for index, (result, item) in enumerate(zip(results, items)):
+        if not isinstance(item, dict):
+            result["error"] = "Invalid item"
+            continue
+        note_id, content = item.get("id"), item.get("content")
+        result["note_id"] = note_id
+        if not is_id(note_id):
+            result["error"] = "Invalid id"
+            continue
+        if first[note_id] != index:
+            result["error"] = "Duplicate id"
+            continue
+        error = validate_content(content)
+        if error:
+            result["error"] = error
+            continue
+        if "version" in item and not is_version(item["version"]):
+            result["error"] = "Invalid version"
+            continue
+        seen.add(note_id)
+        valid.append((result, item))
+
+    updated_at = timezone.now()
+    with transaction.atomic():
+        notes = Note.objects.visible_to(user).select_for_update().in_bulk(seen)
+        changed = []
+        history = []
+        for result, item in valid:
+            note = notes.get(item["id"])
+            if note is None:
+                result["error"] = "Note not found"
+                continue
+            if item.get("version", note.version) != note.version:
+                result["error"] = "Note was modified by someone else"
+                continue
+            if item["content"] == note.content and note.version:
+                result["version"] = note.version
+                continue
+
+            previous_content = note.content if note.version else None
+            note.version += 1
+            note.content = item["content"]
+            note.updated_at = updated_at
+            history.append(
+                build_update(note, note.version, note.content, previous_content)
+            )
+            changed.append(note)
+            result["version"] = note.version
+
+        Note.objects.bulk_update(
+            changed, ["content", "version", "updated_at"], batch_size=BATCH_SIZE
+        )
+        attach(history)
+        NoteUpdate.objects.bulk_create(history, batch_size=BATCH_SIZE)
+        record_changes([note.id for note in changed], NoteChange.UPDATED)
+        cache_notes(changed)
+
+    return results
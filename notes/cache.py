@@ -0,0 +1,128 @@
+# Notes Cache
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from notes.metrics import record_cache
+from notes.models import Note
+
+
+def cache_enabled():
+    """
+    Whether note bodies are cached, see NOTES_CACHE_TIMEOUT
+    """
+    return getattr(settings, "NOTES_CACHE_TIMEOUT", 0) > 0
+
+
+def note_cache():
+    return caches[getattr(settings, "NOTES_CACHE_ALIAS", "default")]
+
+
+def note_cache_key(note_id):
+    return f"notes:note:{note_id}"
+
+
+def note_data_query(note_id):
+    return Note.objects.filter(id=note_id).values(
+        "title", "content", "version", "updated_at"
+    )
+
+
+def fetch_note_data(note_id):
+    """
+    Read the fields served by a note GET from the database
+
+    Returns:
+        dict: title, content, version and updated_at, or None if not found
+    """
+    return note_data_query(note_id).first()
+
+
+def get_note_data(note_id):
+    """
+    Read the fields served by a note GET, through the note cache if enabled
+
+    A cached note is served without querying the database. Writes replace
+    the entry once they commit, see cache_notes, and readers only fill a
+    missing entry: a reader that loaded the row before a write can't
+    overwrite the new content.
+
+    Args:
+        note_id (int): note to read
+
+    Returns:
+        dict: title, content, version and updated_at, or None if not found
+    """
+    if not cache_enabled():
+        return fetch_note_data(note_id)
+
+    key = note_cache_key(note_id)
+    data = note_cache().get(key)
+    record_cache("note", data is not None)
+    if data is None:
+        data = fetch_note_data(note_id)
+        if data is not None:
+            note_cache().add(key, data, settings.NOTES_CACHE_TIMEOUT)
+    return data
+
+
+async def aget_note_data(note_id):
+    """
+    Async version of get_note_data
+    """
+    if not cache_enabled():
+        return await note_data_query(note_id).afirst()
+
+    key = note_cache_key(note_id)
+    data = await note_cache().aget(key)
+    record_cache("note", data is not None)
+    if data is None:
+        data = await note_data_query(note_id).afirst()
+        if data is not None:
+            await note_cache().aadd(key, data, settings.NOTES_CACHE_TIMEOUT)
+    return data
+
+
+def cache_notes(notes):
+    """
+    Store the new version of written notes once the current transaction
+    commits, replacing what readers cached
+
+    Args:
+        notes (iterable): created or updated Note instances, as saved
+    """
+    if not cache_enabled():
+        return
+    entries = {
+        note_cache_key(note.id): {
+            "title": note.title,
+            "content": note.content,
+            "version": note.version,
+            "updated_at": note.updated_at,
+        }
+        for note in notes
+    }
+    transaction.on_commit(
+        lambda: note_cache().set_many(entries, settings.NOTES_CACHE_TIMEOUT)
+    )
+
+
+def invalidate_notes(note_ids):
+    """
+    Drop cached notes, e.g. after their shares changed
+
+    Args:
+        note_ids (iterable): notes to drop
+    """
+    if not cache_enabled():
+        return
+    note_cache().delete_many([note_cache_key(note_id) for note_id in note_ids])
+
+
+async def ainvalidate_notes(note_ids):
+    """
+    Async version of invalidate_notes
+    """
+    if not cache_enabled():
+        return
+    await note_cache().adelete_many([note_cache_key(note_id) for note_id in note_ids])
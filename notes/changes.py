@@ -0,0 +1,264 @@
+# Notes Change feed
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connections, router
+from django.db.models import QuerySet
+from django.utils import timezone
+
+from notes.models import Note, NoteChange
+
+NoteShare = Note.shared_with.through
+
+BATCH_SIZE = 500
+
+
+def record_changes(note_ids, kind, shared=True):
+    """
+    Log a change of notes for their owner and every user they are shared with
+
+    Recipients are resolved by the database in one INSERT ... SELECT per
+    batch, so callers pay a single query. Call it inside the transaction
+    that changed the notes, after the change.
+
+    Args:
+        note_ids (iterable): changed notes
+        kind (str): NoteChange.CREATED or NoteChange.UPDATED
+        shared (bool): whether the notes may be shared; False skips the
+            share table, e.g. for notes just created
+    """
+    note_ids = list(note_ids)
+    if not note_ids:
+        return
+    using = router.db_for_write(NoteChange)
+    connection = connections[using]
+    timestamp = connection.ops.adapt_datetimefield_value(timezone.now())
+    change, note, share = (
+        NoteChange._meta.db_table,
+        Note._meta.db_table,
+        NoteShare._meta.db_table,
+    )
+    for offset in range(0, len(note_ids), BATCH_SIZE):
+        batch = note_ids[offset : offset + BATCH_SIZE]
+        placeholders = ", ".join(["%s"] * len(batch))
+        sql = f"""
+            INSERT INTO {change} (user_id, note_id, kind, version, timestamp)
+            SELECT owner_id, id, %s, version, %s FROM {note}
+            WHERE id IN ({placeholders})
+        """
+        params = [kind, timestamp, *batch]
+        if shared:
+            sql += f"""
+                UNION ALL
+                SELECT s.user_id, n.id, %s, n.version, %s
+                FROM {share} s JOIN {note} n ON n.id = s.note_id
+                WHERE s.note_id IN ({placeholders})
+            """
+            params += [kind, timestamp, *batch]
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+
+
+def user_changes(note_id, user_ids, kind):
+    """
+    Unsaved log rows of a note being shared with, unshared from or deleted
+    for users
+
+    Args:
+        note_id (int): note whose access changed
+        user_ids (iterable): users who gained or lost access
+        kind (str): NoteChange.SHARED, NoteChange.UNSHARED or
+            NoteChange.DELETED
+
+    Returns:
+        list: NoteChange rows to bulk create
+    """
+    return [
+        NoteChange(user_id=user_id, note_id=note_id, kind=kind) for user_id in user_ids
+    ]
+
+
+def record_deletion(sender, instance, origin=None, **kwargs):
+    """
+    pre_delete receiver of Note logging a tombstone for every user who could
+    see the note, connected in NotesConfig.ready
+    """
+    user_ids = {instance.owner_id}
+    user_ids.update(
+        NoteShare.objects.filter(note_id=instance.id).values_list("user_id", flat=True)
+    )
+    # Users deleted along with their notes get no log rows
+    if isinstance(origin, User):
+        user_ids.discard(origin.pk)
+    elif isinstance(origin, QuerySet) and origin.model is User:
+        user_ids.difference_update(origin.values_list("pk", flat=True))
+    NoteChange.objects.bulk_create(
+        user_changes(instance.id, user_ids, NoteChange.DELETED)
+    )
+
+
+def settled_before(now=None):
+    """
+    Changes logged after this time are not served yet
+
+    Ids are assigned when a row is inserted but become visible when its
+    transaction commits, so on PostgreSQL a change may show up after a
+    later one. Feeds hold changes back for NOTES_CHANGES_SETTLE_TIME
+    seconds so a cursor never moves past a change still being committed;
+    a write transaction lasting longer than that after logging its change
+    can still be missed. SQLite serializes writers, ids are visible in
+    order and no delay is needed.
+    """
+    now = now or timezone.now()
+    return now - timedelta(seconds=settings.NOTES_CHANGES_SETTLE_TIME)
+
+
+def settle(rows, limit):
+    """
+    Cut a page of changes at the first one too recent to be served
+
+    Args:
+        rows (list): up to limit + 1 changes from changes_query
+        limit (int): page size
+
+    Returns:
+        tuple: (changes to serve, whether more changes follow)
+    """
+    if settings.NOTES_CHANGES_SETTLE_TIME:
+        cutoff = settled_before()
+        for index, row in enumerate(rows[:limit]):
+            if row["timestamp"] > cutoff:
+                return rows[:index], False
+    return rows[:limit], len(rows) > limit
+
+
+def changes_query(user, cursor=None):
+    """
+    Query of the changes logged for user after cursor, oldest first, see
+    settle
+    """
+    changes = NoteChange.objects.filter(user_id=user.id)
+    if cursor is not None:
+        changes = changes.filter(id__gt=cursor)
+    return changes.order_by("id").values(
+        "id", "note_id", "kind", "version", "timestamp"
+    )
+
+
+def head_queries(user):
+    """
+    Queries of the first change logged for user too recent to be served,
+    and of the latest change logged for user, see get_head
+    """
+    changes = NoteChange.objects.filter(user_id=user.id)
+    pending = changes.filter(timestamp__gt=settled_before()).order_by("id")
+    return (
+        pending.values_list("id", flat=True),
+        changes.order_by("-id").values_list("id", flat=True),
+    )
+
+
+def get_head(user):
+    """
+    Cursor of the latest change of user that can be served, 0 if there is
+    none
+    """
+    pending, latest = head_queries(user)
+    if settings.NOTES_CHANGES_SETTLE_TIME:
+        first = pending.first()
+        if first is not None:
+            latest = latest.filter(id__lt=first)
+    return latest.first() or 0
+
+
+async def aget_head(user):
+    """
+    Async get_head
+    """
+    pending, latest = head_queries(user)
+    if settings.NOTES_CHANGES_SETTLE_TIME:
+        first = await pending.afirst()
+        if first is not None:
+            latest = latest.filter(id__lt=first)
+    return await latest.afirst() or 0
+
+
+def oldest_query():
+    return NoteChange.objects.order_by("id").values_list("id", flat=True)
+
+
+def is_expired(cursor, oldest):
+    """
+    Whether changes after cursor may have been pruned, see prune_changes
+
+    Args:
+        cursor (int): cursor of the client, None for the whole feed
+        oldest (int): id of the oldest change kept, None if there is none
+    """
+    return bool(cursor) and oldest is not None and cursor < oldest - 1
+
+
+def cursor_expired(cursor):
+    return is_expired(cursor, oldest_query().first())
+
+
+async def acursor_expired(cursor):
+    return is_expired(cursor, await oldest_query().afirst())
+
+
+def prune_changes(retention=None, batch=500, dry_run=False, now=None):
+    """
+    Delete the changes logged more than NOTES_CHANGES_RETENTION days ago
+
+    The latest change is always kept: feeds compare cursors with the oldest
+    change kept to tell clients that missed pruned changes to sync again
+    (410 Gone). Rows are deleted batch at a time, each in its own query.
+
+    Args:
+        retention (int, optional): days kept, defaults to
+            NOTES_CHANGES_RETENTION, None keeps everything
+        batch (int): rows deleted at a time
+        dry_run (bool): only count the rows that would be deleted
+        now (datetime, optional): time the ages are computed from
+
+    Returns:
+        int: rows deleted
+    """
+    if retention is None:
+        retention = settings.NOTES_CHANGES_RETENTION
+    latest = NoteChange.objects.order_by("-id").values_list("id", flat=True).first()
+    if retention is None or latest is None:
+        return 0
+    now = now or timezone.now()
+    stale = NoteChange.objects.filter(
+        timestamp__lt=now - timedelta(days=retention), id__lt=latest
+    )
+    if dry_run:
+        return stale.count()
+    deleted = 0
+    while True:
+        ids = list(stale.order_by("id").values_list("id", flat=True)[:batch])
+        if not ids:
+            return deleted
+        deleted += NoteChange.objects.filter(id__in=ids).delete()[0]
+
+
+async def aget_changes(user, cursor=None, limit=50):
+    """
+    Read a page of the change feed of user
+
+    Args:
+        user (User): user reading the feed
+        cursor (int, optional): last change id seen by the client, the
+            feed starts at the first change without it
+        limit (int): page size
+
+    Returns:
+        tuple: (changes, cursor to resume from, whether more changes follow)
+    """
+    rows = [row async for row in changes_query(user, cursor)[: limit + 1]]
+    rows, has_more = settle(rows, limit)
+    if rows:
+        cursor = rows[-1]["id"]
+    return rows, cursor or 0, has_more
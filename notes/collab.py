@@ -0,0 +1,358 @@
+# Notes Collaborative editing
+import asyncio
+import functools
+import json
+import logging
+import re
+import time
+from importlib import import_module
+from types import SimpleNamespace
+from urllib.parse import parse_qs, urlsplit
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user
+from django.contrib.auth.models import AnonymousUser
+from django.http.cookie import parse_cookie
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.tokens import AccessToken
+
+from notes import ot
+from notes.authentication import aget_token_user
+from notes.history import commit_version
+from notes.models import Note
+from notes.permissions import CAN_READ, CAN_WRITE, aget_access
+from notes.validators import validate_content
+
+logger = logging.getLogger(__name__)
+
+COLLAB_PATH = re.compile(r"^/notes/notes/(?P<note_id>\d+)/collab/$")
+
+# WebSocket close codes
+CLOSE_UNAUTHORIZED = 4401
+CLOSE_FORBIDDEN = 4403
+CLOSE_NOT_FOUND = 4404
+CLOSE_INTERNAL_ERROR = 1011
+
+acommit_version = sync_to_async(commit_version)
+# Diffing long notes takes a while: keep it off the event loop
+adiff = sync_to_async(ot.diff, thread_sensitive=False)
+
+
+class Subscriber:
+    """
+    WebSocket connection editing a note
+
+    Messages are queued and sent by a dedicated task, so every subscriber
+    receives operations in revision order.
+    """
+
+    def __init__(self, send, can_write):
+        self.send = send
+        self.can_write = can_write
+        self.queue = asyncio.Queue()
+
+    def push(self, message):
+        self.queue.put_nowait(message)
+
+    async def run(self):
+        while True:
+            message = await self.queue.get()
+            await self.send({"type": "websocket.send", "text": json.dumps(message)})
+
+    async def close(self, code):
+        try:
+            await self.send({"type": "websocket.close", "code": code})
+        except Exception:
+            # The connection is already gone
+            logger.debug("Closing a collab connection failed", exc_info=True)
+
+
+def sender_done(session, subscriber, task):
+    """
+    Done callback of a subscriber's run task: log why it failed, stop
+    broadcasting to the subscriber and close its connection
+    """
+    if task.cancelled() or task.exception() is None:
+        return
+    logger.error(
+        "Sending to a subscriber of note %s failed",
+        session.note.id,
+        exc_info=task.exception(),
+    )
+    session.subscribers.discard(subscriber)
+    asyncio.ensure_future(subscriber.close(CLOSE_INTERNAL_ERROR))
+
+
+class NoteSession:
+    """
+    Live editing state of a note, shared by its subscribers in this process
+
+    Operations are transformed against the ones applied since the revision
+    the client based them on, applied, then broadcast. The content is
+    checkpointed to the note and its history NOTES_COLLAB_CHECKPOINT_DELAY
+    seconds after the last operation, at most NOTES_COLLAB_CHECKPOINT_MAX_DELAY
+    seconds after the first unsaved one, and when the last subscriber leaves.
+    """
+
+    def __init__(self, note):
+        self.note = note
+        self.content = note.content
+        self.revision = 0
+        self.history = []
+        self.subscribers = set()
+        self.dirty_since = None
+        self.timer = None
+        self.task = None
+        self.lock = asyncio.Lock()
+
+    def receive(self, ops, revision, sender=None):
+        """
+        Merge an operation based on revision and broadcast it
+
+        Args:
+            ops (list): operation, see notes.ot
+            revision (int): session revision the operation was built against
+            sender (Subscriber): author of the operation, acknowledged
+                instead of receiving it
+
+        Raises:
+            ValueError: if the operation is invalid or too old
+
+        Returns:
+            int: revision of the merged operation
+        """
+        if not ot.is_operation(ops):
+            raise ValueError("Invalid operation")
+        first = self.revision - len(self.history)
+        if not first <= revision <= self.revision:
+            raise ValueError("Unknown revision, reload the note")
+        for concurrent in self.history[revision - first :]:
+            ops, _ = ot.transform(ops, concurrent)
+        content = ot.apply(self.content, ops)
+        error = validate_content(content)
+        if error:
+            raise ValueError(error)
+
+        self.content = content
+        self.revision += 1
+        self.history.append(ops)
+        del self.history[: -settings.NOTES_COLLAB_HISTORY_SIZE]
+        for subscriber in self.subscribers:
+            if subscriber is sender:
+                subscriber.push({"type": "ack", "revision": self.revision})
+            else:
+                subscriber.push({"type": "op", "revision": self.revision, "ops": ops})
+        self.schedule_checkpoint()
+        return self.revision
+
+    def broadcast(self, message):
+        for subscriber in self.subscribers:
+            subscriber.push(message)
+
+    def schedule_checkpoint(self):
+        now = time.monotonic()
+        if self.dirty_since is None:
+            self.dirty_since = now
+        if self.timer is not None:
+            self.timer.cancel()
+        delay = min(
+            settings.NOTES_COLLAB_CHECKPOINT_DELAY,
+            self.dirty_since + settings.NOTES_COLLAB_CHECKPOINT_MAX_DELAY - now,
+        )
+        self.timer = asyncio.get_running_loop().call_later(
+            max(delay, 0), self.start_checkpoint
+        )
+
+    def start_checkpoint(self):
+        self.timer = None
+        self.task = asyncio.ensure_future(self.checkpoint())
+
+    async def checkpoint(self):
+        """
+        Save the session content as a new note version
+
+        If the note was changed outside of the session (e.g. a PUT), both
+        changes since the last checkpoint are merged and the outside change
+        is broadcast to the subscribers as an operation. Changes that can't
+        be merged (e.g. the result is too long) are a conflict: the session
+        is reset to the saved note, see resync.
+        """
+        async with self.lock:
+            self.dirty_since = None
+            content, revision = self.content, self.revision
+            base = self.note.content
+            try:
+                while content != self.note.content:
+                    if await acommit_version(self.note, content) is not None:
+                        self.broadcast({"type": "saved", "version": self.note.version})
+                        return
+                    latest = await Note.objects.filter(id=self.note.id).afirst()
+                    if latest is None:
+                        return
+                    local = await adiff(base, content)
+                    remote = await adiff(base, latest.content)
+                    local, remote = ot.transform(local, remote)
+                    self.receive(remote, revision)
+                    content, revision = ot.apply(latest.content, local), self.revision
+                    base, self.note = latest.content, latest
+            except ValueError as e:
+                # Retrying would fail the same way
+                logger.warning("Checkpoint of note %s failed: %s", self.note.id, e)
+                await self.resync()
+
+    async def resync(self):
+        """
+        Drop the unsaved changes and restart the session from the saved note
+
+        Subscribers get an init message with the saved content; operations
+        based on earlier revisions are rejected.
+        """
+        latest = await Note.objects.filter(id=self.note.id).afirst()
+        if latest is None:
+            return
+        self.note, self.content = latest, latest.content
+        self.revision += 1
+        self.history = []
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        self.dirty_since = None
+        self.broadcast(
+            {"type": "init", "revision": self.revision, "content": self.content}
+        )
+
+    async def flush(self):
+        """
+        Checkpoint now, waiting for a running checkpoint first
+        """
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        if self.task is not None:
+            await self.task
+        await self.checkpoint()
+
+
+# Open sessions of this process by note id. Every editor of a note must be
+# served by the same process, e.g. by routing on the note id.
+sessions = {}
+
+
+async def join(note_id, subscriber):
+    """
+    Add a subscriber to the session of a note, opening it if needed
+
+    Returns:
+        NoteSession: session, or None if the note does not exist
+    """
+    session = sessions.get(note_id)
+    if session is None:
+        note = await Note.objects.filter(id=note_id).afirst()
+        if note is None:
+            return None
+        # Another subscriber may have opened the session meanwhile
+        session = sessions.setdefault(note_id, NoteSession(note))
+    session.subscribers.add(subscriber)
+    return session
+
+
+async def leave(note_id, session, subscriber):
+    """
+    Remove a subscriber, saving and closing the session if it was the last
+    """
+    session.subscribers.discard(subscriber)
+    if session.subscribers:
+        return
+    await session.flush()
+    if not session.subscribers and sessions.get(note_id) is session:
+        del sessions[note_id]
+
+
+async def authenticate(scope):
+    """
+    User of a WebSocket connection, from a token query parameter or the
+    session cookie
+    """
+    query = parse_qs(scope.get("query_string", b"").decode())
+    if "token" in query:
+        try:
+            return await aget_token_user(AccessToken(query["token"][0]))
+        except (TokenError, KeyError):
+            return AnonymousUser()
+
+    headers = {
+        name.decode("latin-1"): value.decode("latin-1")
+        for name, value in scope.get("headers", [])
+    }
+    session_key = parse_cookie(headers.get("cookie", "")).get(
+        settings.SESSION_COOKIE_NAME
+    )
+    if session_key is None:
+        return AnonymousUser()
+    # Browsers send cookies with cross-site WebSocket requests
+    origin = headers.get("origin")
+    if origin and urlsplit(origin).netloc != headers.get("host"):
+        return AnonymousUser()
+    session = import_module(settings.SESSION_ENGINE).SessionStore(session_key)
+    return await sync_to_async(get_user)(SimpleNamespace(session=session))
+
+
+async def websocket_application(scope, receive, send):
+    """
+    ASGI application of the collaborative editing WebSocket
+
+    Clients connect to /notes/notes/<id>/collab/ and receive an init message
+    with the content and revision. They then send
+    {"type": "op", "revision": r, "ops": [...]} messages built against
+    revision r; the server answers with an ack, sends other editors' changes
+    as op messages and announces checkpoints with saved messages.
+    """
+    if (await receive())["type"] != "websocket.connect":
+        return
+    match = COLLAB_PATH.match(scope["path"])
+    if match is None:
+        await send({"type": "websocket.close", "code": CLOSE_NOT_FOUND})
+        return
+    note_id = int(match["note_id"])
+
+    user = await authenticate(scope)
+    if not user.is_authenticated:
+        await send({"type": "websocket.close", "code": CLOSE_UNAUTHORIZED})
+        return
+    access = await aget_access(user, note_id)
+    if access is None:
+        await send({"type": "websocket.close", "code": CLOSE_NOT_FOUND})
+        return
+    if access not in CAN_READ:
+        await send({"type": "websocket.close", "code": CLOSE_FORBIDDEN})
+        return
+
+    subscriber = Subscriber(send, access in CAN_WRITE)
+    session = await join(note_id, subscriber)
+    if session is None:
+        await send({"type": "websocket.close", "code": CLOSE_NOT_FOUND})
+        return
+    await send({"type": "websocket.accept"})
+    subscriber.push(
+        {"type": "init", "revision": session.revision, "content": session.content}
+    )
+    sender = asyncio.ensure_future(subscriber.run())
+    sender.add_done_callback(functools.partial(sender_done, session, subscriber))
+    try:
+        while True:
+            message = await receive()
+            if message["type"] == "websocket.disconnect":
+                break
+            try:
+                data = json.loads(message.get("text") or "")
+                if not subscriber.can_write:
+                    raise ValueError("You do not have permission to edit this note")
+                if not isinstance(data, dict) or data.get("type") != "op":
+                    raise ValueError("Invalid message")
+                session.receive(data.get("ops"), data.get("revision"), subscriber)
+            except (TypeError, ValueError) as e:
+                subscriber.push({"type": "error", "error": str(e)})
+    finally:
+        sender.cancel()
+        await leave(note_id, session, subscriber)
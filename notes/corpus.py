@@ -0,0 +1,173 @@
+# Notes Synthetic corpus
+import itertools
+import random
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from notes.blobs import attach
+from notes.changes import record_changes
+from notes.history import build_update
+from notes.models import Note, NoteChange, NoteUpdate
+
+BATCH_SIZE = 500
+
+WORDS = (
+    "note idea meeting draft todo review plan budget team launch report "
+    "design spec client bug fix release sprint goal".split()
+)
+
+
+def make_vocabulary(rng, words):
+    """
+    Build random pseudo words and cumulative Zipf weights, like natural
+    language text
+    """
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    vocabulary = [
+        "".join(rng.choice(letters) for _ in range(rng.randint(3, 9)))
+        for _ in range(words)
+    ]
+    weights = list(itertools.accumulate(1 / rank for rank in range(1, words + 1)))
+    return vocabulary, weights
+
+
+def make_content(rng, size, vocabulary=None):
+    """
+    Build roughly size bytes of line based text
+    """
+    lines = []
+    total = 0
+    while total < size:
+        if vocabulary:
+            words = rng.choices(vocabulary[0], cum_weights=vocabulary[1], k=12)
+        else:
+            words = [rng.choice(WORDS) for _ in range(12)]
+        line = " ".join(words) + "\n"
+        lines.append(line)
+        total += len(line)
+    return "".join(lines)
+
+
+def edit_content(rng, content):
+    """
+    Rewrite one random line of content, like a small user edit
+    """
+    lines = content.splitlines(keepends=True)
+    index = rng.randrange(len(lines))
+    lines[index] = " ".join(rng.choice(WORDS) for _ in range(12)) + "\n"
+    return "".join(lines)
+
+
+class Corpus:
+    """
+    Users and notes seeded by seed_corpus
+
+    Attributes:
+        users (list): seeded users, all with the same password
+        notes (dict): ids of the notes owned by each user, by user id
+        shares (dict): ids of the users each note is shared with, by note id
+    """
+
+    def __init__(self, prefix, password, users, notes, shares):
+        self.prefix = prefix
+        self.password = password
+        self.users = users
+        self.notes = notes
+        self.shares = shares
+
+
+def seed_corpus(
+    prefix="corpus",
+    users=20,
+    notes=20,
+    shares=3,
+    history=10,
+    size=2_000,
+    password="aB@#2022corpus",
+    seed=0,
+):
+    """
+    Create a synthetic corpus of users, notes, shares and history
+
+    Rows are bulk inserted in one transaction. Every note has history
+    versions built from small random edits and is shared with shares
+    other random users.
+
+    Args:
+        prefix (str): username prefix, used by delete_corpus
+        users (int): number of users
+        notes (int): notes owned by each user
+        shares (int): users each note is shared with
+        history (int): versions of each note
+        size (int): approximate content size of a note in bytes
+        password (str): password of every user, hashed once
+        seed (int): random seed, the same parameters give the same corpus
+
+    Returns:
+        Corpus: seeded users and note ids
+    """
+    rng = random.Random(seed)
+    hashed = make_password(password)
+    with transaction.atomic():
+        created = User.objects.bulk_create(
+            User(
+                username=f"{prefix}-{index}",
+                email=f"{prefix}-{index}@example.com",
+                password=hashed,
+            )
+            for index in range(users)
+        )
+        owned = {user.id: [] for user in created}
+        for user in created:
+            contents = []
+            for _ in range(notes):
+                versions = [make_content(rng, size)]
+                for _ in range(history - 1):
+                    versions.append(edit_content(rng, versions[-1]))
+                contents.append(versions)
+            batch = Note.objects.bulk_create(
+                Note(
+                    title=f"note {index} of {user.username}",
+                    content=versions[-1],
+                    owner=user,
+                    version=len(versions),
+                )
+                for index, versions in enumerate(contents)
+            )
+            rows = []
+            for note, versions in zip(batch, contents):
+                owned[user.id].append(note.id)
+                previous = None
+                for version, content in enumerate(versions, start=1):
+                    rows.append(build_update(note, version, content, previous))
+                    previous = content
+            attach(rows)
+            NoteUpdate.objects.bulk_create(rows, batch_size=BATCH_SIZE)
+
+        NoteShare = Note.shared_with.through
+        user_ids = [user.id for user in created]
+        shared = {}
+        for owner_id, note_ids in owned.items():
+            others = [user_id for user_id in user_ids if user_id != owner_id]
+            for note_id in note_ids:
+                shared[note_id] = set(rng.sample(others, min(shares, len(others))))
+        NoteShare.objects.bulk_create(
+            (
+                NoteShare(note_id=note_id, user_id=user_id)
+                for note_id, user_ids in shared.items()
+                for user_id in user_ids
+            ),
+            batch_size=BATCH_SIZE,
+        )
+        record_changes(itertools.chain(*owned.values()), NoteChange.CREATED)
+    return Corpus(prefix, password, created, owned, shared)
+
+
+def delete_corpus(prefix="corpus"):
+    """
+    Delete the users of a corpus (and any user named after its prefix) with
+    their notes
+    """
+    User.objects.filter(username__startswith=f"{prefix}-").delete()
@@ -0,0 +1,59 @@
+# Notes Delta encoding
+import difflib
+import json
+
+
+def encode_delta(base: str, target: str) -> str:
+    """
+    Encode target as a line based delta against base
+
+    The delta is a JSON list of operations applied in order to the lines of
+    base: a positive int copies that many lines, a negative int skips that
+    many lines and a string is inserted verbatim.
+
+    Args:
+        base (str): previous content
+        target (str): new content
+
+    Returns:
+        str: JSON encoded delta
+    """
+    base_lines = base.splitlines(keepends=True)
+    target_lines = target.splitlines(keepends=True)
+    matcher = difflib.SequenceMatcher(None, base_lines, target_lines)
+
+    ops = []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            ops.append(i2 - i1)
+            continue
+        if i2 > i1:
+            ops.append(i1 - i2)
+        if j2 > j1:
+            ops.append("".join(target_lines[j1:j2]))
+    return json.dumps(ops, separators=(",", ":"))
+
+
+def apply_delta(base: str, delta: str) -> str:
+    """
+    Rebuild content from base and a delta produced by encode_delta
+
+    Args:
+        base (str): content the delta was encoded against
+        delta (str): JSON encoded delta
+
+    Returns:
+        str: rebuilt content
+    """
+    base_lines = base.splitlines(keepends=True)
+    position = 0
+    parts = []
+    for op in json.loads(delta):
+        if isinstance(op, str):
+            parts.append(op)
+        elif op >= 0:
+            parts.extend(base_lines[position : position + op])
+            position += op
+        else:
+            position -= op
+    return "".join(parts)
@@ -0,0 +1,93 @@
+# Notes Export
+from django.core.serializers.json import DjangoJSONEncoder
+
+from notes.history import iter_contents
+from notes.models import Note, NoteUpdate
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "json": "application/json",
+}
+
+
+def iter_records(user, chunk_size=500):
+    """
+    Yield every note visible to user followed by its history
+
+    Notes and history rows are read with two server side iterators walked
+    side by side, so memory use does not depend on the size of the corpus.
+
+    Args:
+        user (User): user to export notes for
+        chunk_size (int): rows fetched per database round trip
+
+    Yields:
+        dict: note and update records
+    """
+    notes = Note.objects.visible_to(user)
+    note_rows = notes.order_by("id").values(
+        "id", "title", "content", "version", "owner__username"
+    )
+    updates = (
+        NoteUpdate.objects.filter(note__in=notes.values("id"))
+        .order_by("note_id", "version")
+        .select_related("blob")
+        .only("note_id", "version", "is_keyframe", "content", "timestamp", "blob__data")
+        .iterator(chunk_size=chunk_size)
+    )
+    pending = next(updates, None)
+
+    for note in note_rows.iterator(chunk_size=chunk_size):
+        # Skip history of notes the notes query did not return
+        while pending is not None and pending.note_id < note["id"]:
+            pending = next(updates, None)
+
+        yield {
+            "type": "note",
+            "id": note["id"],
+            "title": note["title"],
+            "content": note["content"],
+            "version": note["version"],
+            "owner": note["owner__username"],
+        }
+
+        def note_updates():
+            nonlocal pending
+            while pending is not None and pending.note_id == note["id"]:
+                yield pending
+                pending = next(updates, None)
+
+        for update, content in iter_contents(note_updates()):
+            yield {
+                "type": "update",
+                "note_id": update.note_id,
+                "version": update.version,
+                "timestamp": update.timestamp,
+                "content": content,
+            }
+
+
+def iter_export(user, format="ndjson", chunk_size=500):
+    """
+    Serialize the export of user's notes chunk by chunk
+
+    Args:
+        user (User): user to export notes for
+        format (str): ndjson (one record per line) or json (a single array)
+        chunk_size (int): rows fetched per database round trip
+
+    Yields:
+        str: pieces of the serialized export
+    """
+    encoder = DjangoJSONEncoder()
+    if format == "ndjson":
+        for record in iter_records(user, chunk_size):
+            yield encoder.encode(record) + "\n"
+        return
+
+    yield "["
+    separator = "\n"
+    for record in iter_records(user, chunk_size):
+        yield separator + encoder.encode(record)
+        separator = ",\n"
+    yield "\n]\n"
@@ -0,0 +1,335 @@
+# Notes History
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from notes.blobs import attach, release
+from notes.cache import cache_notes
+from notes.changes import record_changes
+from notes.delta import apply_delta, encode_delta
+from notes.models import Note, NoteChange, NoteUpdate
+from notes.pagination import paginate
+from notes.tasks import task
+
+
+def get_keyframe_interval() -> int:
+    """
+    Number of versions between two full content keyframes
+
+    Returns:
+        int: 1 when delta storage is disabled, so every row is a keyframe
+    """
+    if not getattr(settings, "NOTES_HISTORY_DELTA", True):
+        return 1
+    return max(1, getattr(settings, "NOTES_HISTORY_KEYFRAME_INTERVAL", 20))
+
+
+def build_update(note, version, content, previous_content=None) -> NoteUpdate:
+    """
+    Build (without saving) the history row for a new version of a note
+
+    Args:
+        note (Note): note the version belongs to
+        version (int): version number of the new row
+        content (str): full content of the new version
+        previous_content (str, optional): content of version - 1, a keyframe
+            is stored when it is not known.
+
+    Returns:
+        NoteUpdate: unsaved history row
+    """
+    if previous_content is None or (version - 1) % get_keyframe_interval() == 0:
+        return NoteUpdate(note=note, version=version, is_keyframe=True, content=content)
+
+    delta = encode_delta(previous_content, content)
+    # A delta bigger than the content itself is not worth storing
+    if len(delta) >= len(content):
+        return NoteUpdate(note=note, version=version, is_keyframe=True, content=content)
+    return NoteUpdate(note=note, version=version, is_keyframe=False, content=delta)
+
+
+def create_with_history(owner, title, content) -> Note:
+    """
+    Create a note and its first history row in one transaction
+
+    Args:
+        owner (User): owner of the note
+        title (str): note title
+        content (str): note content
+
+    Returns:
+        Note: created note, at version 1
+    """
+    with transaction.atomic():
+        note = Note.objects.create(title=title, content=content, owner=owner, version=1)
+        update = build_update(note, 1, content)
+        attach([update])
+        update.save()
+        record_changes([note.id], NoteChange.CREATED, shared=False)
+        cache_notes([note])
+    return note
+
+
+def commit_version(note, content, expected_version=None):
+    """
+    Update a note's content and store the new version in its history
+
+    The note row is only updated if it is still at expected_version, and the
+    history row is written in the same transaction, so concurrent edits can
+    not silently overwrite each other. Saving the current content again
+    writes nothing and returns the current history row.
+
+    Args:
+        note (Note): note being updated, as loaded by the caller
+        content (str): new content of the note
+        expected_version (int, optional): version the client edited, defaults
+            to the version of the loaded note.
+
+    Returns:
+        NoteUpdate: saved history row, or None if the note changed meanwhile
+    """
+    if expected_version is None:
+        expected_version = note.version
+    if expected_version != note.version:
+        return None
+    if content == note.content and expected_version:
+        update = note.updates.filter(version=expected_version).first()
+        if update is not None:
+            return update
+
+    version = expected_version + 1
+    previous_content = note.content if expected_version else None
+    updated_at = timezone.now()
+    with transaction.atomic():
+        updated = Note.objects.filter(id=note.id, version=expected_version).update(
+            content=content, version=version, updated_at=updated_at
+        )
+        if not updated:
+            return None
+        # Deferred deltas are stored as keyframes until encode_update runs
+        defer = previous_content is not None and getattr(
+            settings, "NOTES_HISTORY_DEFER_DELTA", False
+        )
+        update = build_update(
+            note, version, content, None if defer else previous_content
+        )
+        attach([update])
+        update.save()
+        if defer and (version - 1) % get_keyframe_interval():
+            encode_update.delay(update.id)
+        record_changes([note.id], NoteChange.UPDATED)
+        note.content = content
+        note.version = version
+        note.updated_at = updated_at
+        cache_notes([note])
+    return update
+
+
+@task(max_attempts=5)
+def encode_update(update_id):
+    """
+    Store a history row saved as a keyframe by commit_version as a delta
+    against the previous version, like build_update would have
+
+    Args:
+        update_id (int): NoteUpdate to encode, skipped if it is gone or
+            already a delta
+    """
+    update = (
+        NoteUpdate.objects.filter(id=update_id, is_keyframe=True)
+        .select_related("blob")
+        .first()
+    )
+    if update is None:
+        return
+    with transaction.atomic():
+        # Keeps compact_history from removing the previous version meanwhile
+        note = Note.objects.select_for_update().filter(id=update.note_id).first()
+        if note is None:
+            return
+        previous = get_version(note, update.version - 1)
+        if previous is None:
+            return
+        encoded = build_update(note, update.version, update.body, previous[1])
+        if not encoded.is_keyframe:
+            NoteUpdate.objects.filter(id=update.id, is_keyframe=True).update(
+                is_keyframe=False, content=encoded.content, blob=None
+            )
+            release([update.blob_id])
+
+
+def iter_contents(updates):
+    """
+    Rebuild the content of consecutive history rows
+
+    Args:
+        updates (iterable): NoteUpdate rows in ascending version order,
+            starting at a keyframe.
+
+    Yields:
+        tuple: (NoteUpdate, content)
+    """
+    content = None
+    for update in updates:
+        if update.is_keyframe:
+            content = update.body
+        elif content is None:
+            # Chain does not start at a keyframe, nothing to rebuild from
+            continue
+        else:
+            content = apply_delta(content, update.body)
+        yield update, content
+
+
+def keyframe_query(note, version):
+    """
+    Query of the latest keyframe version at or before version
+    """
+    return (
+        note.updates.filter(version__lte=version, is_keyframe=True)
+        .order_by("-version")
+        .values_list("version", flat=True)
+    )
+
+
+def chain_query(note, keyframe, high):
+    """
+    Query of the history rows from a keyframe up to version high
+    """
+    # Not note.updates: the rows would be attached to note, and attaching
+    # them to an unsaved Note(id=...) routes a write, pinning the user to
+    # the primary (see notes.routers)
+    return (
+        NoteUpdate.objects.filter(
+            note_id=note.id, version__gte=keyframe, version__lte=high
+        )
+        .select_related("blob")
+        .order_by("version")
+    )
+
+
+def page_query(note, cursor=None, limit=50, since=None, until=None):
+    """
+    Query of one page (plus one row) of history metadata, newest first
+    """
+    updates = note.updates.all()
+    if cursor is not None:
+        updates = updates.filter(version__lt=cursor)
+    if since is not None:
+        updates = updates.filter(timestamp__gte=since)
+    if until is not None:
+        updates = updates.filter(timestamp__lt=until)
+    return updates.order_by("-version").values("version", "timestamp")[: limit + 1]
+
+
+def fill_contents(rows, chain, low):
+    """
+    Set the rebuilt content of each page row from a history chain
+    """
+    contents = {
+        update.version: content
+        for update, content in iter_contents(chain)
+        if update.version >= low
+    }
+    for row in rows:
+        row["content"] = contents.get(row["version"])
+
+
+def iter_range(note, low, high):
+    """
+    Rebuild the versions low to high of a note
+
+    Args:
+        note (Note): note to rebuild versions for
+        low (int): first version to rebuild
+        high (int): last version to rebuild
+
+    Yields:
+        tuple: (NoteUpdate, content) in ascending version order
+    """
+    keyframe = keyframe_query(note, low).first()
+    if keyframe is None:
+        return
+
+    for update, content in iter_contents(chain_query(note, keyframe, high)):
+        if update.version >= low:
+            yield update, content
+
+
+def get_history_page(
+    note, cursor=None, limit=50, since=None, until=None, with_content=True
+):
+    """
+    Get one page of a note's history, newest first
+
+    Args:
+        note (Note): note to fetch history for
+        cursor (int, optional): only versions older than this one
+        limit (int): page size
+        since (datetime, optional): only versions saved at or after this time
+        until (datetime, optional): only versions saved before this time
+        with_content (bool): rebuild the content of each version
+
+    Returns:
+        tuple: (list of dicts with version, timestamp and content, next cursor)
+    """
+    rows = list(page_query(note, cursor, limit, since, until))
+    rows, next_cursor = paginate(rows, limit, "version")
+    if not with_content or not rows:
+        return rows, next_cursor
+
+    low, high = rows[-1]["version"], rows[0]["version"]
+    keyframe = keyframe_query(note, low).first()
+    chain = chain_query(note, keyframe, high) if keyframe is not None else []
+    fill_contents(rows, chain, low)
+    return rows, next_cursor
+
+
+async def aget_history_page(
+    note, cursor=None, limit=50, since=None, until=None, with_content=True
+):
+    """
+    Async version of get_history_page
+    """
+    rows = [row async for row in page_query(note, cursor, limit, since, until)]
+    rows, next_cursor = paginate(rows, limit, "version")
+    if not with_content or not rows:
+        return rows, next_cursor
+
+    low, high = rows[-1]["version"], rows[0]["version"]
+    keyframe = await keyframe_query(note, low).afirst()
+    chain = []
+    if keyframe is not None:
+        chain = [update async for update in chain_query(note, keyframe, high)]
+    fill_contents(rows, chain, low)
+    return rows, next_cursor
+
+
+def get_version(note, version):
+    """
+    Rebuild a single version of a note
+
+    Args:
+        note (Note): note to rebuild the version for
+        version (int): version number to rebuild
+
+    Returns:
+        tuple: (NoteUpdate, content), or None if the version does not exist
+    """
+    for update, content in iter_range(note, version, version):
+        return update, content
+    return None
+
+
+async def aget_version(note, version):
+    """
+    Async version of get_version
+    """
+    keyframe = await keyframe_query(note, version).afirst()
+    if keyframe is None:
+        return None
+    chain = [update async for update in chain_query(note, keyframe, version)]
+    for update, content in iter_contents(chain):
+        if update.version == version:
+            return update, content
+    return None
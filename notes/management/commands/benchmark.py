@@ -0,0 +1,48 @@
+# Benchmark command
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from notes.benchmarks import BENCHMARKS
+
+
+class Command(BaseCommand):
+    """
+    Run one of the notes benchmarks and print its results as JSON
+
+    Example:
+        python manage.py benchmark history -p size=200000 -p edits=500
+    """
+
+    help = "Run a notes benchmark and print the results as JSON"
+
+    def add_arguments(self, parser):
+        parser.add_argument("suite", choices=sorted(BENCHMARKS))
+        parser.add_argument(
+            "-p",
+            "--param",
+            action="append",
+            default=[],
+            help="Benchmark parameter as key=value, can be repeated",
+        )
+        parser.add_argument("-o", "--output", help="Output file, defaults to stdout")
+
+    def handle(self, *args, **options):
+        params = {}
+        for param in options["param"]:
+            key, sep, value = param.partition("=")
+            if not sep:
+                raise CommandError(f"Invalid parameter {param!r}, expected key=value")
+            params[key] = int(value) if value.lstrip("-").isdigit() else value
+
+        try:
+            results = BENCHMARKS[options["suite"]](**params)
+        except TypeError as e:
+            raise CommandError(str(e))
+
+        output = json.dumps(results, indent=2, default=str)
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as file:
+                file.write(output + "\n")
+        else:
+            self.stdout.write(output)
@@ -0,0 +1,49 @@
+# Compact history command
+from django.core.management.base import BaseCommand, CommandError
+
+from notes.changes import prune_changes
+from notes.retention import compact_history
+
+
+class Command(BaseCommand):
+    """
+    Apply the NOTES_HISTORY_RETENTION policy to the history of every note,
+    and prune the change log past NOTES_CHANGES_RETENTION days
+
+    Safe to run while notes are edited; each batch of history rows is
+    compacted in its own short transaction.
+
+    Example:
+        python manage.py compact_history --batch-size 500 --dry-run
+    """
+
+    help = "Delete note versions past the history retention policy"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Report what would be reclaimed without changing anything",
+        )
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be a positive integer")
+
+        totals = {"notes": 0, "deleted": 0, "rewritten": 0, "bytes": 0}
+        for totals in compact_history(
+            batch=options["batch_size"], dry_run=options["dry_run"]
+        ):
+            if options["verbosity"] > 1:
+                self.stdout.write(f"{totals['notes']} notes compacted")
+
+        prefix = "Would reclaim" if options["dry_run"] else "Reclaimed"
+        self.stdout.write(
+            f"{prefix} {totals['bytes']} bytes from {totals['notes']} notes: "
+            f"{totals['deleted']} versions deleted, "
+            f"{totals['rewritten']} re-encoded"
+        )
+        pruned = prune_changes(batch=options["batch_size"], dry_run=options["dry_run"])
+        prefix = "Would prune" if options["dry_run"] else "Pruned"
+        self.stdout.write(f"{prefix} {pruned} change log rows")
@@ -0,0 +1,38 @@
+# Export notes command
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from notes.export import EXPORT_FORMATS, iter_export
+
+
+class Command(BaseCommand):
+    """
+    Export every note a user owns or can see, with its history
+
+    Example:
+        python manage.py export_notes johnwick --format ndjson -o notes.ndjson
+    """
+
+    help = "Export a user's notes and their history as NDJSON or JSON"
+
+    def add_arguments(self, parser):
+        parser.add_argument("username")
+        parser.add_argument(
+            "--format", choices=sorted(EXPORT_FORMATS), default="ndjson"
+        )
+        parser.add_argument("-o", "--output", help="Output file, defaults to stdout")
+        parser.add_argument("--chunk-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options["username"])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['username']!r} does not exist")
+
+        chunks = iter_export(user, options["format"], options["chunk_size"])
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as output:
+                output.writelines(chunks)
+        else:
+            for chunk in chunks:
+                self.stdout.write(chunk, ending="")
@@ -0,0 +1,31 @@
+# Profile token command
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from notes.models import RequestProfile
+from notes.profiling import PROFILE_HEADER, make_token
+
+
+class Command(BaseCommand):
+    """
+    Print a signed X-Notes-Profile header to profile requests on demand
+
+    Example:
+        curl -H "$(python manage.py profile_token --mode sample)" ...
+    """
+
+    help = "Print a header enabling the profiler for the requests sending it"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--mode",
+            choices=[mode for mode, _ in RequestProfile.MODE_CHOICES],
+            default=RequestProfile.CPROFILE,
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{PROFILE_HEADER}: {make_token(options['mode'])}")
+        self.stderr.write(
+            f"Valid for {settings.NOTES_PROFILE_TOKEN_MAX_AGE} seconds, "
+            "the profile id is returned in the X-Notes-Profile-Id header"
+        )
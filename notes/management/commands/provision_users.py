@@ -0,0 +1,75 @@
+# Provision users command
+import csv
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from auth.users import provision_users
+
+FORMATS = ("csv", "ndjson")
+
+
+def read_rows(file, file_format):
+    """
+    Users of a CSV file with a header row, or of NDJSON objects
+    """
+    if file_format == "csv":
+        # Empty password cells leave the password unusable
+        return [
+            {**row, "password": row.get("password") or None}
+            for row in csv.DictReader(file)
+        ]
+    return [json.loads(line) for line in file if line.strip()]
+
+
+class Command(BaseCommand):
+    """
+    Create users from a file, in batches with one password hash per user
+
+    Rows have username, email, and optional first_name, last_name and
+    password columns. Invalid rows and users that already exist are
+    reported and skipped.
+
+    Example:
+        python manage.py provision_users staff.csv --batch-size 1000
+    """
+
+    help = "Create many users from a CSV or NDJSON file"
+
+    def add_arguments(self, parser):
+        parser.add_argument("file", help="CSV or NDJSON file, - for stdin")
+        parser.add_argument(
+            "--format",
+            choices=FORMATS,
+            help="File format, guessed from the extension by default",
+        )
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be a positive integer")
+        path = options["file"]
+        file_format = options["format"] or (
+            "ndjson" if path.endswith((".ndjson", ".jsonl")) else "csv"
+        )
+        try:
+            if path == "-":
+                rows = read_rows(sys.stdin, file_format)
+            else:
+                with open(path, encoding="utf-8", newline="") as file:
+                    rows = read_rows(file, file_format)
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Cannot read {path}: {e}")
+
+        for totals in provision_users(rows, options["batch_size"]):
+            if options["verbosity"] > 1:
+                self.stdout.write(f"{totals['created']} users created")
+        for row in totals["invalid"]:
+            self.stderr.write(f"Row {row['row']} is invalid: {row['errors']}")
+        for row in totals["skipped"]:
+            self.stderr.write(f"Row {row['row']} skipped: {row['reason']}")
+        self.stdout.write(
+            f"Created {totals['created']} users, skipped {len(totals['skipped'])}, "
+            f"{len(totals['invalid'])} invalid"
+        )
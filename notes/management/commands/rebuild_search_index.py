@@ -0,0 +1,38 @@
+# Rebuild search index command
+from django.core.management.base import BaseCommand, CommandError
+
+from notes.search import get_search_backend
+
+
+class Command(BaseCommand):
+    """
+    Recreate the notes search index and re-index every note
+
+    Run it after restoring a backup or after a migration rebuilt the
+    notes_note table (SQLite drops the index triggers in that case). With
+    --check, only report missing index structures, see
+    notes.search.check_search_index.
+    """
+
+    help = "Recreate the notes search index and re-index every note"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--database", default="default")
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Exit with an error if index structures are missing",
+        )
+
+    def handle(self, *args, **options):
+        backend = get_search_backend(options["database"])
+        if options["check"]:
+            missing = backend.missing()
+            if missing:
+                raise CommandError(f"Missing search index: {', '.join(missing)}")
+            self.stdout.write(f"Search index of {type(backend).__name__} is complete")
+            return
+        backend.uninstall()
+        backend.install()
+        backend.rebuild()
+        self.stdout.write(f"Rebuilt search index with {type(backend).__name__}")
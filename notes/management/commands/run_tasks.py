@@ -0,0 +1,116 @@
+# Run tasks command
+import multiprocessing
+import signal
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import close_old_connections, connections
+
+from notes.tasks import DatabaseBackend, get_backend, metrics
+
+
+class Command(BaseCommand):
+    """
+    Run the jobs queued by notes.tasks.DatabaseBackend
+
+    Every worker process polls the queue and runs due jobs until it gets
+    SIGINT or SIGTERM, then finishes its current job. With several
+    processes, the supervisor forwards SIGINT and SIGTERM to the workers
+    and waits for them, so no job is left running.
+
+    Example:
+        python manage.py run_tasks --processes 4
+    """
+
+    help = "Run the background jobs queued in the database"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--processes", type=int, default=1, help="Number of worker processes"
+        )
+        parser.add_argument(
+            "--batch", type=int, default=10, help="Jobs claimed at once"
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=1.0,
+            help="Seconds to wait when the queue is empty",
+        )
+        parser.add_argument(
+            "--once", action="store_true", help="Exit once the queue is empty"
+        )
+
+    def handle(self, *args, **options):
+        backend = get_backend()
+        if not isinstance(backend, DatabaseBackend):
+            raise CommandError(
+                "NOTES_TASKS_BACKEND must be notes.tasks.DatabaseBackend"
+            )
+
+        if options["processes"] <= 1:
+            self.work(backend, options)
+            return
+
+        # Children must not share the parent's database connections
+        connections.close_all()
+        context = multiprocessing.get_context("fork")
+        workers = [
+            context.Process(target=self.work, args=(backend, options))
+            for _ in range(options["processes"])
+        ]
+        for worker in workers:
+            worker.start()
+
+        def stop(signum, frame):
+            # Workers finish their current job, then exit
+            for worker in workers:
+                if worker.is_alive():
+                    worker.terminate()
+
+        handlers = {
+            signum: signal.signal(signum, stop)
+            for signum in (signal.SIGINT, signal.SIGTERM)
+        }
+        try:
+            for worker in workers:
+                worker.join()
+        finally:
+            for signum, handler in handlers.items():
+                signal.signal(signum, handler)
+
+    def work(self, backend, options):
+        stopping = []
+        handlers = {
+            signum: signal.signal(signum, lambda *args: stopping.append(True))
+            for signum in (signal.SIGINT, signal.SIGTERM)
+        }
+
+        metrics.reset()
+        try:
+            while not stopping:
+                ran = backend.run_pending(
+                    limit=options["batch"], batch=options["batch"]
+                )
+                # Drops connections past CONN_MAX_AGE or broken by a job
+                close_old_connections()
+                if ran:
+                    continue
+                if options["once"]:
+                    break
+                time.sleep(options["sleep"])
+        finally:
+            for signum, handler in handlers.items():
+                signal.signal(signum, handler)
+
+        for name, counters in sorted(metrics.snapshot().items()):
+            self.stdout.write(
+                f"{name}: {counters['succeeded']} succeeded, "
+                f"{counters['retried']} retried, {counters['failed']} failed "
+                f"in {counters['seconds']:.3f}s"
+            )
+        stats = backend.queue_stats()
+        self.stdout.write(
+            "Queue: "
+            + ", ".join(f"{count} {status}" for status, count in stats.items())
+        )
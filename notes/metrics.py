@@ -0,0 +1,399 @@
+# Notes Metrics
+import bisect
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+# Metrics of the request being served, see MetricsMiddleware
+request_metrics = contextvars.ContextVar("notes_request_metrics", default=None)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (100, 1000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+# name: (type, help, histogram buckets)
+METRICS = {
+    "notes_http_requests_total": (
+        "counter",
+        "Requests served, by URL name, method and status code",
+        None,
+    ),
+    "notes_http_request_duration_seconds": (
+        "histogram",
+        "Time to build the response, by URL name",
+        LATENCY_BUCKETS,
+    ),
+    "notes_http_response_size_bytes": (
+        "histogram",
+        "Size of non-streaming response bodies, by URL name",
+        SIZE_BUCKETS,
+    ),
+    "notes_db_queries_per_request": (
+        "histogram",
+        "Database queries run by a request, by URL name",
+        QUERY_BUCKETS,
+    ),
+    "notes_db_query_duration_seconds_total": (
+        "counter",
+        "Time spent in database queries, by URL name",
+        None,
+    ),
+    "notes_cache_requests_total": (
+        "counter",
+        "Cache lookups made while serving requests, by URL name, cache and result",
+        None,
+    ),
+    "notes_tasks_total": (
+        "counter",
+        "Background tasks enqueued, succeeded, retried and failed, by task name",
+        None,
+    ),
+    "notes_task_duration_seconds_total": (
+        "counter",
+        "Time spent running background tasks, by task name",
+        None,
+    ),
+    "notes_tasks_queued": (
+        "gauge",
+        "Jobs of the database task queue, by status",
+        None,
+    ),
+}
+
+# URL name of requests that matched no route, so paths never become labels
+UNMATCHED = "unmatched"
+
+# Method label of the requests using another verb, so clients can't add series
+HTTP_METHODS = ("GET", "HEAD", "POST", "PUT", "PATCH", "DELETE", "OPTIONS")
+OTHER_METHOD = "other"
+
+
+class Registry:
+    """
+    Thread safe counters and histograms of this process
+
+    Samples are keyed by metric name and a tuple of (label, value) pairs.
+    With NOTES_METRICS_DIR set, each process writes its samples to a file
+    of that directory, at most every NOTES_METRICS_FLUSH_INTERVAL seconds,
+    and the scrape endpoint adds up the files of every worker.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.counters = {}
+        self.histograms = {}
+        # Forked workers start from empty samples in a file of their own
+        self.pid = os.getpid()
+        self.path = None
+        self.timer = None
+
+    def check_fork(self):
+        if self.pid != os.getpid():
+            self.reset()
+
+    def inc(self, name, labels, value=1):
+        with self.lock:
+            self.check_fork()
+            key = (name, labels)
+            self.counters[key] = self.counters.get(key, 0) + value
+            self.schedule_flush()
+
+    def observe(self, name, labels, value):
+        with self.lock:
+            self.check_fork()
+            key = (name, labels)
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                buckets = len(METRICS[name][2]) + 1
+                histogram = self.histograms[key] = [[0] * buckets, 0, 0]
+            # Per bucket counts, made cumulative when rendered
+            histogram[0][bisect.bisect_left(METRICS[name][2], value)] += 1
+            histogram[1] += value
+            histogram[2] += 1
+            self.schedule_flush()
+
+    def snapshot(self):
+        """
+        JSON serializable copy of the samples of this process
+        """
+        with self.lock:
+            self.check_fork()
+            return {
+                "counters": [
+                    [name, labels, value]
+                    for (name, labels), value in self.counters.items()
+                ],
+                "histograms": [
+                    [name, labels, list(histogram[0]), *histogram[1:]]
+                    for (name, labels), histogram in self.histograms.items()
+                ],
+            }
+
+    def schedule_flush(self):
+        """
+        Write the samples to NOTES_METRICS_DIR shortly, called with the lock
+        """
+        if get_metrics_dir() is None or self.timer is not None:
+            return
+        self.timer = threading.Timer(
+            getattr(settings, "NOTES_METRICS_FLUSH_INTERVAL", 1), self.flush
+        )
+        self.timer.daemon = True
+        self.timer.start()
+
+    def flush(self):
+        """
+        Write the samples of this process to its file of NOTES_METRICS_DIR
+        """
+        directory = get_metrics_dir()
+        if directory is None:
+            return
+        with self.flush_lock:
+            with self.lock:
+                self.check_fork()
+                # Samples added from now on schedule another flush
+                self.timer = None
+                if self.path is None:
+                    name = f"metrics-{self.pid}-{uuid.uuid4().hex}.json"
+                    self.path = directory / name
+                path = self.path
+            data = self.snapshot()
+            directory.mkdir(parents=True, exist_ok=True)
+            # Scrapes never read a partly written file
+            temp = path.with_suffix(".tmp")
+            temp.write_text(json.dumps(data))
+            os.replace(temp, path)
+
+
+registry = Registry()
+
+
+def get_metrics_dir():
+    directory = getattr(settings, "NOTES_METRICS_DIR", None)
+    return Path(directory) if directory else None
+
+
+def merge(snapshots):
+    """
+    Add up the samples of several processes
+
+    Args:
+        snapshots (iterable): Registry.snapshot results
+
+    Returns:
+        tuple: ({(name, labels): value}, {(name, labels): [counts, sum, count]})
+    """
+    counters, histograms = {}, {}
+    for snapshot in snapshots:
+        for name, labels, value in snapshot["counters"]:
+            key = (name, tuple(map(tuple, labels)))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, counts, total, count in snapshot["histograms"]:
+            key = (name, tuple(map(tuple, labels)))
+            histogram = histograms.setdefault(key, [[0] * len(counts), 0, 0])
+            histogram[0] = [a + b for a, b in zip(histogram[0], counts)]
+            histogram[1] += total
+            histogram[2] += count
+    return counters, histograms
+
+
+def collect():
+    """
+    Samples of every process sharing NOTES_METRICS_DIR, or of this process
+    """
+    directory = get_metrics_dir()
+    if directory is None:
+        return merge([registry.snapshot()])
+    registry.flush()
+    snapshots = []
+    for path in directory.glob("metrics-*.json"):
+        try:
+            snapshots.append(json.loads(path.read_text()))
+        except (OSError, ValueError):
+            # Removed by a cleanup while scraping
+            continue
+    return merge(snapshots)
+
+
+def collect_gauges():
+    """
+    Gauges read when scraping: the jobs of the task queue by status, when
+    the task backend keeps one
+    """
+    # notes.tasks records its counters in this module
+    from notes.tasks import get_backend
+
+    queue_stats = getattr(get_backend(), "queue_stats", None)
+    if queue_stats is None:
+        return {}
+    return {
+        ("notes_tasks_queued", (("status", status),)): count
+        for status, count in queue_stats().items()
+    }
+
+
+def escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{escape(value)}"' for name, value in labels) + "}"
+
+
+def format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render():
+    """
+    Samples in the Prometheus text exposition format (version 0.0.4)
+    """
+    counters, histograms = collect()
+    gauges = collect_gauges()
+    lines = []
+    for name, (kind, help_text, buckets) in METRICS.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        if kind in ("counter", "gauge"):
+            samples = counters if kind == "counter" else gauges
+            for (sample, labels), value in sorted(samples.items()):
+                if sample == name:
+                    lines.append(f"{name}{format_labels(labels)} {format_value(value)}")
+            continue
+        for (sample, labels), (counts, total, count) in sorted(histograms.items()):
+            if sample != name:
+                continue
+            cumulative = 0
+            for bound, bucket_count in zip([*buckets, "+Inf"], counts):
+                cumulative += bucket_count
+                bucket_labels = format_labels(labels + (("le", bound),))
+                lines.append(f"{name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{name}_sum{format_labels(labels)} {format_value(total)}")
+            lines.append(f"{name}_count{format_labels(labels)} {count}")
+    return "\n".join(lines) + "\n"
+
+
+def record_cache(cache, hit):
+    """
+    Count a cache lookup of the request being served
+
+    Args:
+        cache (str): cache name, e.g. "note" or "permission"
+        hit (bool): whether the value was found in the cache
+    """
+    state = request_metrics.get()
+    if state is None:
+        return
+    key = (cache, "hit" if hit else "miss")
+    state["cache"][key] = state["cache"].get(key, 0) + 1
+
+
+def measure_query(execute, sql, params, many, context):
+    """
+    Database execute wrapper counting the queries of the request being served
+    """
+    state = request_metrics.get()
+    if state is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        state["queries"] += 1
+        state["query_seconds"] += time.perf_counter() - start
+
+
+def install_query_wrapper(sender, connection, **kwargs):
+    """
+    connection_created receiver adding measure_query to new connections,
+    connected in NotesConfig.ready
+    """
+    if measure_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(measure_query)
+
+
+class MetricsMiddleware:
+    """
+    Record the latency, response size, database queries and cache lookups of
+    every request, labelled by URL name, see notes.metrics.render
+
+    Queries and cache lookups are counted through a context variable, so
+    the ones run in sync_to_async threads of async views are included.
+    Place it first to time the other middlewares as well.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        state, token = self.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            request_metrics.reset(token)
+        return self.finish(request, state, response)
+
+    async def __acall__(self, request):
+        state, token = self.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            request_metrics.reset(token)
+        return self.finish(request, state, response)
+
+    def start(self):
+        state = {
+            "start": time.perf_counter(),
+            "queries": 0,
+            "query_seconds": 0.0,
+            "cache": {},
+        }
+        return state, request_metrics.set(state)
+
+    def finish(self, request, state, response):
+        duration = time.perf_counter() - state["start"]
+        match = getattr(request, "resolver_match", None)
+        view = (match.url_name if match else None) or UNMATCHED
+        labels = (("view", view),)
+        method = request.method if request.method in HTTP_METHODS else OTHER_METHOD
+        registry.inc(
+            "notes_http_requests_total",
+            labels + (("method", method), ("status", str(response.status_code))),
+        )
+        registry.observe("notes_http_request_duration_seconds", labels, duration)
+        if not response.streaming:
+            registry.observe(
+                "notes_http_response_size_bytes", labels, len(response.content)
+            )
+        registry.observe("notes_db_queries_per_request", labels, state["queries"])
+        if state["query_seconds"]:
+            registry.inc(
+                "notes_db_query_duration_seconds_total", labels, state["query_seconds"]
+            )
+        for (cache, result), count in state["cache"].items():
+            registry.inc(
+                "notes_cache_requests_total",
+                labels + (("cache", cache), ("result", result)),
+                count,
+            )
+        return response
@@ -0,0 +1,72 @@
+# Generated by Django 5.0.2 on 2026-10-18 19:37
+
+from django.conf import settings
+from django.db import migrations, models
+
+from notes.delta import apply_delta, encode_delta
+
+
+def compress_history(apps, schema_editor):
+    """
+    Number existing history rows and turn them into keyframes + deltas
+    """
+    NoteUpdate = apps.get_model("notes", "NoteUpdate")
+    interval = 1
+    if getattr(settings, "NOTES_HISTORY_DELTA", True):
+        interval = max(1, getattr(settings, "NOTES_HISTORY_KEYFRAME_INTERVAL", 20))
+
+    note_ids = NoteUpdate.objects.values_list("note_id", flat=True).distinct()
+    for note_id in note_ids.iterator():
+        previous_content = None
+        updates = NoteUpdate.objects.filter(note_id=note_id).order_by("timestamp", "id")
+        for version, update in enumerate(updates.iterator(), start=1):
+            content = update.content
+            update.version = version
+            update.is_keyframe = True
+            if previous_content is not None and (version - 1) % interval != 0:
+                delta = encode_delta(previous_content, content)
+                if len(delta) < len(content):
+                    update.is_keyframe = False
+                    update.content = delta
+            update.save(update_fields=["version", "is_keyframe", "content"])
+            previous_content = content
+
+
+def expand_history(apps, schema_editor):
+    """
+    Store the full content on every history row again
+    """
+    NoteUpdate = apps.get_model("notes", "NoteUpdate")
+    note_ids = NoteUpdate.objects.values_list("note_id", flat=True).distinct()
+    for note_id in note_ids.iterator():
+        content = None
+        updates = NoteUpdate.objects.filter(note_id=note_id).order_by("version")
+        for update in updates.iterator():
+            if update.is_keyframe:
+                content = update.content
+                continue
+            content = apply_delta(content or "", update.content)
+            update.is_keyframe = True
+            update.content = content
+            update.save(update_fields=["is_keyframe", "content"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("notes", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="noteupdate",
+            name="is_keyframe",
+            field=models.BooleanField(default=True),
+        ),
+        migrations.AddField(
+            model_name="noteupdate",
+            name="version",
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.RunPython(compress_history, expand_history),
+    ]
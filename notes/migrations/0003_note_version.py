@@ -0,0 +1,36 @@
+# Generated by Django 5.0.2 on 2026-10-18 19:52
+
+from django.db import migrations, models
+from django.db.models import Max, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_version(apps, schema_editor):
+    """
+    Set each note's version to the latest version in its history
+    """
+    Note = apps.get_model("notes", "Note")
+    NoteUpdate = apps.get_model("notes", "NoteUpdate")
+    latest = (
+        NoteUpdate.objects.filter(note_id=OuterRef("pk"))
+        .values("note_id")
+        .annotate(latest=Max("version"))
+        .values("latest")
+    )
+    Note.objects.update(version=Coalesce(Subquery(latest), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("notes", "0002_noteupdate_delta_history"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="note",
+            name="version",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_version, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.0.2 on 2026-10-18 19:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("notes", "0003_note_version"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="noteupdate",
+            index=models.Index(
+                fields=["note", "timestamp"], name="noteupdate_note_time_idx"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="noteupdate",
+            constraint=models.UniqueConstraint(
+                fields=("note", "version"), name="noteupdate_note_version_unique"
+            ),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.2 on 2026-10-18 19:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("notes", "0004_noteupdate_history_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="note",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.0.2 on 2026-10-18 20:05
+
+from django.db import migrations
+
+from notes.search import get_search_backend
+
+
+def install_search_index(apps, schema_editor):
+    """
+    Create and fill the search index of the database, if it has one
+    """
+    backend = get_search_backend(schema_editor.connection.alias)
+    backend.install()
+    backend.rebuild()
+
+
+def uninstall_search_index(apps, schema_editor):
+    get_search_backend(schema_editor.connection.alias).uninstall()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("notes", "0005_note_updated_at"),
+    ]
+
+    operations = [
+        migrations.RunPython(install_search_index, uninstall_search_index),
+    ]
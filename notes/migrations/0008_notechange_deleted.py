@@ -0,0 +1,27 @@
+# Generated by Django 5.0.2 on 2026-10-18 20:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("notes", "0007_notechange"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="notechange",
+            name="kind",
+            field=models.CharField(
+                choices=[
+                    ("created", "Created"),
+                    ("updated", "Updated"),
+                    ("shared", "Shared"),
+                    ("unshared", "Unshared"),
+                    ("deleted", "Deleted"),
+                ],
+                max_length=10,
+            ),
+        ),
+    ]
@@ -0,0 +1,92 @@
+# Generated by Django 5.0.2 on 2026-10-18 21:07
+
+import hashlib
+import zlib
+from collections import Counter
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+BATCH_SIZE = 500
+
+
+def move_keyframes(apps, schema_editor):
+    """
+    Store the content of existing keyframes in shared blobs
+    """
+    Blob = apps.get_model("notes", "Blob")
+    NoteUpdate = apps.get_model("notes", "NoteUpdate")
+    keyframes = NoteUpdate.objects.filter(is_keyframe=True, blob__isnull=True)
+    while True:
+        updates = list(keyframes.order_by("id")[:BATCH_SIZE])
+        if not updates:
+            return
+        hashes = [
+            hashlib.sha256(update.content.encode()).hexdigest() for update in updates
+        ]
+        existing = set(
+            Blob.objects.filter(hash__in=hashes).values_list("hash", flat=True)
+        )
+        blobs = {}
+        for update, hash in zip(updates, hashes):
+            if hash not in existing and hash not in blobs:
+                data = update.content.encode()
+                blobs[hash] = Blob(hash=hash, data=zlib.compress(data), size=len(data))
+            update.blob_id = hash
+            update.content = ""
+        Blob.objects.bulk_create(blobs.values())
+        for hash, count in Counter(hashes).items():
+            Blob.objects.filter(hash=hash).update(refcount=models.F("refcount") + count)
+        NoteUpdate.objects.bulk_update(updates, ["blob", "content"])
+
+
+def restore_keyframes(apps, schema_editor):
+    """
+    Store the content of keyframes on their row again
+    """
+    Blob = apps.get_model("notes", "Blob")
+    NoteUpdate = apps.get_model("notes", "NoteUpdate")
+    keyframes = NoteUpdate.objects.filter(blob__isnull=False).select_related("blob")
+    while True:
+        updates = list(keyframes.order_by("id")[:BATCH_SIZE])
+        if not updates:
+            break
+        for update in updates:
+            update.content = zlib.decompress(bytes(update.blob.data)).decode()
+            update.blob = None
+        NoteUpdate.objects.bulk_update(updates, ["blob", "content"])
+    Blob.objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("notes", "0009_job"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Blob",
+            fields=[
+                (
+                    "hash",
+                    models.CharField(max_length=64, primary_key=True, serialize=False),
+                ),
+                ("data", models.BinaryField()),
+                ("size", models.PositiveIntegerField()),
+                ("refcount", models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AddField(
+            model_name="noteupdate",
+            name="blob",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.PROTECT,
+                related_name="updates",
+                to="notes.blob",
+            ),
+        ),
+        migrations.RunPython(move_keyframes, restore_keyframes),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.0.2 on 2026-10-18 21:25
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("notes", "0010_blob"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RequestProfile",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "mode",
+                    models.CharField(
+                        choices=[("cprofile", "cProfile"), ("sample", "Sampling")],
+                        max_length=10,
+                    ),
+                ),
+                ("method", models.CharField(max_length=10)),
+                ("path", models.TextField()),
+                ("view", models.CharField(blank=True, max_length=200)),
+                ("status", models.PositiveIntegerField()),
+                ("duration", models.FloatField()),
+                ("stats", models.BinaryField(blank=True, null=True)),
+                ("stacks", models.TextField(blank=True)),
+                ("queries", models.JSONField(default=list)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "user",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+    ]
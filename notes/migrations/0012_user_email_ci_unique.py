@@ -0,0 +1,51 @@
+# Generated by Django 5.0.2 on 2026-10-18 21:58
+
+from django.db import migrations
+from django.db.models import Count
+from django.db.models.functions import Lower
+
+# auth_user belongs to django.contrib.auth, and the local auth package that
+# relies on this index (auth.users.EMAIL_INDEX) is not an installed app, so
+# the index is created by the notes app. Deployments that drop the notes
+# app must keep this migration. Empty emails (users created without one)
+# may repeat.
+CREATE_INDEX = """
+    CREATE UNIQUE INDEX auth_user_email_ci_uniq
+    ON auth_user (LOWER(email)) WHERE email <> ''
+"""
+
+DROP_INDEX = "DROP INDEX auth_user_email_ci_uniq"
+
+
+def check_duplicate_emails(apps, schema_editor):
+    """
+    Fail with the emails to fix instead of an opaque IntegrityError
+    """
+    User = apps.get_model("auth", "User")
+    duplicates = list(
+        User.objects.using(schema_editor.connection.alias)
+        .exclude(email="")
+        .annotate(email_lower=Lower("email"))
+        .values("email_lower")
+        .annotate(count=Count("id"))
+        .filter(count__gt=1)
+        .values_list("email_lower", flat=True)[:20]
+    )
+    if duplicates:
+        raise RuntimeError(
+            "Several users share these emails (ignoring case), give them "
+            f"distinct emails before migrating: {', '.join(duplicates)}"
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("auth", "0012_alter_user_first_name_max_length"),
+        ("notes", "0011_requestprofile"),
+    ]
+
+    operations = [
+        migrations.RunPython(check_duplicate_emails, migrations.RunPython.noop),
+        migrations.RunSQL(CREATE_INDEX, DROP_INDEX),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.0.2 on 2026-10-18 23:10
+
+from django.db import migrations
+
+from notes.search import PostgresSearchBackend, get_search_backend
+
+
+def install_search_index(apps, schema_editor):
+    """
+    Create the PostgreSQL search index of databases that applied 0006
+    before PostgreSQL had a search backend
+    """
+    backend = get_search_backend(schema_editor.connection.alias)
+    if isinstance(backend, PostgresSearchBackend):
+        backend.install()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("notes", "0012_user_email_ci_unique"),
+    ]
+
+    operations = [
+        # 0006 drops the index when unapplied
+        migrations.RunPython(install_search_index, migrations.RunPython.noop),
+    ]
@@ -1,8 +1,28 @@
 # Notes Models
+import zlib
+
 from django.contrib.auth.models import User
 from django.db import models
 
 
+class NoteQuerySet(models.QuerySet):
+    """
+    NoteQuerySet class
+    """
+
+    def visible_to(self, user):
+        """
+        Notes owned by or shared with user
+
+        Shares are matched through a subquery on the share table, so the
+        result needs no DISTINCT. Only user.id is read, so token users work.
+        """
+        shared = Note.shared_with.through.objects.filter(user_id=user.id).values(
+            "note_id"
+        )
+        return self.filter(models.Q(owner_id=user.id) | models.Q(id__in=shared))
+
+
 # Create your models here.
 class Note(models.Model):
     """
@@ -13,16 +33,176 @@ class Note(models.Model):
     content = models.TextField()
     owner = models.ForeignKey(User, on_delete=models.CASCADE)
     shared_with = models.ManyToManyField(User, related_name="notes_shared", blank=True)
+    # Latest version stored in history, bumped by every successful update
+    version = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = NoteQuerySet.as_manager()
 
     def __str__(self) -> str:
         return self.title
 
 
+class Blob(models.Model):
+    """
+    Blob class
+
+    Content addressed, compressed text shared by every history row storing
+    it. refcount is the number of those rows, see notes.blobs.
+    """
+
+    # SHA-256 of the UTF-8 text
+    hash = models.CharField(max_length=64, primary_key=True)
+    # zlib compressed UTF-8 text
+    data = models.BinaryField()
+    size = models.PositiveIntegerField()
+    refcount = models.PositiveIntegerField(default=0)
+
+    @property
+    def text(self) -> str:
+        return zlib.decompress(bytes(self.data)).decode()
+
+
 class NoteUpdate(models.Model):
     """
     NoteUpdate class
+
+    A keyframe row stores the full note content, every other row stores a
+    delta (see notes.delta) against the version right before it. Keyframes
+    written by notes.history keep their content in a Blob.
     """
 
     note = models.ForeignKey(Note, related_name="updates", on_delete=models.CASCADE)
+    version = models.PositiveIntegerField(default=1)
+    is_keyframe = models.BooleanField(default=True)
+    # Empty when the content is stored in blob
     content = models.TextField()
+    blob = models.ForeignKey(
+        Blob,
+        related_name="updates",
+        null=True,
+        blank=True,
+        on_delete=models.PROTECT,
+    )
+    timestamp = models.DateTimeField(auto_now_add=True)
+
+    @property
+    def body(self) -> str:
+        """
+        Full content of a keyframe or delta of this row, wherever it is stored
+        """
+        return self.blob.text if self.blob_id else self.content
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["note", "version"], name="noteupdate_note_version_unique"
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["note", "timestamp"], name="noteupdate_note_time_idx"),
+        ]
+
+
+class NoteChange(models.Model):
+    """
+    NoteChange class
+
+    Append only log of the changes to the notes visible to a user. The auto
+    incremented id is the cursor of the user's change feed.
+    """
+
+    CREATED = "created"
+    UPDATED = "updated"
+    SHARED = "shared"
+    UNSHARED = "unshared"
+    DELETED = "deleted"
+    KIND_CHOICES = [
+        (CREATED, "Created"),
+        (UPDATED, "Updated"),
+        (SHARED, "Shared"),
+        (UNSHARED, "Unshared"),
+        (DELETED, "Deleted"),
+    ]
+
+    user = models.ForeignKey(
+        User, related_name="note_changes", on_delete=models.CASCADE
+    )
+    # Not a foreign key, so the log outlives the note
+    note_id = models.BigIntegerField()
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    # Note version after the change
+    version = models.PositiveIntegerField(default=0)
     timestamp = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "id"], name="notechange_user_id_idx"),
+        ]
+
+
+class Job(models.Model):
+    """
+    Job class
+
+    Background task queued by notes.tasks.DatabaseBackend and run by the
+    run_tasks workers. Rows are deleted once their task succeeded.
+    """
+
+    PENDING = "pending"
+    RUNNING = "running"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (PENDING, "Pending"),
+        (RUNNING, "Running"),
+        (FAILED, "Failed"),
+    ]
+
+    # Dotted path of the notes.tasks.Task
+    name = models.CharField(max_length=200)
+    args = models.JSONField(default=list)
+    kwargs = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    # Not run before this time, pushed back by retries
+    run_at = models.DateTimeField()
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status", "run_at"], name="job_status_run_at_idx"),
+        ]
+
+
+class RequestProfile(models.Model):
+    """
+    RequestProfile class
+
+    Profile of a single request taken by notes.profiling.ProfilingMiddleware,
+    with the SQL it ran. Only the latest NOTES_PROFILE_KEEP rows are kept.
+    """
+
+    CPROFILE = "cprofile"
+    SAMPLE = "sample"
+    MODE_CHOICES = [
+        (CPROFILE, "cProfile"),
+        (SAMPLE, "Sampling"),
+    ]
+
+    user = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL)
+    mode = models.CharField(max_length=10, choices=MODE_CHOICES)
+    method = models.CharField(max_length=10)
+    path = models.TextField()
+    # URL name of the view that served the request
+    view = models.CharField(max_length=200, blank=True)
+    status = models.PositiveIntegerField()
+    duration = models.FloatField()
+    # Marshalled pstats data (cprofile), as written by pstats.Stats.dump_stats
+    stats = models.BinaryField(null=True, blank=True)
+    # Collapsed stacks (sample), one "outer;...;inner count" line per stack
+    stacks = models.TextField(blank=True)
+    # [{"sql", "params", "duration"}] in execution order
+    queries = models.JSONField(default=list)
+    created_at = models.DateTimeField(auto_now_add=True)
@@ -0,0 +1,167 @@
+# Notes Operational transformation
+import difflib
+
+# Longest changed block diffed character by character, see diff
+DIFF_CHARACTER_LIMIT = 10_000
+
+
+def base_length(ops):
+    """
+    Length of the content an operation applies to
+    """
+    return sum(abs(op) for op in ops if isinstance(op, int))
+
+
+def push(ops, op):
+    """
+    Append op to ops, merging it with the last operation of the same kind
+    """
+    if not op:
+        return
+    if (
+        ops
+        and type(ops[-1]) is type(op)
+        and (isinstance(op, str) or (op > 0) == (ops[-1] > 0))
+    ):
+        ops[-1] += op
+    else:
+        ops.append(op)
+
+
+def is_operation(ops):
+    """
+    Check that ops is a list of operations: a positive int keeps that many
+    characters, a negative int deletes that many and a string is inserted
+    """
+    return isinstance(ops, list) and all(
+        (isinstance(op, int) and not isinstance(op, bool) and op != 0)
+        or (isinstance(op, str) and op)
+        for op in ops
+    )
+
+
+def apply(content, ops):
+    """
+    Apply an operation to content
+
+    Unlike notes.delta, operations count characters, and must cover the
+    whole content.
+
+    Args:
+        content (str): content the operation was built against
+        ops (list): operation, see is_operation
+
+    Raises:
+        ValueError: if the operation does not match the content length
+
+    Returns:
+        str: new content
+    """
+    if base_length(ops) != len(content):
+        raise ValueError("Operation does not match the content length")
+    position = 0
+    parts = []
+    for op in ops:
+        if isinstance(op, str):
+            parts.append(op)
+        elif op > 0:
+            parts.append(content[position : position + op])
+            position += op
+        else:
+            position -= op
+    return "".join(parts)
+
+
+def transform(a, b):
+    """
+    Transform two concurrent operations on the same content
+
+    Returns (a2, b2) such that applying a then b2 gives the same content as
+    applying b then a2. Inserts of a at the same position as inserts of b
+    go first.
+
+    Args:
+        a (list): operation
+        b (list): operation on the same content as a
+
+    Raises:
+        ValueError: if a and b do not apply to the same content
+
+    Returns:
+        tuple: (a2, b2)
+    """
+    if base_length(a) != base_length(b):
+        raise ValueError("Operations do not apply to the same content")
+    a2, b2 = [], []
+    a_ops, b_ops = iter(a), iter(b)
+    op1, op2 = next(a_ops, None), next(b_ops, None)
+    while op1 is not None or op2 is not None:
+        if isinstance(op1, str):
+            push(a2, op1)
+            push(b2, len(op1))
+            op1 = next(a_ops, None)
+            continue
+        if isinstance(op2, str):
+            push(a2, len(op2))
+            push(b2, op2)
+            op2 = next(b_ops, None)
+            continue
+
+        # Both are retains or deletes over the same characters
+        length = min(abs(op1), abs(op2))
+        if op1 > 0 and op2 > 0:
+            push(a2, length)
+            push(b2, length)
+        elif op1 < 0 and op2 > 0:
+            push(a2, -length)
+        elif op1 > 0 and op2 < 0:
+            push(b2, -length)
+        # Both deleted the same characters: nothing left to do
+
+        op1 = op1 - length if op1 > 0 else op1 + length
+        op2 = op2 - length if op2 > 0 else op2 + length
+        if op1 == 0:
+            op1 = next(a_ops, None)
+        if op2 == 0:
+            op2 = next(b_ops, None)
+    return a2, b2
+
+
+def diff(base, target):
+    """
+    Operation turning base into target
+
+    Lines are matched first, like notes.delta, then the characters of each
+    changed block of at most DIFF_CHARACTER_LIMIT characters, so the
+    quadratic character matching stays bounded on long notes.
+    """
+    base_lines = base.splitlines(keepends=True)
+    target_lines = target.splitlines(keepends=True)
+    matcher = difflib.SequenceMatcher(None, base_lines, target_lines)
+    ops = []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        old, new = "".join(base_lines[i1:i2]), "".join(target_lines[j1:j2])
+        if tag == "equal":
+            push(ops, len(old))
+        elif len(old) + len(new) <= DIFF_CHARACTER_LIMIT:
+            for op in diff_characters(old, new):
+                push(ops, op)
+        else:
+            push(ops, -len(old))
+            push(ops, new)
+    return ops
+
+
+def diff_characters(base, target):
+    """
+    Character level operation turning base into target
+    """
+    matcher = difflib.SequenceMatcher(None, base, target, autojunk=False)
+    ops = []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            push(ops, i2 - i1)
+            continue
+        push(ops, i1 - i2)
+        push(ops, target[j1:j2])
+    return ops
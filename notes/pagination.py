@@ -0,0 +1,76 @@
+# Notes Pagination
+from datetime import timezone
+
+from django.utils import timezone as django_timezone
+from django.utils.dateparse import parse_datetime
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def get_page_params(request):
+    """
+    Read keyset pagination parameters from the query string
+
+    Args:
+        request : user request with optional cursor and limit parameters
+
+    Raises:
+        ValueError: if cursor or limit are not positive integers
+
+    Returns:
+        tuple: (cursor or None, limit)
+    """
+    cursor = request.GET.get("cursor")
+    limit = request.GET.get("limit", DEFAULT_PAGE_SIZE)
+    try:
+        cursor = int(cursor) if cursor else None
+        limit = int(limit)
+    except (TypeError, ValueError):
+        raise ValueError("cursor and limit must be integers")
+    if (cursor is not None and cursor < 1) or limit < 1:
+        raise ValueError("cursor and limit must be positive")
+    return cursor, min(limit, MAX_PAGE_SIZE)
+
+
+def paginate(rows, limit, key):
+    """
+    Split one extra fetched row off a page to build the next cursor
+
+    Args:
+        rows (list): up to limit + 1 rows in page order
+        limit (int): page size
+        key (str): row key holding the keyset value
+
+    Returns:
+        tuple: (page rows, next cursor or None)
+    """
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, rows[-1][key]
+
+
+def get_datetime_param(request, name):
+    """
+    Read an ISO 8601 datetime from the query string
+
+    Args:
+        request : user request
+        name (str): query parameter name
+
+    Raises:
+        ValueError: if the parameter is not a valid datetime
+
+    Returns:
+        datetime: aware datetime (UTC when no offset is given), or None
+    """
+    value = request.GET.get(name)
+    if not value:
+        return None
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise ValueError(f"{name} must be an ISO 8601 datetime")
+    if django_timezone.is_naive(parsed):
+        parsed = django_timezone.make_aware(parsed, timezone.utc)
+    return parsed
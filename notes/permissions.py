@@ -0,0 +1,216 @@
+# Notes Permissions
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models import Exists, OuterRef
+
+from notes.metrics import record_cache
+from notes.models import Note
+
+OWNER = "owner"
+SHARED = "shared"
+NO_ACCESS = "none"
+
+# Access levels allowed to perform each action on a note. Note GETs stay
+# owner only, shared users read through the history and collab endpoints.
+CAN_GET = (OWNER,)
+CAN_READ = (OWNER, SHARED)
+CAN_WRITE = (OWNER, SHARED)
+CAN_SHARE = (OWNER,)
+
+
+class LRUCache:
+    """
+    Small thread safe LRU cache whose entries expire after ttl seconds
+    """
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = (value, time.monotonic() + self.ttl)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+local_cache = LRUCache(
+    maxsize=getattr(settings, "NOTES_PERMISSION_LOCAL_CACHE_SIZE", 4096),
+    ttl=getattr(settings, "NOTES_PERMISSION_LOCAL_CACHE_TTL", 5),
+)
+
+
+def cache_enabled():
+    """
+    Whether permissions are cached, see NOTES_PERMISSION_CACHE_TIMEOUT
+    """
+    return getattr(settings, "NOTES_PERMISSION_CACHE_TIMEOUT", 0) > 0
+
+
+def shared_cache():
+    return caches[getattr(settings, "NOTES_PERMISSION_CACHE_ALIAS", "default")]
+
+
+def cache_key(note_id, user_id):
+    return f"notes:permission:{note_id}:{user_id}"
+
+
+def access_query(user, note_id):
+    """
+    Query of the owner of a note and whether it is shared with user
+
+    Always run on the primary: on a lagging replica, a user a note was just
+    shared with would be denied access.
+    """
+    shares = Note.shared_with.through.objects.filter(
+        note_id=OuterRef("pk"), user_id=user.id
+    )
+    return (
+        Note.objects.using(DEFAULT_DB_ALIAS)
+        .filter(id=note_id)
+        .values_list("owner_id", Exists(shares))
+    )
+
+
+def access_level(user, row):
+    """
+    Access level of user from a row of access_query
+    """
+    if row is None:
+        return None
+    owner_id, shared = row
+    if owner_id == user.id:
+        return OWNER
+    return SHARED if shared else NO_ACCESS
+
+
+def fetch_access(user, note_id):
+    """
+    Read the access level of user on a note with a single indexed query
+
+    Returns:
+        str: OWNER, SHARED or NO_ACCESS, or None if the note does not exist
+    """
+    return access_level(user, access_query(user, note_id).first())
+
+
+async def afetch_access(user, note_id):
+    """
+    Async version of fetch_access
+    """
+    return access_level(user, await access_query(user, note_id).afirst())
+
+
+def get_access(user, note_id):
+    """
+    Access level of user on a note, through the permission caches if enabled
+
+    Args:
+        user (User): authenticated user
+        note_id (int): note to check
+
+    Returns:
+        str: OWNER, SHARED or NO_ACCESS, or None if the note does not exist
+    """
+    if not cache_enabled():
+        return fetch_access(user, note_id)
+
+    key = cache_key(note_id, user.id)
+    access = local_cache.get(key)
+    if access is not None:
+        record_cache("permission", True)
+        return access
+
+    access = shared_cache().get(key)
+    record_cache("permission", access is not None)
+    if access is None:
+        access = fetch_access(user, note_id)
+        if access is None:
+            # Missing notes are not cached, the id may be used later
+            return None
+        shared_cache().set(key, access, settings.NOTES_PERMISSION_CACHE_TIMEOUT)
+    local_cache.set(key, access)
+    return access
+
+
+async def aget_access(user, note_id):
+    """
+    Async version of get_access
+    """
+    if not cache_enabled():
+        return await afetch_access(user, note_id)
+
+    key = cache_key(note_id, user.id)
+    access = local_cache.get(key)
+    if access is not None:
+        record_cache("permission", True)
+        return access
+
+    access = await shared_cache().aget(key)
+    record_cache("permission", access is not None)
+    if access is None:
+        access = await afetch_access(user, note_id)
+        if access is None:
+            return None
+        await shared_cache().aset(key, access, settings.NOTES_PERMISSION_CACHE_TIMEOUT)
+    local_cache.set(key, access)
+    return access
+
+
+def invalidate_access(note_id, user_ids):
+    """
+    Drop cached access levels after the shares of a note changed
+
+    Other processes keep their local entry for at most
+    NOTES_PERMISSION_LOCAL_CACHE_TTL seconds.
+
+    Args:
+        note_id (int): note whose shares changed
+        user_ids (iterable): users whose access changed
+    """
+    if not cache_enabled():
+        return
+    keys = [cache_key(note_id, user_id) for user_id in user_ids]
+    for key in keys:
+        local_cache.delete(key)
+    shared_cache().delete_many(keys)
+
+
+async def ainvalidate_access(note_id, user_ids):
+    """
+    Async version of invalidate_access
+    """
+    if not cache_enabled():
+        return
+    keys = [cache_key(note_id, user_id) for user_id in user_ids]
+    for key in keys:
+        local_cache.delete(key)
+    await shared_cache().adelete_many(keys)
@@ -0,0 +1,285 @@
+# Notes Profiling
+import contextvars
+import cProfile
+import io
+import marshal
+import pstats
+import sys
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core import signing
+
+from notes.models import RequestProfile
+
+PROFILE_HEADER = "X-Notes-Profile"
+PROFILE_META_KEY = "HTTP_X_NOTES_PROFILE"
+PROFILE_ID_HEADER = "X-Notes-Profile-Id"
+PROFILE_PARAM = "profile"
+
+SIGNING_SALT = "notes.profiling"
+
+MODES = (RequestProfile.CPROFILE, RequestProfile.SAMPLE)
+
+# SQL captured for the request being profiled, see capture_query
+captured_queries = contextvars.ContextVar("notes_captured_queries", default=None)
+
+
+def make_token(mode=RequestProfile.CPROFILE):
+    """
+    Signed value of the X-Notes-Profile header, valid for
+    NOTES_PROFILE_TOKEN_MAX_AGE seconds
+
+    Args:
+        mode (str): RequestProfile.CPROFILE or RequestProfile.SAMPLE
+
+    Returns:
+        str: header value
+    """
+    return signing.TimestampSigner(salt=SIGNING_SALT).sign(mode)
+
+
+def read_token(value):
+    """
+    Profiling mode of a signed header value, None if it is invalid or expired
+    """
+    try:
+        mode = signing.TimestampSigner(salt=SIGNING_SALT).unsign(
+            value, max_age=settings.NOTES_PROFILE_TOKEN_MAX_AGE
+        )
+    except signing.BadSignature:
+        return None
+    return mode if mode in MODES else None
+
+
+def requested_mode(request):
+    """
+    Profiling mode asked for by a request
+
+    Requests are profiled with a signed X-Notes-Profile header (see
+    make_token), or by staff users with the profile query parameter. Only
+    the latter needs the user, checked by the caller so that async requests
+    load it without blocking.
+
+    Returns:
+        tuple: (mode or None to serve the request as usual, whether the
+            user must be staff)
+    """
+    value = request.META.get(PROFILE_META_KEY)
+    if value is not None:
+        return read_token(value), False
+    mode = request.GET.get(PROFILE_PARAM)
+    if mode is None:
+        return None, False
+    return (mode if mode in MODES else RequestProfile.CPROFILE), True
+
+
+def capture_query(execute, sql, params, many, context):
+    """
+    Database execute wrapper recording the SQL of the request being profiled
+    """
+    queries = captured_queries.get()
+    if queries is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        if len(queries) < settings.NOTES_PROFILE_MAX_QUERIES:
+            queries.append(
+                {
+                    "sql": sql,
+                    "params": [repr(param) for param in params or ()],
+                    "duration": time.perf_counter() - start,
+                }
+            )
+
+
+def install_query_wrapper(sender, connection, **kwargs):
+    """
+    connection_created receiver adding capture_query to new connections,
+    connected in NotesConfig.ready
+    """
+    if capture_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(capture_query)
+
+
+def frame_name(code):
+    return f"{code.co_name} ({code.co_filename}:{code.co_firstlineno})"
+
+
+class Sampler:
+    """
+    Record the stack of a thread every NOTES_PROFILE_SAMPLE_INTERVAL seconds
+
+    Stacks are counted in the collapsed format read by flamegraph.pl and
+    speedscope. Unlike cProfile, the profiled thread runs at full speed.
+    """
+
+    def __init__(self, thread_id):
+        self.thread_id = thread_id
+        self.counts = {}
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def run(self):
+        interval = settings.NOTES_PROFILE_SAMPLE_INTERVAL
+        while not self.stopped.wait(interval):
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None:
+                names.append(frame_name(frame.f_code))
+                frame = frame.f_back
+            if names:
+                stack = ";".join(reversed(names))
+                self.counts[stack] = self.counts.get(stack, 0) + 1
+
+    def enable(self):
+        self.thread.start()
+
+    def disable(self):
+        self.stopped.set()
+        self.thread.join()
+
+    def collapsed(self):
+        return "".join(f"{stack} {count}\n" for stack, count in self.counts.items())
+
+
+def top_functions(profile, limit=30):
+    """
+    Text report of the functions with the highest cumulative time of a
+    cProfile RequestProfile
+    """
+    stream = io.StringIO()
+    stats = pstats.Stats(stream=stream)
+    stats.stats = marshal.loads(bytes(profile.stats))
+    stats.get_top_level_stats()
+    stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(limit)
+    return stream.getvalue()
+
+
+def prune_profiles():
+    """
+    Delete all but the latest NOTES_PROFILE_KEEP profiles
+    """
+    stale = RequestProfile.objects.order_by("-id").values_list("id", flat=True)[
+        settings.NOTES_PROFILE_KEEP : settings.NOTES_PROFILE_KEEP + 1
+    ]
+    last = stale.first()
+    if last is not None:
+        RequestProfile.objects.filter(id__lte=last).delete()
+
+
+def save_profile(request, response, mode, profiler, queries, duration):
+    """
+    Store the profile of a request, returns the RequestProfile
+    """
+    match = getattr(request, "resolver_match", None)
+    user = getattr(request, "user", None)
+    profile = RequestProfile(
+        user_id=user.id if user is not None and user.is_authenticated else None,
+        mode=mode,
+        method=request.method,
+        path=request.get_full_path(),
+        view=(match.url_name if match else None) or "",
+        status=response.status_code,
+        duration=duration,
+        queries=queries,
+    )
+    if mode == RequestProfile.CPROFILE:
+        profiler.create_stats()
+        profile.stats = marshal.dumps(profiler.stats)
+    else:
+        profile.stacks = profiler.collapsed()
+    profile.save()
+    prune_profiles()
+    return profile
+
+
+asave_profile = sync_to_async(save_profile)
+
+
+class ProfilingMiddleware:
+    """
+    Profile single requests on demand, see requested_mode
+
+    The request is run under cProfile or a Sampler, the SQL it executed is
+    captured, and the result is stored as a RequestProfile whose id is
+    returned in the X-Notes-Profile-Id header (download it from
+    /notes/profiles/<id>/). Other requests only pay for a header and a
+    query parameter lookup.
+
+    Both profilers follow the thread serving the request: for async views,
+    work done in sync_to_async threads shows up in the SQL only, and other
+    requests served by the event loop meanwhile are profiled as well. Place
+    it after the authentication middlewares so staff users are known.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        mode, staff_only = requested_mode(request)
+        if staff_only and not request.user.is_staff:
+            mode = None
+        started = mode and self.start(mode)
+        if not started:
+            return self.get_response(request)
+        profiler, queries, token, start = started
+        try:
+            response = self.get_response(request)
+        finally:
+            duration = self.stop(profiler, token, start)
+        profile = save_profile(request, response, mode, profiler, queries, duration)
+        response[PROFILE_ID_HEADER] = str(profile.id)
+        return response
+
+    async def __acall__(self, request):
+        mode, staff_only = requested_mode(request)
+        if staff_only and not (await request.auser()).is_staff:
+            mode = None
+        started = mode and self.start(mode)
+        if not started:
+            return await self.get_response(request)
+        profiler, queries, token, start = started
+        try:
+            response = await self.get_response(request)
+        finally:
+            duration = self.stop(profiler, token, start)
+        profile = await asave_profile(
+            request, response, mode, profiler, queries, duration
+        )
+        response[PROFILE_ID_HEADER] = str(profile.id)
+        return response
+
+    def start(self, mode):
+        """
+        Start profiling, returns None if another profiler is running in this
+        thread (a concurrent request of an async server)
+        """
+        if mode == RequestProfile.CPROFILE:
+            profiler = cProfile.Profile()
+        else:
+            profiler = Sampler(threading.get_ident())
+        try:
+            profiler.enable()
+        except ValueError:
+            return None
+        queries = []
+        token = captured_queries.set(queries)
+        return profiler, queries, token, time.perf_counter()
+
+    def stop(self, profiler, token, start):
+        profiler.disable()
+        duration = time.perf_counter() - start
+        captured_queries.reset(token)
+        return duration
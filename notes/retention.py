@@ -0,0 +1,213 @@
+# Notes History retention
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from notes.blobs import acquire, make_blob, release
+from notes.delta import apply_delta, encode_delta
+from notes.history import get_keyframe_interval
+from notes.models import Note, NoteUpdate
+
+
+def get_tiers(retention=None):
+    """
+    Parse a retention policy
+
+    Args:
+        retention (list, optional): (max age in days or None, bucket in
+            seconds or None) pairs, defaults to NOTES_HISTORY_RETENTION.
+
+    Returns:
+        list: (max age timedelta or None, bucket seconds or None) pairs
+    """
+    if retention is None:
+        retention = settings.NOTES_HISTORY_RETENTION
+    return [
+        (None if days is None else timedelta(days=days), bucket)
+        for days, bucket in retention
+    ]
+
+
+def bucket_key(tiers, timestamp, now):
+    """
+    Retention bucket of a version saved at timestamp
+
+    Returns:
+        tuple: (tier index, bucket number), or None if the version is kept
+    """
+    age = now - timestamp
+    for index, (max_age, bucket) in enumerate(tiers):
+        if max_age is None or age < max_age:
+            break
+    else:
+        return None
+    if bucket is None:
+        return None
+    return index, int(timestamp.timestamp()) // bucket
+
+
+def keep_all_cutoff(tiers, now):
+    """
+    Versions saved at or after this time are never removed
+    """
+    max_age, bucket = tiers[0]
+    if bucket is None and max_age is not None:
+        return now - max_age
+    return now
+
+
+def compact_note(note_id, tiers, now, batch=500, dry_run=False):
+    """
+    Apply a retention policy to the history of a note
+
+    Within a bucket only the latest version is kept, and the latest version
+    of the note is always kept. A kept delta whose previous version was
+    removed is re-encoded against the previous kept version, or stored as a
+    keyframe when the first one or when the chain would exceed the keyframe
+    interval.
+
+    The history is walked in windows of batch rows, each in its own
+    transaction holding the note row lock. Edits only append versions after
+    the latest one, which is kept as is, so they can run meanwhile.
+
+    Args:
+        note_id (int): note to compact
+        tiers (list): policy, see get_tiers
+        now (datetime): time the version ages are computed from
+        batch (int): history rows per window
+        dry_run (bool): only count what would be reclaimed
+
+    Returns:
+        dict: deleted and rewritten rows, bytes reclaimed (history rows and
+            blobs, estimated for a dry run)
+    """
+    stats = {"deleted": 0, "rewritten": 0, "bytes": 0}
+    cutoff = keep_all_cutoff(tiers, now)
+    interval = get_keyframe_interval()
+    content = None  # content of the last row read
+    survivor = None  # content of the last kept row
+    distance = 0  # deltas since the last kept keyframe
+    previous_kept = False
+    last_version = 0
+    while True:
+        with transaction.atomic():
+            # Serializes with encode_update, which reads the previous version
+            list(
+                Note.objects.select_for_update()
+                .filter(id=note_id)
+                .values_list("id", flat=True)
+            )
+            rows = list(
+                NoteUpdate.objects.filter(note_id=note_id, version__gt=last_version)
+                .select_related("blob")
+                .order_by("version")[: batch + 1]
+            )
+            deleted, released, done = [], [], len(rows) <= batch
+            for index, row in enumerate(rows[:batch]):
+                if row.is_keyframe:
+                    content = row.body
+                elif content is None:
+                    # History does not start at a keyframe, leave it alone
+                    return stats
+                else:
+                    content = apply_delta(content, row.body)
+                last_version = row.version
+
+                key = None
+                if row.timestamp < cutoff and index + 1 < len(rows):
+                    key = bucket_key(tiers, row.timestamp, now)
+                    following = rows[index + 1]
+                    if key is not None and key == bucket_key(
+                        tiers, following.timestamp, now
+                    ):
+                        deleted.append(row.id)
+                        released.append(row)
+                        stats["deleted"] += 1
+                        stats["bytes"] += len(row.content.encode())
+                        previous_kept = False
+                        continue
+
+                is_keyframe, stored = row.is_keyframe, row.body
+                if survivor is None or distance + 1 >= interval:
+                    is_keyframe, stored = True, content
+                elif not row.is_keyframe and not previous_kept:
+                    stored = encode_delta(survivor, content)
+                    if len(stored) >= len(content):
+                        is_keyframe, stored = True, content
+                if (is_keyframe, stored) != (row.is_keyframe, row.body):
+                    stats["rewritten"] += 1
+                    stats["bytes"] += len(row.content.encode())
+                    released.append(row)
+                    fields = {"is_keyframe": is_keyframe, "content": stored}
+                    if not is_keyframe:
+                        stats["bytes"] -= len(stored.encode())
+                        fields["blob"] = None
+                    elif dry_run:
+                        stats["bytes"] -= len(make_blob(stored).data)
+                    else:
+                        (fields["blob_id"],), new_bytes = acquire([stored])
+                        fields["content"] = ""
+                        stats["bytes"] -= new_bytes
+                    if not dry_run:
+                        NoteUpdate.objects.filter(id=row.id).update(**fields)
+                distance = 0 if is_keyframe else distance + 1
+                survivor, previous_kept = content, True
+
+                # Every later version is kept and untouched
+                if row.timestamp >= cutoff and row.is_keyframe and is_keyframe:
+                    done = True
+                    break
+            if dry_run:
+                # Blobs only referenced by a released row would be deleted
+                stats["bytes"] += sum(
+                    len(row.blob.data)
+                    for row in released
+                    if row.blob_id and row.blob.refcount == 1
+                )
+            else:
+                NoteUpdate.objects.filter(id__in=deleted).delete()
+                stats["bytes"] += release(row.blob_id for row in released)
+        if done:
+            return stats
+
+
+def compact_history(retention=None, batch=500, dry_run=False, now=None):
+    """
+    Apply a retention policy to the history of every note
+
+    Only notes with versions older than the keep everything tier are
+    visited, batch at a time.
+
+    Args:
+        retention (list, optional): policy, see get_tiers
+        batch (int): notes fetched and history rows compacted at a time
+        dry_run (bool): only count what would be reclaimed
+        now (datetime, optional): time the version ages are computed from
+
+    Yields:
+        dict: running totals of notes, deleted and rewritten rows and bytes
+            reclaimed, after each batch of notes
+    """
+    tiers = get_tiers(retention)
+    now = now or timezone.now()
+    cutoff = keep_all_cutoff(tiers, now)
+    totals = {"notes": 0, "deleted": 0, "rewritten": 0, "bytes": 0}
+    last = 0
+    while True:
+        note_ids = list(
+            NoteUpdate.objects.filter(timestamp__lt=cutoff, note_id__gt=last)
+            .order_by("note_id")
+            .values_list("note_id", flat=True)
+            .distinct()[:batch]
+        )
+        if not note_ids:
+            return
+        for note_id in note_ids:
+            stats = compact_note(note_id, tiers, now, batch, dry_run)
+            totals["notes"] += 1
+            for key, value in stats.items():
+                totals[key] += value
+        last = note_ids[-1]
+        yield dict(totals)
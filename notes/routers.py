@@ -0,0 +1,148 @@
+# Notes Database routers
+import contextvars
+import random
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.auth import SESSION_KEY
+from django.core.cache import caches
+
+# Routing state of the current request, see PrimaryPinningMiddleware
+request_state = contextvars.ContextVar("notes_request_state", default=None)
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+def get_replicas():
+    return getattr(settings, "NOTES_DATABASE_REPLICAS", [])
+
+
+def sticky_cache():
+    return caches[getattr(settings, "NOTES_CACHE_ALIAS", "default")]
+
+
+def sticky_key(user_id):
+    return f"notes:primary:{user_id}"
+
+
+def get_user_id(request):
+    """
+    Id of the user of a request from its access token or session, without
+    loading the user row, None if anonymous
+    """
+    user_id = getattr(request, "token_user_id", None)
+    if user_id is None and hasattr(request, "session"):
+        user_id = request.session.get(SESSION_KEY)
+    return user_id
+
+
+async def aget_user_id(request):
+    """
+    Async version of get_user_id
+    """
+    user_id = getattr(request, "token_user_id", None)
+    if user_id is None and hasattr(request, "session"):
+        user_id = await request.session.aget(SESSION_KEY)
+    return user_id
+
+
+class ReplicaRouter:
+    """
+    Send reads of the notes app to a replica and everything else to default
+
+    Only reads made while serving a request marked read-only by
+    PrimaryPinningMiddleware go to a (random) replica. Writes, reads after a
+    write in the same request, and queries made outside of requests
+    (management commands, shell) use the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = request_state.get()
+        replicas = get_replicas()
+        if (
+            model._meta.app_label != "notes"
+            or not replicas
+            or state is None
+            or state["primary"]
+        ):
+            return None
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        state = request_state.get()
+        if state is not None and model._meta.app_label == "notes":
+            state["primary"] = state["wrote"] = True
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in get_replicas():
+            return False
+        return None
+
+
+class PrimaryPinningMiddleware:
+    """
+    Pin requests to the primary database when they may read their own writes
+
+    Unsafe methods always use the primary. A request that wrote notes data
+    pins every request of its user (token or session, whatever the client)
+    to the primary for NOTES_REPLICA_STICKY_SECONDS, through a key of the
+    notes cache, so they see their own edits despite replication lag.
+    Without replicas, the cache is never used.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        user_id = get_user_id(request) if get_replicas() else None
+        sticky = (
+            request.method in SAFE_METHODS
+            and user_id is not None
+            and sticky_cache().get(sticky_key(user_id)) is not None
+        )
+        state, token = self.start(request, sticky)
+        try:
+            response = self.get_response(request)
+        finally:
+            request_state.reset(token)
+        if state["wrote"] and user_id is not None:
+            sticky_cache().set(sticky_key(user_id), 1, self.sticky_seconds())
+        return response
+
+    async def __acall__(self, request):
+        user_id = await aget_user_id(request) if get_replicas() else None
+        sticky = (
+            request.method in SAFE_METHODS
+            and user_id is not None
+            and await sticky_cache().aget(sticky_key(user_id)) is not None
+        )
+        state, token = self.start(request, sticky)
+        try:
+            response = await self.get_response(request)
+        finally:
+            request_state.reset(token)
+        if state["wrote"] and user_id is not None:
+            await sticky_cache().aset(sticky_key(user_id), 1, self.sticky_seconds())
+        return response
+
+    def start(self, request, sticky):
+        state = {
+            "primary": request.method not in SAFE_METHODS or sticky,
+            "wrote": False,
+        }
+        return state, request_state.set(state)
+
+    def sticky_seconds(self):
+        return getattr(settings, "NOTES_REPLICA_STICKY_SECONDS", 10)
@@ -0,0 +1,325 @@
+# Notes Search
+import re
+
+from django.conf import settings
+from django.core import checks
+from django.db import connections
+from django.db.migrations.recorder import MigrationRecorder
+from django.db.models import Q
+from django.utils.module_loading import import_string
+
+from notes.models import Note
+
+FTS_TABLE = "notes_note_fts"
+
+# SQLite FTS5 index over notes_note, kept up to date by triggers so every
+# write path (ORM, bulk and raw) is indexed incrementally.
+SQLITE_FTS_SQL = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        title, content, content='notes_note', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_insert AFTER INSERT ON notes_note
+    BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, content)
+        VALUES (new.id, new.title, new.content);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete AFTER DELETE ON notes_note
+    BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, content)
+        VALUES ('delete', old.id, old.title, old.content);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_update
+    AFTER UPDATE OF title, content ON notes_note
+    BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, content)
+        VALUES ('delete', old.id, old.title, old.content);
+        INSERT INTO {FTS_TABLE}(rowid, title, content)
+        VALUES (new.id, new.title, new.content);
+    END
+    """,
+]
+
+SQLITE_FTS_DROP_SQL = [
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_insert",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_delete",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_update",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+
+SQLITE_FTS_OBJECTS = [
+    FTS_TABLE,
+    f"{FTS_TABLE}_insert",
+    f"{FTS_TABLE}_delete",
+    f"{FTS_TABLE}_update",
+]
+
+# PostgreSQL GIN index over the weighted text search vector of notes_note.
+# Queries must spell the vector exactly like the index to use it.
+PG_SEARCH_INDEX = "notes_note_search_idx"
+
+PG_SEARCH_VECTOR = (
+    "(setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(content, '')), 'B'))"
+)
+
+PG_SEARCH_SQL = f"""
+    CREATE INDEX IF NOT EXISTS {PG_SEARCH_INDEX}
+    ON notes_note USING GIN ({PG_SEARCH_VECTOR})
+"""
+
+PG_SEARCH_DROP_SQL = f"DROP INDEX IF EXISTS {PG_SEARCH_INDEX}"
+
+
+def get_terms(query):
+    """
+    Split a user query into search terms, ignoring any query syntax
+    """
+    return re.findall(r"\w+", query.lower())
+
+
+class SearchBackend:
+    """
+    Base class of note search backends
+
+    A backend returns the notes visible to a user that contain every term of
+    the query, best match first.
+    """
+
+    def __init__(self, using="default"):
+        self.using = using
+
+    def install(self):
+        """
+        Create the index structures of the backend
+        """
+
+    def uninstall(self):
+        """
+        Drop the index structures of the backend
+        """
+
+    def rebuild(self):
+        """
+        Re-index every note
+        """
+
+    def missing(self):
+        """
+        Names of the index structures of the backend that don't exist
+        """
+        return []
+
+    def search(self, user, query, offset=0, limit=20):
+        """
+        Search the notes visible to user
+
+        Args:
+            user (User): user searching
+            query (str): free text query
+            offset (int): number of results to skip
+            limit (int): page size
+
+        Returns:
+            list: dicts with id, title, snippet and rank
+        """
+        raise NotImplementedError
+
+
+class DatabaseSearchBackend(SearchBackend):
+    """
+    Portable backend matching terms with case insensitive LIKE queries
+
+    It needs no index, so every search scans the notes of the user; it is
+    only meant for databases without a dedicated backend. Results are
+    ordered by recency rather than relevance.
+    """
+
+    def search(self, user, query, offset=0, limit=20):
+        terms = get_terms(query)
+        if not terms:
+            return []
+        notes = Note.objects.using(self.using).visible_to(user)
+        for term in terms:
+            notes = notes.filter(Q(title__icontains=term) | Q(content__icontains=term))
+        rows = notes.order_by("-id").values("id", "title", "content")
+        return [
+            {
+                "id": row["id"],
+                "title": row["title"],
+                "snippet": row["content"][:200],
+                "rank": None,
+            }
+            for row in rows[offset : offset + limit]
+        ]
+
+
+class SqliteSearchBackend(SearchBackend):
+    """
+    SQLite FTS5 backend, ranked with bm25 (title matches weigh more)
+    """
+
+    def install(self):
+        with connections[self.using].cursor() as cursor:
+            for sql in SQLITE_FTS_SQL:
+                cursor.execute(sql)
+
+    def uninstall(self):
+        with connections[self.using].cursor() as cursor:
+            for sql in SQLITE_FTS_DROP_SQL:
+                cursor.execute(sql)
+
+    def rebuild(self):
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+    def missing(self):
+        # Remaking notes_note (e.g. an ALTER that SQLite can't do in place)
+        # drops its triggers: notes written after that are not indexed
+        placeholders = ", ".join(["%s"] * len(SQLITE_FTS_OBJECTS))
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(
+                f"SELECT name FROM sqlite_master WHERE name IN ({placeholders})",
+                SQLITE_FTS_OBJECTS,
+            )
+            found = {name for (name,) in cursor.fetchall()}
+        return [name for name in SQLITE_FTS_OBJECTS if name not in found]
+
+    def search(self, user, query, offset=0, limit=20):
+        terms = get_terms(query)
+        if not terms:
+            return []
+        # Every term must match, the last one also as a prefix (search as you type)
+        match = " ".join(f'"{term}"' for term in terms) + "*"
+        sql = f"""
+            SELECT n.id, n.title,
+                snippet({FTS_TABLE}, 1, '[', ']', '...', 16),
+                bm25({FTS_TABLE}, 10.0, 1.0) AS rank
+            FROM {FTS_TABLE}
+            JOIN notes_note n ON n.id = {FTS_TABLE}.rowid
+            WHERE {FTS_TABLE} MATCH %s
+                AND (n.owner_id = %s OR n.id IN (
+                    SELECT note_id FROM notes_note_shared_with WHERE user_id = %s
+                ))
+            ORDER BY rank, n.id
+            LIMIT %s OFFSET %s
+        """
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(sql, [match, user.id, user.id, limit, offset])
+            rows = cursor.fetchall()
+        return [
+            {"id": id, "title": title, "snippet": snippet, "rank": round(rank, 4)}
+            for id, title, snippet, rank in rows
+        ]
+
+
+class PostgresSearchBackend(SearchBackend):
+    """
+    PostgreSQL full text search backend over a GIN index, ranked with
+    ts_rank (title matches weigh more)
+
+    The index is on an expression of the note columns, so PostgreSQL keeps
+    it up to date on every write.
+    """
+
+    def install(self):
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(PG_SEARCH_SQL)
+
+    def uninstall(self):
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(PG_SEARCH_DROP_SQL)
+
+    def rebuild(self):
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(f"REINDEX INDEX {PG_SEARCH_INDEX}")
+
+    def missing(self):
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(
+                "SELECT 1 FROM pg_indexes WHERE indexname = %s", [PG_SEARCH_INDEX]
+            )
+            return [] if cursor.fetchone() else [PG_SEARCH_INDEX]
+
+    def search(self, user, query, offset=0, limit=20):
+        terms = get_terms(query)
+        if not terms:
+            return []
+        # Every term must match, the last one also as a prefix (search as you type)
+        match = " & ".join(f"'{term}'" for term in terms) + ":*"
+        sql = f"""
+            SELECT id, title,
+                ts_headline('simple', content, query,
+                    'StartSel=[, StopSel=], MaxWords=16, MinWords=8'),
+                ts_rank({PG_SEARCH_VECTOR}, query) AS rank
+            FROM notes_note, to_tsquery('simple', %s) AS query
+            WHERE {PG_SEARCH_VECTOR} @@ query
+                AND (owner_id = %s OR id IN (
+                    SELECT note_id FROM notes_note_shared_with WHERE user_id = %s
+                ))
+            ORDER BY rank DESC, id
+            LIMIT %s OFFSET %s
+        """
+        with connections[self.using].cursor() as cursor:
+            cursor.execute(sql, [match, user.id, user.id, limit, offset])
+            rows = cursor.fetchall()
+        return [
+            {"id": id, "title": title, "snippet": snippet, "rank": round(rank, 4)}
+            for id, title, snippet, rank in rows
+        ]
+
+
+VENDOR_BACKENDS = {
+    "sqlite": SqliteSearchBackend,
+    "postgresql": PostgresSearchBackend,
+}
+
+
+def get_search_backend(using="default"):
+    """
+    Search backend for a database
+
+    NOTES_SEARCH_BACKEND selects a backend class by dotted path, otherwise
+    the backend is picked from the database vendor.
+    """
+    path = getattr(settings, "NOTES_SEARCH_BACKEND", None)
+    if path:
+        return import_string(path)(using)
+    vendor = connections[using].vendor
+    return VENDOR_BACKENDS.get(vendor, DatabaseSearchBackend)(using)
+
+
+def check_search_index(app_configs=None, databases=None, **kwargs):
+    """
+    System check warning about missing search index structures of the
+    databases where the search migration was applied
+    """
+    warnings = []
+    for alias in databases or []:
+        recorder = MigrationRecorder(connections[alias])
+        applied = recorder.has_table() and (
+            recorder.migration_qs.filter(
+                app="notes", name="0006_note_search_index"
+            ).exists()
+        )
+        if not applied:
+            continue
+        backend = get_search_backend(alias)
+        missing = backend.missing()
+        if missing:
+            warnings.append(
+                checks.Warning(
+                    f"The search index of database {alias!r} is missing "
+                    f"{', '.join(missing)}: new notes are not searchable.",
+                    hint="Run `manage.py rebuild_search_index`.",
+                    id="notes.W001",
+                )
+            )
+    return warnings
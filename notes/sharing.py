@@ -0,0 +1,125 @@
+# Notes Sharing
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from notes.cache import ainvalidate_notes, invalidate_notes
+from notes.changes import user_changes
+from notes.models import Note, NoteChange
+from notes.permissions import ainvalidate_access, invalidate_access
+
+NoteShare = Note.shared_with.through
+
+
+def resolve_usernames(usernames):
+    """
+    Look up many users by username in one query
+
+    Args:
+        usernames (iterable): usernames to look up
+
+    Returns:
+        tuple: (dict of user id by username, sorted list of unknown usernames)
+    """
+    usernames = set(usernames)
+    ids = dict(
+        User.objects.filter(username__in=usernames).values_list("username", "id")
+    )
+    return ids, sorted(usernames - ids.keys())
+
+
+async def aresolve_usernames(usernames):
+    """
+    Async version of resolve_usernames
+    """
+    usernames = set(usernames)
+    users = User.objects.filter(username__in=usernames).values_list("username", "id")
+    ids = {username: user_id async for username, user_id in users}
+    return ids, sorted(usernames - ids.keys())
+
+
+def share_with(note, usernames):
+    """
+    Share a note with many users at once
+
+    Args:
+        note (Note): note to share
+        usernames (iterable): usernames to share the note with
+
+    Returns:
+        dict: sorted added, skipped (already shared) and unknown usernames
+    """
+    ids, unknown = resolve_usernames(usernames)
+    shared = set(
+        NoteShare.objects.filter(note=note, user_id__in=ids.values()).values_list(
+            "user_id", flat=True
+        )
+    )
+    added = sorted(
+        username for username, user_id in ids.items() if user_id not in shared
+    )
+    added_ids = [ids[username] for username in added]
+    with transaction.atomic():
+        NoteShare.objects.bulk_create(
+            [NoteShare(note=note, user_id=user_id) for user_id in added_ids],
+            ignore_conflicts=True,
+        )
+        NoteChange.objects.bulk_create(
+            user_changes(note.id, added_ids, NoteChange.SHARED)
+        )
+    invalidate_access(note.id, added_ids)
+    invalidate_notes([note.id])
+    skipped = sorted(username for username, user_id in ids.items() if user_id in shared)
+    return {"added": added, "skipped": skipped, "unknown": unknown}
+
+
+async def ashare_with(note, usernames):
+    """
+    Async version of share_with
+    """
+    ids, unknown = await aresolve_usernames(usernames)
+    shares = NoteShare.objects.filter(note=note, user_id__in=ids.values())
+    shared = {user_id async for user_id in shares.values_list("user_id", flat=True)}
+    added = sorted(
+        username for username, user_id in ids.items() if user_id not in shared
+    )
+    added_ids = [ids[username] for username in added]
+    # The async ORM has no transactions, the log is written right after
+    await NoteShare.objects.abulk_create(
+        [NoteShare(note=note, user_id=user_id) for user_id in added_ids],
+        ignore_conflicts=True,
+    )
+    await NoteChange.objects.abulk_create(
+        user_changes(note.id, added_ids, NoteChange.SHARED)
+    )
+    await ainvalidate_access(note.id, added_ids)
+    await ainvalidate_notes([note.id])
+    skipped = sorted(username for username, user_id in ids.items() if user_id in shared)
+    return {"added": added, "skipped": skipped, "unknown": unknown}
+
+
+def unshare_with(note, usernames):
+    """
+    Stop sharing a note with many users at once
+
+    Args:
+        note (Note): note to unshare
+        usernames (iterable): usernames to remove from the note's shares
+
+    Returns:
+        dict: sorted removed, skipped (not shared) and unknown usernames
+    """
+    ids, unknown = resolve_usernames(usernames)
+    shares = NoteShare.objects.filter(note=note, user_id__in=ids.values())
+    shared = set(shares.values_list("user_id", flat=True))
+    with transaction.atomic():
+        shares.delete()
+        NoteChange.objects.bulk_create(
+            user_changes(note.id, shared, NoteChange.UNSHARED)
+        )
+    invalidate_access(note.id, shared)
+    invalidate_notes([note.id])
+    removed = sorted(username for username, user_id in ids.items() if user_id in shared)
+    skipped = sorted(
+        username for username, user_id in ids.items() if user_id not in shared
+    )
+    return {"removed": removed, "skipped": skipped, "unknown": unknown}
@@ -0,0 +1,92 @@
+# Notes Sync
+from django.db.models import F
+
+from notes.changes import changes_query, get_head, settle
+from notes.models import Note, NoteChange
+from notes.pagination import paginate
+
+SYNC_FIELDS = ("id", "title", "content", "version", "updated_at")
+
+# Change kinds after which a note is gone for the user
+REMOVED_KINDS = (NoteChange.UNSHARED, NoteChange.DELETED)
+
+
+def note_rows(notes):
+    return notes.values(*SYNC_FIELDS, owner_username=F("owner__username"))
+
+
+def get_snapshot_page(user, cursor=None, after=None, limit=50):
+    """
+    Page of every note visible to user, for a first sync
+
+    The change log cursor is read before the first page and handed back
+    unchanged with every page, so changes made while the client pages
+    through the snapshot are replayed by the next incremental sync.
+
+    Args:
+        user (User): user syncing
+        cursor (int, optional): change log cursor returned by the first page
+        after (int, optional): last note id of the previous page
+        limit (int): page size
+
+    Returns:
+        dict: notes, tombstones, cursor, after (None on the last page) and
+            has_more
+    """
+    if cursor is None:
+        cursor = get_head(user)
+    notes = Note.objects.visible_to(user)
+    if after is not None:
+        notes = notes.filter(id__gt=after)
+    rows = list(note_rows(notes.order_by("id"))[: limit + 1])
+    rows, after = paginate(rows, limit, "id")
+    return {
+        "notes": rows,
+        "tombstones": [],
+        "cursor": cursor,
+        "after": after,
+        "has_more": after is not None,
+    }
+
+
+def get_changes_page(user, cursor, limit=50):
+    """
+    Notes changed for user after a change log cursor
+
+    Reads up to limit log rows, then the current state of the notes they
+    mention. Notes the user can no longer see become tombstones, so the
+    cost depends on the number of changes, not on the number of notes.
+
+    Args:
+        user (User): user syncing
+        cursor (int): change log cursor of the previous sync
+        limit (int): maximum number of log rows read
+
+    Returns:
+        dict: notes, tombstones, cursor, after (always None) and has_more
+    """
+    changes, has_more = settle(list(changes_query(user, cursor)[: limit + 1]), limit)
+
+    # Latest change of each note in this page
+    kinds = {change["note_id"]: change["kind"] for change in changes}
+    notes = []
+    if kinds:
+        notes = list(
+            note_rows(Note.objects.visible_to(user).filter(id__in=kinds)).order_by("id")
+        )
+    visible = {note["id"] for note in notes}
+    tombstones = [
+        {
+            "id": note_id,
+            "kind": kind if kind in REMOVED_KINDS else NoteChange.DELETED,
+        }
+        for note_id, kind in kinds.items()
+        if note_id not in visible
+    ]
+    return {
+        "notes": notes,
+        "tombstones": tombstones,
+        "cursor": changes[-1]["id"] if changes else cursor,
+        "after": None,
+        "has_more": has_more,
+    }
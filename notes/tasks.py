@@ -0,0 +1,303 @@
+# Notes Background tasks
+import functools
+import logging
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, router, transaction
+from django.db.models import Count, F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from notes.metrics import registry
+from notes.models import Job
+
+logger = logging.getLogger(__name__)
+
+
+class Metrics:
+    """
+    Thread safe counters of the tasks handled by this process, by task name
+
+    Events are also counted in notes.metrics, so the workers of every
+    process are exported by the /metrics endpoint.
+    """
+
+    EVENTS = ("enqueued", "succeeded", "retried", "failed")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+
+    def add(self, name, event, seconds=0.0):
+        with self.lock:
+            counters = self.counters.get(name)
+            if counters is None:
+                counters = self.counters[name] = dict.fromkeys(self.EVENTS, 0)
+                counters["seconds"] = 0.0
+            counters[event] += 1
+            counters["seconds"] += seconds
+        labels = (("task", name),)
+        registry.inc("notes_tasks_total", labels + (("event", event),))
+        if seconds:
+            registry.inc("notes_task_duration_seconds_total", labels, seconds)
+
+    def snapshot(self):
+        """
+        Copy of the counters: {task name: {event: count, "seconds": run time}}
+        """
+        with self.lock:
+            return {name: dict(counters) for name, counters in self.counters.items()}
+
+    def reset(self):
+        with self.lock:
+            self.counters.clear()
+
+
+metrics = Metrics()
+
+
+class Task:
+    """
+    Function run in the background by the configured task backend
+
+    Calling a task runs it inline, delay enqueues it. Arguments must be JSON
+    serializable for the database backend.
+    """
+
+    def __init__(self, func, max_attempts, retry_delay):
+        functools.update_wrapper(self, func)
+        self.func = func
+        # Workers import the task back from this dotted path
+        self.name = f"{func.__module__}.{func.__qualname__}"
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def delay(self, *args, **kwargs):
+        """
+        Enqueue the task; with a transaction open, it runs after the commit
+        """
+        get_backend().enqueue(self, args, kwargs)
+        metrics.add(self.name, "enqueued")
+
+    def backoff(self, attempts):
+        """
+        Seconds to wait before running the task again after attempts failures
+        """
+        return self.retry_delay * 2 ** (attempts - 1)
+
+
+def task(func=None, *, max_attempts=3, retry_delay=1):
+    """
+    Decorator turning a module level function into a Task
+
+    Args:
+        max_attempts (int): number of runs before the task is given up
+        retry_delay (float): seconds before the first retry, doubled after
+            every failure
+    """
+    if func is None:
+        return functools.partial(
+            task, max_attempts=max_attempts, retry_delay=retry_delay
+        )
+    return Task(func, max_attempts, retry_delay)
+
+
+class TaskBackend:
+    """
+    Base class of task backends
+    """
+
+    def enqueue(self, task, args, kwargs):
+        """
+        Schedule task(*args, **kwargs)
+        """
+        raise NotImplementedError
+
+
+class ThreadPoolBackend(TaskBackend):
+    """
+    Run tasks in a thread pool of the current process
+
+    Tasks start once the enqueuing transaction commits and are retried in
+    their thread. Queued tasks are lost when the process exits, so this
+    backend is meant for development and tests.
+    """
+
+    def __init__(self, threads=None):
+        self.threads = threads or settings.NOTES_TASKS_THREADS
+        self.executor = None
+        self.futures = set()
+        self.lock = threading.Lock()
+
+    def enqueue(self, task, args, kwargs):
+        transaction.on_commit(
+            functools.partial(self.submit, task, args, kwargs),
+            using=router.db_for_write(Job),
+        )
+
+    def submit(self, task, args, kwargs):
+        with self.lock:
+            if self.executor is None:
+                self.executor = ThreadPoolExecutor(
+                    self.threads, thread_name_prefix="notes-tasks"
+                )
+            future = self.executor.submit(self.run, task, args, kwargs)
+            self.futures.add(future)
+        future.add_done_callback(self.futures.discard)
+
+    def run(self, task, args, kwargs):
+        for attempt in range(1, task.max_attempts + 1):
+            close_old_connections()
+            start = time.perf_counter()
+            try:
+                task(*args, **kwargs)
+            except Exception:
+                seconds = time.perf_counter() - start
+                if attempt == task.max_attempts:
+                    logger.exception("Task %s failed", task.name)
+                    metrics.add(task.name, "failed", seconds)
+                    return
+                metrics.add(task.name, "retried", seconds)
+                time.sleep(task.backoff(attempt))
+            else:
+                metrics.add(task.name, "succeeded", time.perf_counter() - start)
+                return
+            finally:
+                close_old_connections()
+
+    def join(self):
+        """
+        Wait until the submitted tasks finished
+        """
+        wait(list(self.futures))
+
+
+class DatabaseBackend(TaskBackend):
+    """
+    Queue tasks as Job rows, run by `manage.py run_tasks` workers
+
+    The job is inserted in the transaction of the write that enqueued it, so
+    it is committed or rolled back with it and survives restarts. Failed
+    jobs are retried with a backoff, then kept with the failed status.
+    """
+
+    def enqueue(self, task, args, kwargs):
+        Job.objects.create(
+            name=task.name, args=list(args), kwargs=kwargs, run_at=timezone.now()
+        )
+
+    def claim(self, limit=10):
+        """
+        Mark up to limit due jobs as running, oldest first
+
+        Each job is claimed with a conditional UPDATE, so concurrent workers
+        never run the same job. Jobs running for more than
+        NOTES_TASKS_TIMEOUT seconds belong to a dead worker and are claimed
+        again.
+
+        Returns:
+            list: claimed Job rows
+        """
+        now = timezone.now()
+        stale = now - timedelta(seconds=settings.NOTES_TASKS_TIMEOUT)
+        due = Job.objects.filter(status=Job.PENDING, run_at__lte=now) | (
+            Job.objects.filter(status=Job.RUNNING, locked_at__lt=stale)
+        )
+        jobs = []
+        for job in due.order_by("run_at", "id")[:limit]:
+            claimed = Job.objects.filter(
+                id=job.id, status=job.status, attempts=job.attempts
+            ).update(status=Job.RUNNING, locked_at=now, attempts=F("attempts") + 1)
+            if claimed:
+                job.status, job.locked_at = Job.RUNNING, now
+                job.attempts += 1
+                jobs.append(job)
+        return jobs
+
+    def run_job(self, job):
+        """
+        Run a claimed job, deleting it on success and scheduling a retry or
+        marking it failed otherwise
+
+        Returns:
+            bool: whether the task succeeded
+        """
+        start = time.perf_counter()
+        task = None
+        try:
+            task = import_string(job.name)
+            if not isinstance(task, Task):
+                raise ImportError(f"{job.name} is not a task")
+            if job.attempts > task.max_attempts:
+                raise RuntimeError("The worker running the task died")
+            task(*job.args, **job.kwargs)
+        except Exception:
+            seconds = time.perf_counter() - start
+            logger.exception("Job %s (%s) failed", job.id, job.name)
+            retry = isinstance(task, Task) and job.attempts < task.max_attempts
+            update = {"locked_at": None, "last_error": traceback.format_exc()}
+            if retry:
+                delay = timedelta(seconds=task.backoff(job.attempts))
+                update.update(status=Job.PENDING, run_at=timezone.now() + delay)
+            else:
+                update.update(status=Job.FAILED)
+            Job.objects.filter(id=job.id).update(**update)
+            metrics.add(job.name, "retried" if retry else "failed", seconds)
+            return False
+
+        Job.objects.filter(id=job.id).delete()
+        metrics.add(job.name, "succeeded", time.perf_counter() - start)
+        return True
+
+    def run_pending(self, limit=None, batch=10):
+        """
+        Claim and run due jobs until none is left
+
+        Args:
+            limit (int, optional): maximum number of jobs to run
+            batch (int): jobs claimed at once
+
+        Returns:
+            int: number of jobs run
+        """
+        count = 0
+        while limit is None or count < limit:
+            size = batch if limit is None else min(batch, limit - count)
+            jobs = self.claim(size)
+            if not jobs:
+                break
+            for job in jobs:
+                self.run_job(job)
+            count += len(jobs)
+        return count
+
+    def queue_stats(self):
+        """
+        Number of queued jobs by status
+        """
+        stats = dict.fromkeys((status for status, _ in Job.STATUS_CHOICES), 0)
+        for row in Job.objects.values("status").annotate(count=Count("id")):
+            stats[row["status"]] = row["count"]
+        return stats
+
+
+_backends = {}
+
+
+def get_backend():
+    """
+    Task backend instance of the NOTES_TASKS_BACKEND dotted path
+    """
+    path = settings.NOTES_TASKS_BACKEND
+    backend = _backends.get(path)
+    if backend is None:
+        backend = _backends.setdefault(path, import_string(path)())
+    return backend
@@ -2,16 +2,44 @@
 from django.urls import path
 from rest_framework_simplejwt.views import TokenRefreshView
 
-from notes.views import (create_note, get_note_history, get_or_update_note,
-                         share_note)
+from notes.async_views import get_changes
+from notes.views import (
+    bulk_notes,
+    create_note,
+    export_notes,
+    get_note_history,
+    get_note_version,
+    get_or_update_note,
+    get_profile,
+    list_notes,
+    list_profiles,
+    search_notes,
+    share_note,
+    sync_notes,
+    unshare_note,
+)
 
 urlpatterns = [
+    path("notes/", list_notes, name="list_notes"),
     path("notes/create/", create_note, name="create_note"),
+    path("notes/search/", search_notes, name="search_notes"),
+    path("notes/bulk/", bulk_notes, name="bulk_notes"),
     path("notes/<int:note_id>/", get_or_update_note, name="get_or_update_note"),
     path("notes/share/", share_note, name="share_note"),
+    path("notes/unshare/", unshare_note, name="unshare_note"),
+    path("notes/export/", export_notes, name="export_notes"),
+    path("notes/sync/", sync_notes, name="sync_notes"),
+    path("notes/changes/", get_changes, name="get_changes"),
+    path("notes/profiles/", list_profiles, name="list_profiles"),
+    path("notes/profiles/<int:profile_id>/", get_profile, name="get_profile"),
     path(
         "notes/version-history/<int:note_id>/",
         get_note_history,
         name="get_note_history",
     ),
+    path(
+        "notes/version-history/<int:note_id>/<int:version>/",
+        get_note_version,
+        name="get_note_version",
+    ),
 ]
@@ -0,0 +1,31 @@
+# Notes Validators
+TITLE_MAX_LENGTH = 200
+
+
+def validate_title(title):
+    """
+    Check a note title
+
+    Returns:
+        str: error message, or None if the title is valid
+    """
+    # Validation: title must be provided and must be a string
+    if not title or not isinstance(title, str):
+        return "Invalid title"
+    # Validation: title must be less than 200 characters -> Just for fun
+    if len(title) > TITLE_MAX_LENGTH:
+        return "Title is too long"
+    return None
+
+
+def validate_content(content):
+    """
+    Check a note content
+
+    Returns:
+        str: error message, or None if the content is valid
+    """
+    # Validation: content must be provided and must be a string
+    if not content or not isinstance(content, str):
+        return "Invalid content"
+    return None
@@ -3,13 +3,157 @@ import json
 
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
-from django.http import HttpResponse, JsonResponse
+from django.db import router
+from django.db.models import F
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_POST
 from rest_framework import status
 from rest_framework.response import Response
 
-from notes.models import Note, NoteUpdate
+from notes.bulk import MAX_BULK_ITEMS, bulk_create_notes, bulk_update_notes
+from notes.cache import get_note_data
+from notes.changes import cursor_expired
+from notes.export import EXPORT_FORMATS, iter_export
+from notes.history import (
+    commit_version,
+    create_with_history,
+    get_history_page,
+    get_version,
+)
+from notes.metrics import render as render_metrics
+from notes.models import Note, RequestProfile
+from notes.pagination import (
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE,
+    get_datetime_param,
+    get_page_params,
+    paginate,
+)
+from notes.permissions import CAN_GET, CAN_READ, CAN_SHARE, CAN_WRITE, get_access
+from notes.profiling import top_functions
+from notes.search import get_search_backend
+from notes.sharing import share_with, unshare_with
+from notes.sync import get_changes_page, get_snapshot_page
+from notes.validators import validate_content, validate_title
+
+# Fields returned by list_notes for each projection
+NOTE_LIST_FIELDS = {
+    "title": ("id", "title", "version"),
+    "full": ("id", "title", "content", "version"),
+}
+
+
+def check_note_access(request, note_id, allowed, action):
+    """
+    Check that the logged-in user may perform an action on a note
+
+    Args:
+        request : user request
+        note_id (int:pk): note to check
+        allowed (tuple): access levels allowed, see notes.permissions
+        action (str): action name used in the error message
+
+    Raises:
+        Http404: if the note does not exist
+
+    Returns:
+        JsonResponse: 403 response, or None if the action is allowed
+    """
+    return access_error(get_access(request.user, note_id), allowed, action)
+
+
+def access_error(access, allowed, action):
+    """
+    Turn an access level into a 403 response if the action is not allowed
+
+    Raises:
+        Http404: if the note does not exist (access is None)
+    """
+    if access is None:
+        raise Http404("No Note matches the given query.")
+    if access not in allowed:
+        return JsonResponse(
+            {"error": f"You do not have permission to {action} this note"},
+            status=status.HTTP_403_FORBIDDEN,
+        )
+    return None
+
+
+def note_response(request, note_id, data):
+    """
+    Response of a note GET, answering conditional requests
+
+    Args:
+        request : user request
+        note_id (int:pk): note id
+        data (dict): title, content, version and updated_at of the note
+
+    Returns:
+        JsonResponse: note, or 304 if the client copy is current
+    """
+    if data is None:
+        raise Http404("No Note matches the given query.")
+
+    # Answer conditional requests from the version and update time
+    etag = quote_etag(f"{note_id}-{data['version']}")
+    last_modified = int(data["updated_at"].timestamp())
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = JsonResponse(
+            {
+                "title": data["title"],
+                "content": data["content"],
+                "version": data["version"],
+            }
+        )
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(last_modified)
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def parse_update(request, current_version):
+    """
+    Read and validate the body of a note PUT
+
+    Args:
+        request : user request with a JSON body holding content and an
+            optional version
+        current_version (int): version of the stored note
+
+    Returns:
+        tuple: (content, expected version, None) or (None, None, error response)
+    """
+    request_body = json.loads(request.body)
+    new_content = request_body.get("content")
+
+    error = validate_content(new_content)
+    if error:
+        return None, None, JsonResponse({"error": error}, status=400)
+
+    # Validation: version, if provided, must be the version being edited
+    expected_version = request_body.get("version", current_version)
+    if not isinstance(expected_version, int) or isinstance(expected_version, bool):
+        return None, None, JsonResponse({"error": "Invalid version"}, status=400)
+    return new_content, expected_version, None
+
+
+def update_response(update, note):
+    """
+    Response of a note PUT once commit_version ran
+    """
+    if update is None:
+        return JsonResponse(
+            {"error": "Note was modified by someone else"},
+            status=status.HTTP_409_CONFLICT,
+        )
+    return JsonResponse(
+        {"message": "Note updated successfully", "version": note.version}
+    )
 
 
 @csrf_exempt  # To handle csrf errors
@@ -28,25 +172,12 @@ def create_note(request):
         title = request.POST.get("title")
         content = request.POST.get("content")
 
-        # Validation: title and content must be provided and must be strings
-        if not title or not isinstance(title, str):
-            return JsonResponse(
-                {"error": "Invalid title"}, status=status.HTTP_400_BAD_REQUEST
-            )
-        if not content or not isinstance(content, str):
-            return JsonResponse(
-                {"error": "Invalid content"}, status=status.HTTP_400_BAD_REQUEST
-            )
-
-        # Validation: title must be less than 200 characters -> Just for fun
-        if len(title) > 200:
-            return JsonResponse(
-                {"error": "Title is too long"}, status=status.HTTP_400_BAD_REQUEST
-            )
+        error = validate_title(title) or validate_content(content)
+        if error:
+            return JsonResponse({"error": error}, status=status.HTTP_400_BAD_REQUEST)
 
         try:
-            note = Note.objects.create(title=title, content=content, owner=request.user)
-            NoteUpdate.objects.create(note=note, content=content)
+            note = create_with_history(request.user, title, content)
             return JsonResponse(
                 {"message": "Note created successfully", "note_id": note.id}
             )
@@ -57,6 +188,123 @@ def create_note(request):
             )
 
 
+@csrf_exempt
+@require_POST
+@login_required
+def bulk_notes(request):
+    """
+    Create or update many notes in one request
+
+    Args:
+        request : user request with a JSON body holding either a create list
+            of {title, content} or an update list of {id, content, version}.
+
+    Returns:
+        JSON: results, one entry per item with note_id/version or error
+    """
+    try:
+        request_body = json.loads(request.body)
+    except ValueError:
+        return JsonResponse(
+            {"error": "Invalid JSON body"}, status=status.HTTP_400_BAD_REQUEST
+        )
+
+    # Validation: exactly one of create or update must be a list of items
+    operations = [
+        key
+        for key in ("create", "update")
+        if isinstance(request_body, dict) and key in request_body
+    ]
+    if len(operations) != 1 or not isinstance(request_body[operations[0]], list):
+        return JsonResponse(
+            {"error": "Provide either a create or an update list"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    items = request_body[operations[0]]
+    if len(items) > MAX_BULK_ITEMS:
+        return JsonResponse(
+            {"error": f"At most {MAX_BULK_ITEMS} items per request"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    if operations[0] == "create":
+        results = bulk_create_notes(request.user, items)
+    else:
+        results = bulk_update_notes(request.user, items)
+    return JsonResponse({"results": results})
+
+
+@require_GET
+@login_required
+def list_notes(request):
+    """
+    List the notes owned by or shared with the user, newest first
+
+    Args:
+        request : user request, with optional cursor, limit and
+            fields (title or full) query parameters.
+
+    Returns:
+        JSON: results, next_cursor
+    """
+    fields = request.GET.get("fields", "title")
+    if fields not in NOTE_LIST_FIELDS:
+        return JsonResponse(
+            {"error": "Invalid fields"}, status=status.HTTP_400_BAD_REQUEST
+        )
+    try:
+        cursor, limit = get_page_params(request)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    notes = Note.objects.visible_to(request.user)
+    if cursor is not None:
+        notes = notes.filter(id__lt=cursor)
+
+    rows = list(
+        notes.order_by("-id").values(
+            *NOTE_LIST_FIELDS[fields], owner_username=F("owner__username")
+        )[: limit + 1]
+    )
+    results, next_cursor = paginate(rows, limit, "id")
+    return JsonResponse({"results": results, "next_cursor": next_cursor})
+
+
+@require_GET
+@login_required
+def search_notes(request):
+    """
+    Full text search over the notes owned by or shared with the user
+
+    Args:
+        request : user request, with q and optional offset and limit query
+            parameters.
+
+    Returns:
+        JSON: results (id, title, snippet, rank), next_offset
+    """
+    query = request.GET.get("q", "")
+    if not query.strip():
+        return JsonResponse(
+            {"error": "Invalid query"}, status=status.HTTP_400_BAD_REQUEST
+        )
+    try:
+        offset = int(request.GET.get("offset", 0))
+        limit = min(int(request.GET.get("limit", DEFAULT_PAGE_SIZE)), MAX_PAGE_SIZE)
+    except ValueError:
+        offset = limit = -1
+    if offset < 0 or limit < 1:
+        return JsonResponse(
+            {"error": "offset and limit must be positive integers"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    backend = get_search_backend(router.db_for_read(Note))
+    results = backend.search(request.user, query, offset, limit + 1)
+    next_offset = offset + limit if len(results) > limit else None
+    return JsonResponse({"results": results[:limit], "next_offset": next_offset})
+
+
 @login_required
 def get_or_update_note(request, note_id):
     """
@@ -70,103 +318,438 @@ def get_or_update_note(request, note_id):
         str: title, content
     """
     if request.method == "GET":
-        note = get_object_or_404(Note, id=note_id)
-
         # Check if the logged-in user is the owner of the note
-        if request.user != note.owner:
-            return JsonResponse(
-                {"error": "You do not have permission to view this note"},
-                status=status.HTTP_403_FORBIDDEN,
-            )
+        error = check_note_access(request, note_id, CAN_GET, "view")
+        if error:
+            return error
 
-        return JsonResponse({"title": note.title, "content": note.content})
+        return note_response(request, note_id, get_note_data(note_id))
     elif request.method == "PUT":
+        # Check if the logged-in user has access to the note
+        error = check_note_access(request, note_id, CAN_WRITE, "edit")
+        if error:
+            return error
+
         note = get_object_or_404(Note, id=note_id)
+        new_content, expected_version, error = parse_update(request, note.version)
+        if error:
+            return error
 
-        # Check if the logged-in user has access to the note
-        if request.user != note.owner and request.user not in note.shared_with.all():
-            return JsonResponse(
-                {"error": "You do not have permission to edit this note"}, status=403
-            )
+        update = commit_version(note, new_content, expected_version)
+        return update_response(update, note)
 
-        request_body = json.loads(request.body)
-        new_content = request_body.get("content")
 
-        # Validation: new_content must be provided and must be a string
-        if not new_content or not isinstance(new_content, str):
-            return JsonResponse({"error": "Invalid content"}, status=400)
+def parse_share(request):
+    """
+    Read the note id and usernames of a share or unshare request
+
+    Args:
+        request : user request with note_id and usernames form fields
+
+    Returns:
+        tuple: (note id, usernames, None) or (None, None, error response)
+    """
+    note_id = request.POST.get("note_id", "")
+    usernames = request.POST.getlist("usernames")
+    if not note_id.isdigit():
+        return (
+            None,
+            None,
+            JsonResponse(
+                {"error": "Invalid note_id"}, status=status.HTTP_400_BAD_REQUEST
+            ),
+        )
+    return int(note_id), usernames, None
 
-        note_update = NoteUpdate.objects.create(note=note, content=new_content)
-        Note.objects.update(id=note.id, content=new_content)
 
-        return JsonResponse({"message": "Note updated successfully"})
+def expired_error():
+    """
+    410 response for a change log cursor older than the retention window
+    """
+    return JsonResponse(
+        {"error": "Changes after this cursor were pruned, sync without a cursor"},
+        status=status.HTTP_410_GONE,
+    )
+
+
+def self_share_error(request, usernames):
+    """
+    400 response if the user is sharing a note with themselves, else None
+    """
+    if request.user.username in usernames:
+        return JsonResponse(
+            {"error": "You can't share your note with yourself."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    return None
+
+
+def get_share_request(request):
+    """
+    Read and check the note and usernames of a share or unshare request
+
+    Args:
+        request : user request with note_id and usernames form fields
+
+    Returns:
+        tuple: (note, usernames, None) or (None, None, error response)
+    """
+    note_id, usernames, error = parse_share(request)
+    if error:
+        return None, None, error
+
+    # Check if logged user is owner of this note
+    error = check_note_access(request, note_id, CAN_SHARE, "share")
+    if error:
+        return None, None, error
+
+    # check if user is sharing note with self
+    error = self_share_error(request, usernames)
+    if error:
+        return None, None, error
+    return Note(id=note_id, owner_id=request.user.id), usernames, None
+
+
+def share_response(result):
+    """
+    Response of a share request from the result of share_with
+    """
+    if result["added"]:
+        return JsonResponse({"message": "Note shared successfully!", **result})
+
+    # Nothing was shared: report unknown users first, then already shared ones
+    if result["unknown"]:
+        return JsonResponse(
+            {"error": "User not found.", **result}, status=status.HTTP_404_NOT_FOUND
+        )
+    return JsonResponse(
+        {"error": "Note is already shared with this user.", **result},
+        status=status.HTTP_400_BAD_REQUEST,
+    )
 
 
 @csrf_exempt
+@require_POST
 @login_required
 def share_note(request):
     """
-    Share a note to another existing user
+    Share a note with other existing users
 
     Args:
         request : user request
 
     Returns:
-        JSON: status, message
+        JSON: message, added, skipped, unknown
     """
-    if request.method == "POST":
-        note_id = request.POST.get("note_id")
-        usernames = request.POST.getlist("usernames")
-        note = get_object_or_404(Note, id=note_id)
+    note, usernames, error = get_share_request(request)
+    if error:
+        return error
 
-    # Check if logged user is owner of this note
-    if request.user != note.owner:
-        return JsonResponse(
-            {"error": "You do not permission to share this note"},
-            status=status.HTTP_403_FORBIDDEN,
-        )
+    return share_response(share_with(note, usernames))
 
-    for username in usernames:
-        user = get_object_or_404(User, username=username)
 
-        # check if user is sharing note with self
-        if request.user == user:
-            return JsonResponse(
-                {"error": "You can't share your note with yourself."},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
+@csrf_exempt
+@require_POST
+@login_required
+def unshare_note(request):
+    """
+    Stop sharing a note with other users
 
-        # check if user is sharing note with already shared user.
-        if user in note.shared_with.all():
-            return JsonResponse(
-                {"error": "Note is already shared with this user."},
-                status=status.HTTP_400_BAD_REQUEST,
-            )
-        note.shared_with.add(user)
+    Args:
+        request : user request
+
+    Returns:
+        JSON: message, removed, skipped, unknown
+    """
+    note, usernames, error = get_share_request(request)
+    if error:
+        return error
 
-    return JsonResponse({"message": "Note shared successfully!"})
+    result = unshare_with(note, usernames)
+    return JsonResponse({"message": "Note unshared successfully!", **result})
+
+
+def parse_history(request):
+    """
+    Read and validate the query parameters of a history request
+
+    Returns:
+        tuple: (get_history_page keyword arguments, None) or (None, error response)
+    """
+    fields = request.GET.get("fields", "full")
+    if fields not in ("full", "meta"):
+        return None, JsonResponse(
+            {"error": "Invalid fields"}, status=status.HTTP_400_BAD_REQUEST
+        )
+    try:
+        cursor, limit = get_page_params(request)
+        since = get_datetime_param(request, "since")
+        until = get_datetime_param(request, "until")
+    except ValueError as e:
+        return None, JsonResponse({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    params = {
+        "cursor": cursor,
+        "limit": limit,
+        "since": since,
+        "until": until,
+        "with_content": fields == "full",
+    }
+    return params, None
 
 
 @login_required
 def get_note_history(request, note_id):
     """
-    Get note history
+    Get note history, newest first
 
     Args:
-        request : user request
+        request : user request, with optional cursor, limit, since, until
+            and fields (full or meta) query parameters.
         note_id (int:pk): note id to get fetch history for.
 
     Returns:
-        JSON: list of history for note
+        JSON: results, next_cursor
+    """
+    params, error = parse_history(request)
+    if error:
+        return error
+
+    # Check if the logged-in user has access to the note
+    error = check_note_access(request, note_id, CAN_READ, "view")
+    if error:
+        return error
+
+    results, next_cursor = get_history_page(Note(id=note_id), **params)
+    return JsonResponse({"results": results, "next_cursor": next_cursor})
+
+
+@login_required
+def get_note_version(request, note_id, version):
     """
-    note = get_object_or_404(Note, id=note_id)
+    Get a single version of a note from its history
+
+    Args:
+        request : user request
+        note_id (int:pk): note id to fetch the version for.
+        version (int): version number to rebuild.
 
+    Returns:
+        JSON: version, content, timestamp
+    """
     # Check if the logged-in user has access to the note
-    if request.user != note.owner and request.user not in note.shared_with.all():
+    error = check_note_access(request, note_id, CAN_READ, "view")
+    if error:
+        return error
+    return version_response(get_version(Note(id=note_id), version))
+
+
+def version_response(result):
+    """
+    Response of a version request from the result of get_version
+    """
+    if result is None:
         return JsonResponse(
-            {"error": "You do not have permission to view this note"},
-            status=status.HTTP_403_FORBIDDEN,
+            {"error": "Version not found"}, status=status.HTTP_404_NOT_FOUND
+        )
+
+    update, content = result
+    return JsonResponse(
+        {"version": update.version, "content": content, "timestamp": update.timestamp}
+    )
+
+
+@require_GET
+@login_required
+def export_notes(request):
+    """
+    Stream every note owned by or shared with the user, with its history
+
+    Args:
+        request : user request, with optional format (ndjson or json) query
+            parameter.
+
+    Returns:
+        NDJSON or JSON: note and update records
+    """
+    export_format = request.GET.get("format", "ndjson")
+    if export_format not in EXPORT_FORMATS:
+        return JsonResponse(
+            {"error": "Invalid format"}, status=status.HTTP_400_BAD_REQUEST
+        )
+
+    response = StreamingHttpResponse(
+        iter_export(request.user, export_format),
+        content_type=EXPORT_FORMATS[export_format],
+    )
+    response["Content-Disposition"] = (
+        f'attachment; filename="notes-{request.user.username}.{export_format}"'
+    )
+    return response
+
+
+@require_GET
+@login_required
+def sync_notes(request):
+    """
+    Incremental sync of the notes owned by or shared with the user
+
+    Without cursor, returns the first page of a snapshot of every note and
+    the change log cursor; follow with cursor and after until after is
+    null. Later syncs only pass the last cursor and receive the notes
+    changed since, and tombstones for notes deleted or unshared. A cursor
+    older than the change log retention gets a 410: sync from scratch.
+
+    Args:
+        request : user request, with optional cursor, after and limit query
+            parameters.
+
+    Returns:
+        JSON: notes, tombstones, cursor, after, has_more
+    """
+    try:
+        cursor = request.GET.get("cursor")
+        cursor = int(cursor) if cursor else None
+        after = request.GET.get("after")
+        after = int(after) if after else None
+        limit = int(request.GET.get("limit", DEFAULT_PAGE_SIZE))
+    except ValueError:
+        cursor = after = limit = -1
+    if (cursor or 0) < 0 or (after or 0) < 0 or limit < 1:
+        return JsonResponse(
+            {"error": "cursor, after and limit must be positive integers"},
+            status=status.HTTP_400_BAD_REQUEST,
         )
+    limit = min(limit, MAX_PAGE_SIZE)
 
-    updates = note.updates.order_by("-timestamp").values("content", "timestamp")
-    return JsonResponse(list(updates), safe=False)
+    if cursor is None or after is not None:
+        page = get_snapshot_page(request.user, cursor, after, limit)
+    elif cursor_expired(cursor):
+        return expired_error()
+    else:
+        page = get_changes_page(request.user, cursor, limit)
+    return JsonResponse(page)
+
+
+@require_GET
+def get_metrics(request):
+    """
+    Request metrics of every worker in the Prometheus text format, see
+    notes.metrics. Not authenticated: expose it to the monitoring network
+    only.
+
+    Args:
+        request : scrape request
+
+    Returns:
+        text/plain: metrics samples
+    """
+    return HttpResponse(
+        render_metrics(), content_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+# Fields returned by list_profiles
+PROFILE_LIST_FIELDS = (
+    "id",
+    "mode",
+    "method",
+    "path",
+    "view",
+    "status",
+    "duration",
+    "created_at",
+)
+
+# Downloads of get_profile: content type and file extension by format
+PROFILE_FORMATS = {
+    "pstats": ("application/octet-stream", "prof"),
+    "collapsed": ("text/plain; charset=utf-8", "txt"),
+}
+
+
+def staff_error(request):
+    """
+    403 response if the user is not staff, else None
+    """
+    if request.user.is_staff:
+        return None
+    return JsonResponse(
+        {"error": "You do not have permission to view profiles"},
+        status=status.HTTP_403_FORBIDDEN,
+    )
+
+
+@require_GET
+@login_required
+def list_profiles(request):
+    """
+    List the stored request profiles, newest first (staff only)
+
+    Args:
+        request : user request, with optional cursor and limit query
+            parameters.
+
+    Returns:
+        JSON: results, next_cursor
+    """
+    error = staff_error(request)
+    if error:
+        return error
+    try:
+        cursor, limit = get_page_params(request)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    profiles = RequestProfile.objects.all()
+    if cursor is not None:
+        profiles = profiles.filter(id__lt=cursor)
+    rows = list(profiles.order_by("-id").values(*PROFILE_LIST_FIELDS)[: limit + 1])
+    results, next_cursor = paginate(rows, limit, "id")
+    return JsonResponse({"results": results, "next_cursor": next_cursor})
+
+
+@require_GET
+@login_required
+def get_profile(request, profile_id):
+    """
+    Get a request profile (staff only)
+
+    The default JSON summary has the slowest functions and the SQL of the
+    request. format=pstats downloads the cProfile data for pstats, snakeviz
+    or flameprof, format=collapsed the sampled stacks for flamegraph.pl or
+    speedscope.
+
+    Args:
+        request : user request, with optional format (json, pstats or
+            collapsed) query parameter.
+        profile_id (int:pk): profile to get.
+
+    Returns:
+        JSON or file: profile
+    """
+    error = staff_error(request)
+    if error:
+        return error
+    profile = get_object_or_404(RequestProfile, id=profile_id)
+    profile_format = request.GET.get("format", "json")
+
+    if profile_format == "json":
+        data = {field: getattr(profile, field) for field in PROFILE_LIST_FIELDS}
+        if profile.mode == RequestProfile.CPROFILE:
+            data["functions"] = top_functions(profile)
+        data["queries"] = profile.queries
+        return JsonResponse(data)
+
+    expected = "pstats" if profile.mode == RequestProfile.CPROFILE else "collapsed"
+    if profile_format != expected:
+        return JsonResponse(
+            {"error": f"Invalid format, {profile.mode} profiles have {expected} data"},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    content_type, extension = PROFILE_FORMATS[profile_format]
+    content = bytes(profile.stats) if expected == "pstats" else profile.stacks
+    response = HttpResponse(content, content_type=content_type)
+    response["Content-Disposition"] = (
+        f'attachment; filename="profile-{profile.id}.{extension}"'
+    )
+    return response
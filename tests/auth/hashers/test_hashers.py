@@ -0,0 +1,147 @@
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from rest_framework import status
+
+from auth.hashers import pool
+
+AUTH_SAMPLE_DATA = {
+    "username": "johnwick",
+    "password": "aB@#2022",
+    "email": "abc@xyz.com",
+    "first_name": "John",
+    "last_name": "Wick",
+}
+
+FAST_HASHERS = [
+    "django.contrib.auth.hashers.MD5PasswordHasher",
+    "auth.hashers.TunedScryptPasswordHasher",
+]
+
+SCRYPT_HASHERS = [
+    "auth.hashers.TunedScryptPasswordHasher",
+    "django.contrib.auth.hashers.MD5PasswordHasher",
+]
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS, AUTH_PASSWORD_WORKERS=1)
+class HashingPoolTestCase(TestCase):
+    url = "/login/"
+
+    def setUp(self):
+        self.user = User.objects.create_user(**AUTH_SAMPLE_DATA)
+
+    def tearDown(self):
+        pool.shutdown()
+
+    def login(self, password="aB@#2022"):
+        return self.client.post(
+            self.url, {"username": "johnwick", "password": password}
+        )
+
+    def test_login_in_pool(self):
+        self.assertEqual(self.login().status_code, status.HTTP_200_OK)
+        self.assertEqual(self.login("wrong").status_code, 401)
+        response = self.client.post(
+            self.url, {"username": "nobody", "password": "aB@#2022"}
+        )
+        self.assertEqual(response.status_code, 401)
+
+    def test_rehash_on_login(self):
+        self.assertTrue(self.user.password.startswith("md5$"))
+        for workers in (1, 0):
+            User.objects.filter(id=self.user.id).update(
+                password=make_password("aB@#2022")
+            )
+            with override_settings(
+                PASSWORD_HASHERS=SCRYPT_HASHERS, AUTH_PASSWORD_WORKERS=workers
+            ):
+                self.assertEqual(self.login().status_code, status.HTTP_200_OK)
+                self.user.refresh_from_db()
+                self.assertTrue(self.user.password.startswith("scrypt$"))
+                self.assertEqual(self.login().status_code, status.HTTP_200_OK)
+
+    def test_wrong_password_is_not_rehashed(self):
+        with override_settings(PASSWORD_HASHERS=SCRYPT_HASHERS):
+            self.assertEqual(self.login("wrong").status_code, 401)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith("md5$"))
+
+    @override_settings(AUTH_PASSWORD_QUEUE=0, AUTH_PASSWORD_QUEUE_TIMEOUT=0)
+    def test_full_pool_is_busy(self):
+        _, slots = pool.get_executor()
+        slots.acquire()
+        try:
+            response = self.login()
+        finally:
+            slots.release()
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(self.login().status_code, status.HTTP_200_OK)
+
+    def test_signup_hashes_in_pool(self):
+        data = {
+            **AUTH_SAMPLE_DATA,
+            "username": "other",
+            "email": "other@xyz.com",
+            "password2": "aB@#2022",
+        }
+        response = self.client.post("/signup/", data)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        user = User.objects.get(username="other")
+        self.assertTrue(user.password.startswith("md5$"))
+        self.assertTrue(user.check_password("aB@#2022"))
+
+
+@override_settings(
+    PASSWORD_HASHERS=FAST_HASHERS,
+    AUTH_PASSWORD_WORKERS=1,
+    ROOT_URLCONF="auth.async_urls",
+)
+class AsyncLoginTestCase(TestCase):
+    url = "/login/"
+
+    def setUp(self):
+        self.user = User.objects.create_user(**AUTH_SAMPLE_DATA)
+
+    def tearDown(self):
+        pool.shutdown()
+
+    async def login(self, password="aB@#2022", username="johnwick"):
+        return await self.async_client.post(
+            self.url,
+            {"username": username, "password": password},
+            content_type="application/json",
+        )
+
+    async def test_login_in_pool(self):
+        response = await self.login()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(response.json()), {"refresh", "access"})
+        self.assertEqual((await self.login("wrong")).status_code, 401)
+        self.assertEqual((await self.login(username="nobody")).status_code, 401)
+        response = await self.async_client.post(self.url, {"username": "johnwick"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("password", response.json())
+
+    async def test_rehash_on_login(self):
+        for workers in (1, 0):
+            await User.objects.filter(id=self.user.id).aupdate(
+                password=make_password("aB@#2022")
+            )
+            with override_settings(
+                PASSWORD_HASHERS=SCRYPT_HASHERS, AUTH_PASSWORD_WORKERS=workers
+            ):
+                self.assertEqual((await self.login()).status_code, 200)
+                await self.user.arefresh_from_db()
+                self.assertTrue(self.user.password.startswith("scrypt$"))
+
+    @override_settings(AUTH_PASSWORD_QUEUE=0, AUTH_PASSWORD_QUEUE_TIMEOUT=0)
+    async def test_full_pool_is_busy(self):
+        _, slots = pool.get_executor()
+        slots.acquire()
+        try:
+            response = await self.login()
+        finally:
+            slots.release()
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual((await self.login()).status_code, status.HTTP_200_OK)
@@ -0,0 +1,174 @@
+import tempfile
+from io import StringIO
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase, override_settings
+from rest_framework import status
+from rest_framework.test import APITestCase
+
+from auth.users import email_exists, provision_users
+
+AUTH_SAMPLE_DATA = {
+    "username": "johnwick",
+    "password": "aB@#2022",
+    "email": "abc@xyz.com",
+    "first_name": "John",
+    "last_name": "Wick",
+}
+
+FAST_HASHERS = ["django.contrib.auth.hashers.MD5PasswordHasher"]
+
+
+class MissingReplicaRouter:
+    """
+    Send user reads to a database that does not exist
+    """
+
+    def db_for_read(self, model, **hints):
+        return "missing_replica" if model is User else None
+
+
+class EmailIndexTestCase(APITestCase):
+    def setUp(self):
+        User.objects.create_user(**AUTH_SAMPLE_DATA)
+
+    @override_settings(DATABASE_ROUTERS=[MissingReplicaRouter()])
+    def test_email_checks_use_primary(self):
+        self.assertTrue(email_exists("ABC@xyz.com"))
+
+    def test_emails_are_unique_ignoring_case(self):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            User.objects.create(username="other", email="ABC@xyz.com")
+        # Users without an email are not indexed
+        User.objects.create(username="first")
+        User.objects.create(username="second")
+
+    def test_signup_checks_email_ignoring_case(self):
+        self.assertTrue(email_exists("Abc@XYZ.com"))
+        data = {
+            **AUTH_SAMPLE_DATA,
+            "username": "other",
+            "email": "ABC@xyz.com",
+            "password2": "aB@#2022",
+        }
+        response = self.client.post("/signup/", data)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("email", response.json())
+
+    def test_email_lookup_uses_index(self):
+        if connection.vendor != "sqlite":
+            self.skipTest("SQLite query plan")
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "EXPLAIN QUERY PLAN SELECT LOWER(email) FROM auth_user "
+                "WHERE LOWER(email) IN (LOWER(%s)) AND email <> ''",
+                ["abc@xyz.com"],
+            )
+            plan = " ".join(str(row) for row in cursor.fetchall())
+        self.assertIn("auth_user_email_ci_uniq", plan)
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS, AUTH_PASSWORD_WORKERS=0)
+class ProvisionUsersTestCase(TestCase):
+    def setUp(self):
+        User.objects.create_user(**AUTH_SAMPLE_DATA)
+
+    def rows(self, count, prefix="user"):
+        return [
+            {"username": f"{prefix}{index}", "email": f"{prefix}{index}@xyz.com"}
+            for index in range(count)
+        ]
+
+    def test_batches_and_skips(self):
+        rows = self.rows(5) + [
+            {"username": "johnwick", "email": "new@xyz.com"},
+            {"username": "new", "email": "ABC@xyz.com"},
+            {"username": "user1", "email": "again@xyz.com"},
+            {"username": "bad name!", "email": "not an email"},
+            {"username": "weak", "email": "weak@xyz.com", "password": "123"},
+            {"username": "number", "email": 5},
+            "not a row",
+            {
+                "username": "strong",
+                "email": "strong@xyz.com",
+                "password": "aB@#2022",
+                "first_name": "Strong",
+            },
+        ]
+        for totals in provision_users(rows, batch_size=2):
+            pass
+        self.assertEqual(totals["created"], 6)
+        self.assertEqual(
+            [(row["row"], row["reason"]) for row in totals["skipped"]],
+            [(7, "duplicate row"), (5, "username exists"), (6, "email exists")],
+        )
+        self.assertEqual([row["row"] for row in totals["invalid"]], [8, 9, 10, 11])
+        self.assertEqual(set(totals["invalid"][0]["errors"]), {"username", "email"})
+        self.assertEqual(set(totals["invalid"][2]["errors"]), {"email"})
+        self.assertEqual(set(totals["invalid"][3]["errors"]), {"row"})
+        self.assertFalse(User.objects.get(username="user0").has_usable_password())
+        strong = User.objects.get(username="strong")
+        self.assertTrue(strong.check_password("aB@#2022"))
+        self.assertEqual(strong.first_name, "Strong")
+
+    def test_non_ascii_emails_match_the_index(self):
+        User.objects.create(username="emile", email="EMILE@ÉCOLE.fr")
+        rows = [{"username": "other", "email": "emile@École.fr"}]
+        for totals in provision_users(rows):
+            pass
+        self.assertEqual(totals["created"], 0)
+        self.assertEqual(totals["skipped"], [{"row": 0, "reason": "email exists"}])
+
+    def test_command(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory, "users.csv")
+            path.write_text(
+                "username,email,first_name,last_name,password\n"
+                "alice,alice@xyz.com,Alice,A,aB@#2022alice\n"
+                "bob,bob@xyz.com,Bob,B,\n"
+            )
+            stdout = StringIO()
+            call_command("provision_users", str(path), stdout=stdout)
+        self.assertIn("Created 2 users", stdout.getvalue())
+        self.assertTrue(
+            User.objects.get(username="alice").check_password("aB@#2022alice")
+        )
+        self.assertFalse(User.objects.get(username="bob").has_usable_password())
+
+
+@override_settings(PASSWORD_HASHERS=FAST_HASHERS, AUTH_PASSWORD_WORKERS=0)
+class ProvisionUsersAPITest(APITestCase):
+    url = "/users/bulk/"
+
+    def setUp(self):
+        self.user = User.objects.create_user(**AUTH_SAMPLE_DATA)
+
+    def test_admin_only(self):
+        self.client.force_authenticate(self.user)
+        response = self.client.post(self.url, {"users": []}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    @override_settings(AUTH_PROVISION_MAX_USERS=3)
+    def test_provision(self):
+        self.user.is_staff = True
+        self.user.save()
+        self.client.force_authenticate(self.user)
+        users = [
+            {"username": f"user{index}", "email": f"USER{index}@xyz.com"}
+            for index in range(3)
+        ]
+        response = self.client.post(self.url, {"users": users}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.json()["created"], 3)
+        response = self.client.post(self.url, {"users": users}, format="json")
+        self.assertEqual(len(response.json()["skipped"]), 3)
+
+        response = self.client.post(
+            self.url, {"users": users + users[:1]}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(self.url, users, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,125 @@
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from auth.serializers import LoginSerializer
+from notes.models import Note
+
+AUTH_SAMPLE_DATA = {
+    "username": "johnwick",
+    "password": "aB@#2022",
+    "email": "abc@xyz.com",
+    "first_name": "John",
+    "last_name": "Wick",
+}
+
+
+@override_settings(ROOT_URLCONF="notes.async_urls")
+class AsyncNoteTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(**AUTH_SAMPLE_DATA)
+        self.other = User.objects.create_user(username="other", password="aB@#2022")
+        self.async_client.force_login(self.user)
+
+    async def test_create_get_and_update(self):
+        response = await self.async_client.post(
+            reverse("create_note"), {"title": "Title", "content": "Content"}
+        )
+        self.assertEqual(response.status_code, 200)
+        note_id = response.json()["note_id"]
+        url = reverse("get_or_update_note", args=[note_id])
+
+        response = await self.async_client.get(url)
+        self.assertEqual(response.json()["content"], "Content")
+        self.assertEqual(response.json()["version"], 1)
+        response = await self.async_client.get(
+            url, headers={"If-None-Match": response["ETag"]}
+        )
+        self.assertEqual(response.status_code, 304)
+
+        response = await self.async_client.put(
+            url,
+            {"content": "Updated", "version": 1},
+            content_type="application/json",
+        )
+        self.assertEqual(response.json()["version"], 2)
+        response = await self.async_client.put(
+            url,
+            {"content": "Stale", "version": 1},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 409)
+
+    async def test_history_and_version(self):
+        response = await self.async_client.post(
+            reverse("create_note"), {"title": "Title", "content": "one"}
+        )
+        note_id = response.json()["note_id"]
+        await self.async_client.put(
+            reverse("get_or_update_note", args=[note_id]),
+            {"content": "two"},
+            content_type="application/json",
+        )
+
+        response = await self.async_client.get(
+            reverse("get_note_history", args=[note_id])
+        )
+        results = response.json()["results"]
+        self.assertEqual([row["content"] for row in results], ["two", "one"])
+
+        response = await self.async_client.get(
+            reverse("get_note_version", args=[note_id, 1])
+        )
+        self.assertEqual(response.json()["content"], "one")
+        response = await self.async_client.get(
+            reverse("get_note_version", args=[note_id, 3])
+        )
+        self.assertEqual(response.status_code, 404)
+
+    async def test_share(self):
+        note = await Note.objects.acreate(
+            title="Title", content="Content", owner=self.user
+        )
+        response = await self.async_client.post(
+            reverse("share_note"),
+            {"note_id": note.id, "usernames": ["other", "ghost"]},
+        )
+        self.assertEqual(response.json()["added"], ["other"])
+        self.assertEqual(response.json()["unknown"], ["ghost"])
+        self.assertTrue(await note.shared_with.filter(id=self.other.id).aexists())
+
+        response = await self.async_client.post(
+            reverse("share_note"), {"note_id": note.id, "usernames": ["other"]}
+        )
+        self.assertEqual(response.status_code, 400)
+
+    async def test_access_checks(self):
+        note = await Note.objects.acreate(
+            title="Title", content="Content", owner=self.other
+        )
+        response = await self.async_client.get(
+            reverse("get_or_update_note", args=[note.id])
+        )
+        self.assertEqual(response.status_code, 403)
+        response = await self.async_client.get(
+            reverse("get_or_update_note", args=[note.id + 1])
+        )
+        self.assertEqual(response.status_code, 404)
+
+    async def test_login_required(self):
+        await self.async_client.alogout()
+        response = await self.async_client.get(reverse("get_note_history", args=[1]))
+        self.assertEqual(response.status_code, 302)
+
+    @override_settings(NOTES_JWT_STATELESS=True)
+    async def test_token_user(self):
+        await self.async_client.alogout()
+        note = await Note.objects.acreate(
+            title="Title", content="Content", owner=self.user
+        )
+        token = LoginSerializer.get_token(self.user).access_token
+        response = await self.async_client.get(
+            reverse("get_or_update_note", args=[note.id]),
+            headers={"Authorization": f"Bearer {token}"},
+        )
+        self.assertEqual(response.json()["content"], "Content")
@@ -0,0 +1,87 @@
+from django.contrib.auth.models import User
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from auth.serializers import LoginSerializer
+from notes.models import Note
+
+AUTH_SAMPLE_DATA = {
+    "username": "johnwick",
+    "password": "aB@#2022",
+    "email": "abc@xyz.com",
+    "first_name": "John",
+    "last_name": "Wick",
+}
+
+
+class JWTAuthenticationTestCase(TestCase):
+    def setUp(self):
+        self.client = Client(enforce_csrf_checks=True)
+        self.user = User.objects.create_user(**AUTH_SAMPLE_DATA)
+        self.note = Note.objects.create(
+            title="Test Note", content="This is a test note.", owner=self.user
+        )
+        token = LoginSerializer.get_token(self.user).access_token
+        self.headers = {"Authorization": f"Bearer {token}"}
+        self.url = reverse("get_or_update_note", args=[self.note.id])
+
+    def test_token_replaces_session(self):
+        # user, permission, note: no session read
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url, headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["content"], "This is a test note.")
+
+    @override_settings(NOTES_JWT_STATELESS=True)
+    def test_stateless_reads_skip_user_row(self):
+        # permission, note
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url, headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.get(reverse("list_notes"), headers=self.headers)
+        self.assertEqual(response.json()["results"][0]["id"], self.note.id)
+
+    @override_settings(NOTES_JWT_STATELESS=True)
+    def test_stateless_writes_load_user(self):
+        response = self.client.post(
+            reverse("create_note"),
+            {"title": "Title", "content": "Content"},
+            headers=self.headers,
+        )
+        self.assertEqual(response.status_code, 200)
+        note = Note.objects.get(id=response.json()["note_id"])
+        self.assertEqual(note.owner, self.user)
+
+        # Token requests are not subject to CSRF checks
+        response = self.client.put(
+            self.url,
+            {"content": "Updated"},
+            content_type="application/json",
+            headers=self.headers,
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_invalid_token(self):
+        response = self.client.get(
+            self.url, headers={"Authorization": "Bearer not-a-token"}
+        )
+        self.assertEqual(response.status_code, 401)
+
+    def test_inactive_user(self):
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get(self.url, headers=self.headers)
+        self.assertEqual(response.status_code, 302)
+
+    def test_login_token_works(self):
+        response = self.client.post(
+            "/login/",
+            {
+                "username": AUTH_SAMPLE_DATA["username"],
+                "password": AUTH_SAMPLE_DATA["password"],
+            },
+        )
+        headers = {"Authorization": f"Bearer {response.json()['access']}"}
+        response = self.client.get(self.url, headers=headers)
+        self.assertEqual(response.status_code, 200)
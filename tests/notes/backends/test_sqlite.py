@@ -0,0 +1,26 @@
+from unittest import skipUnless
+
+from django.db import connection, transaction
+from django.test import TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+
+
+@skipUnless(connection.vendor == "sqlite", "SQLite backend")
+class SqliteBackendTestCase(TransactionTestCase):
+    def test_pragmas(self):
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA synchronous")
+            self.assertEqual(cursor.fetchone()[0], 1)
+            cursor.execute("PRAGMA busy_timeout")
+            self.assertEqual(cursor.fetchone()[0], 20000)
+
+    def test_transaction_mode(self):
+        with CaptureQueriesContext(connection) as queries:
+            with transaction.atomic():
+                pass
+        self.assertEqual(queries[0]["sql"], "BEGIN IMMEDIATE")
+
+    def test_options_not_passed_to_sqlite(self):
+        params = connection.get_connection_params()
+        self.assertNotIn("pragmas", params)
+        self.assertNotIn("transaction_mode", params)
@@ -0,0 +1,76 @@
+import os
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.test import TestCase
+
+from notes.benchmarks import bench_endpoints, get_revision
+from notes.corpus import delete_corpus, seed_corpus
+from notes.history import get_version
+from notes.models import Note
+
+
+class CorpusTestCase(TestCase):
+    def test_seed_and_delete_corpus(self):
+        corpus = seed_corpus("test", users=3, notes=2, shares=1, history=3, size=200)
+        self.assertEqual(len(corpus.users), 3)
+        note = Note.objects.get(id=corpus.notes[corpus.users[0].id][0])
+        self.assertEqual(note.version, 3)
+        self.assertEqual(get_version(note, 3)[1], note.content)
+        self.assertEqual(
+            set(note.shared_with.values_list("id", flat=True)), corpus.shares[note.id]
+        )
+
+        delete_corpus("test")
+        self.assertFalse(User.objects.exists())
+        self.assertFalse(Note.objects.exists())
+
+
+class EndpointBenchmarkTestCase(TestCase):
+    def test_every_endpoint_is_measured(self):
+        results = bench_endpoints(
+            users=3,
+            notes=2,
+            shares=1,
+            history=2,
+            size=200,
+            requests=2,
+            auth_requests=1,
+            targets="inprocess",
+        )
+        self.assertEqual(results["uncovered"], [])
+        for label, result in results["targets"]["inprocess"].items():
+            self.assertEqual(result["errors"], 0, label)
+            self.assertIsNotNone(result["queries"])
+        self.assertFalse(User.objects.exists())
+
+    def test_single_user_corpus_skips_sharing(self):
+        results = bench_endpoints(
+            users=1,
+            notes=1,
+            shares=0,
+            history=1,
+            size=200,
+            requests=1,
+            auth_requests=1,
+            targets="inprocess",
+        )
+        self.assertEqual(results["uncovered"], [])
+        self.assertIn("share_note", results["skipped"])
+        self.assertIn("unshare_note", results["skipped"])
+        endpoints = results["targets"]["inprocess"]
+        self.assertNotIn("share_note", endpoints)
+        for label, result in endpoints.items():
+            self.assertEqual(result["errors"], 0, label)
+
+    def test_revision_from_any_directory(self):
+        cwd = os.getcwd()
+        os.chdir(settings.BASE_DIR)
+        try:
+            revision = get_revision()
+            with tempfile.TemporaryDirectory() as directory:
+                os.chdir(directory)
+                self.assertEqual(get_revision(), revision)
+        finally:
+            os.chdir(cwd)
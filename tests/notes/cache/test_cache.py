@@ -0,0 +1,103 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from notes.bulk import bulk_update_notes
+from notes.cache import fetch_note_data, note_cache, note_cache_key
+from notes.models import Note
+from notes.sharing import share_with
+
+AUTH_SAMPLE_DATA = {
+    "username": "johnwick",
+    "password": "aB@#2022",
+    "email": "abc@xyz.com",
+    "first_name": "John",
+    "last_name": "Wick",
+}
+
+
+@override_settings(NOTES_CACHE_TIMEOUT=60)
+class NoteCacheTestCase(TestCase):
+    def setUp(self):
+        caches[settings.NOTES_CACHE_ALIAS].clear()
+        self.client = Client()
+        self.user = User.objects.create_user(**AUTH_SAMPLE_DATA)
+        self.note = Note.objects.create(
+            title="Test Note", content="This is a test note.", owner=self.user
+        )
+        self.client.force_login(self.user)
+        self.url = reverse("get_or_update_note", args=[self.note.id])
+
+    def test_read_through_cache(self):
+        self.client.get(self.url)
+        # session, user, permission: the note comes from the cache
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url)
+        self.assertEqual(response.json()["content"], "This is a test note.")
+
+    def test_update_replaces_cached_note(self):
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.put(
+                self.url,
+                {"content": "This is an updated note."},
+                content_type="application/json",
+            )
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url)
+        self.assertEqual(response.json()["content"], "This is an updated note.")
+        self.assertEqual(response.json()["version"], 1)
+
+    def test_bulk_update_replaces_cached_note(self):
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            bulk_update_notes(
+                self.user, [{"id": self.note.id, "content": "Bulk updated."}]
+            )
+        self.assertEqual(self.client.get(self.url).json()["content"], "Bulk updated.")
+
+    def test_share_drops_cached_note(self):
+        User.objects.create_user(username="other", password="aB@#2022")
+        self.client.get(self.url)
+        share_with(self.note, ["other"])
+        self.assertIsNone(note_cache().get(note_cache_key(self.note.id)))
+
+    def test_conditional_get(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        etag = response["ETag"]
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b"")
+
+        response = self.client.get(
+            self.url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"]
+        )
+        self.assertEqual(response.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.put(
+                self.url,
+                {"content": "This is an updated note."},
+                content_type="application/json",
+            )
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+
+    def test_stale_read_cannot_outlive_write(self):
+        # A reader loads the row, a write commits, then the reader fills
+        # the cache: only missing entries are filled, the write's one stays
+        stale = fetch_note_data(self.note.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.put(
+                self.url,
+                {"content": "This is an updated note."},
+                content_type="application/json",
+            )
+        note_cache().add(note_cache_key(self.note.id), stale)
+        response = self.client.get(self.url)
+        self.assertEqual(response.json()["content"], "This is an updated note.")
@@ -0,0 +1,177 @@
+import json
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.test import Client, TestCase, override_settings
+from django.urls import NoReverseMatch, reverse
+from django.utils import timezone
+
+from notes.bulk import bulk_create_notes, bulk_update_notes
+from notes.changes import prune_changes
+from notes.models import Note, NoteChange
+
+AUTH_SAMPLE_DATA = {
+    "username": "johnwick",
+    "password": "aB@#2022",
+    "email": "abc@xyz.com",
+    "first_name": "John",
+    "last_name": "Wick",
+}
+
+
+@override_settings(NOTES_CHANGES_POLL_INTERVAL=0.05)
+class ChangeFeedTestCase(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(**AUTH_SAMPLE_DATA)
+        self.other = User.objects.create_user(username="other", password="aB@#2022")
+        self.client.force_login(self.user)
+
+    def get_changes(self, client, **params):
+        response = client.get(reverse("get_changes"), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def create_note(self):
+        response = self.client.post(
+            reverse("create_note"), {"title": "Title", "content": "one"}
+        )
+        return response.json()["note_id"]
+
+    def test_feed_follows_note_lifecycle(self):
+        other_client = Client()
+        other_client.force_login(self.other)
+        note_id = self.create_note()
+        self.client.post(
+            reverse("share_note"), {"note_id": note_id, "usernames": ["other"]}
+        )
+        self.client.put(
+            reverse("get_or_update_note", args=[note_id]),
+            {"content": "two"},
+            content_type="application/json",
+        )
+        self.client.post(
+            reverse("unshare_note"), {"note_id": note_id, "usernames": ["other"]}
+        )
+
+        feed = self.get_changes(self.client)
+        self.assertEqual(
+            [(row["kind"], row["version"]) for row in feed["results"]],
+            [("created", 1), ("updated", 2)],
+        )
+        self.assertEqual(feed["cursor"], feed["results"][-1]["id"])
+        feed = self.get_changes(other_client)
+        self.assertEqual(
+            [row["kind"] for row in feed["results"]], ["shared", "updated", "unshared"]
+        )
+
+    def test_resume_from_cursor(self):
+        self.create_note()
+        cursor = self.get_changes(self.client)["cursor"]
+        feed = self.get_changes(self.client, cursor=cursor)
+        self.assertEqual(feed, {"results": [], "cursor": cursor, "has_more": False})
+
+        note_id = self.create_note()
+        feed = self.get_changes(self.client, cursor=cursor, limit=1)
+        self.assertEqual(feed["results"][0]["note_id"], note_id)
+        self.assertFalse(feed["has_more"])
+
+    def test_latest_cursor(self):
+        self.create_note()
+        self.create_note()
+        feed = self.get_changes(self.client, cursor="latest")
+        self.assertEqual(feed["results"], [])
+        self.assertEqual(
+            feed["cursor"], NoteChange.objects.filter(user=self.user).latest("id").id
+        )
+
+    @override_settings(NOTES_CHANGES_SETTLE_TIME=60)
+    def test_recent_changes_are_held_back(self):
+        # On PostgreSQL a change can commit after a later one: the feed
+        # never moves past a change logged less than the settle time ago
+        first, pending, last = (
+            NoteChange.objects.create(user=self.user, note_id=i, kind="created")
+            for i in range(3)
+        )
+        settled = timezone.now() - timedelta(seconds=120)
+        NoteChange.objects.filter(id__in=[first.id, last.id]).update(timestamp=settled)
+
+        feed = self.get_changes(self.client)
+        self.assertEqual([row["id"] for row in feed["results"]], [first.id])
+        self.assertFalse(feed["has_more"])
+        latest = self.get_changes(self.client, cursor="latest")
+        self.assertEqual(latest["cursor"], first.id)
+        page = self.client.get(reverse("sync_notes"), {"cursor": first.id}).json()
+        self.assertEqual(page["cursor"], first.id)
+
+        NoteChange.objects.filter(id=pending.id).update(timestamp=settled)
+        feed = self.get_changes(self.client, cursor=feed["cursor"])
+        self.assertEqual([row["id"] for row in feed["results"]], [pending.id, last.id])
+
+    def test_pruned_cursor_is_gone(self):
+        first, second, third = (
+            NoteChange.objects.create(user=self.user, note_id=i, kind="created")
+            for i in range(3)
+        )
+        NoteChange.objects.update(timestamp=timezone.now() - timedelta(days=60))
+        self.assertEqual(prune_changes(retention=30, dry_run=True), 2)
+        self.assertEqual(prune_changes(retention=30), 2)
+        # The latest change is kept to tell which cursors are too old
+        self.assertQuerySetEqual(
+            NoteChange.objects.values_list("id", flat=True), [third.id]
+        )
+
+        for url in ("get_changes", "sync_notes"):
+            response = self.client.get(reverse(url), {"cursor": first.id})
+            self.assertEqual(response.status_code, 410)
+        feed = self.get_changes(self.client, cursor=second.id)
+        self.assertEqual([row["id"] for row in feed["results"]], [third.id])
+        self.assertEqual(self.get_changes(self.client)["cursor"], third.id)
+
+    def test_long_poll_times_out(self):
+        feed = self.get_changes(self.client, wait=1)
+        self.assertEqual(feed, {"results": [], "cursor": 0, "has_more": False})
+
+    def test_invalid_params(self):
+        response = self.client.get(reverse("get_changes"), {"cursor": "abc"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_bulk_changes(self):
+        results = bulk_create_notes(self.user, [{"title": "a", "content": "a"}] * 3)
+        note = Note.objects.get(id=results[0]["note_id"])
+        note.shared_with.add(self.other)
+        bulk_update_notes(self.user, [{"id": note.id, "content": "b"}])
+        self.assertEqual(
+            NoteChange.objects.filter(user=self.user, kind="created").count(), 3
+        )
+        self.assertCountEqual(
+            NoteChange.objects.filter(kind="updated").values_list("user_id", "version"),
+            [(self.user.id, 2), (self.other.id, 2)],
+        )
+
+    @override_settings(ROOT_URLCONF="notes.async_urls")
+    async def test_event_stream(self):
+        await self.async_client.aforce_login(self.user)
+        await NoteChange.objects.acreate(
+            user=self.user, note_id=1, kind="created", version=1
+        )
+        response = await self.async_client.get(reverse("stream_changes"))
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        events = aiter(response.streaming_content)
+        self.assertTrue((await anext(events)).startswith(b"retry:"))
+        event = (await anext(events)).decode()
+        event_id, kind, data = event.strip().split("\n")
+        self.assertEqual(kind, "event: change")
+        self.assertEqual(json.loads(data[len("data: ") :])["kind"], "created")
+        await events.aclose()
+
+    def test_event_stream_not_routed_under_wsgi(self):
+        with self.assertRaises(NoReverseMatch):
+            reverse("stream_changes")
+        response = self.client.get("/notes/notes/changes/stream/")
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(ROOT_URLCONF="notes.async_urls")
+    def test_event_stream_needs_asgi(self):
+        response = self.client.get(reverse("stream_changes"))
+        self.assertEqual(response.status_code, 501)
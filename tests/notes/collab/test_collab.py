@@ -0,0 +1,226 @@
+import asyncio
+import functools
+import json
+
+from asgiref.sync import sync_to_async
+from asgiref.testing import ApplicationCommunicator
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from notes import ot
+from notes.collab import (
+    NoteSession,
+    Subscriber,
+    sender_done,
+    sessions,
+    websocket_application,
+)
+from notes.history import commit_version
+from notes.models import Note, NoteUpdate
+
+AUTH_SAMPLE_DATA = {
+    "username": "johnwick",
+    "password": "aB@#2022",
+    "email": "abc@xyz.com",
+    "first_name": "John",
+    "last_name": "Wick",
+}
+
+
+class OperationTestCase(SimpleTestCase):
+    def test_apply(self):
+        self.assertEqual(ot.apply("hello world", [6, -5, "there"]), "hello there")
+        with self.assertRaises(ValueError):
+            ot.apply("hello", [3, "x"])
+
+    def test_transform_converges(self):
+        base = "the quick fox"
+        cases = [
+            ([4, "very ", 9], [4, -6, 3]),
+            ([13, "!"], [13, "?"]),
+            ([4, -6, 3], [2, -5, 6]),
+            (["a", 13], [-13, "b"]),
+        ]
+        for a, b in cases:
+            a2, b2 = ot.transform(a, b)
+            self.assertEqual(
+                ot.apply(ot.apply(base, a), b2), ot.apply(ot.apply(base, b), a2)
+            )
+
+    def test_diff(self):
+        ops = ot.diff("the quick fox", "the slow brown fox")
+        self.assertEqual(ot.apply("the quick fox", ops), "the slow brown fox")
+        base = "title\nthe quick fox\njumps\n"
+        target = "title\nthe slow fox\njumps over\nthe dog\n"
+        self.assertEqual(ot.apply(base, ot.diff(base, target)), target)
+
+    def test_diff_long_blocks(self):
+        base = "kept\n" + "a" * ot.DIFF_CHARACTER_LIMIT + "\nend"
+        target = "kept\n" + "b" * ot.DIFF_CHARACTER_LIMIT + "\nend"
+        ops = ot.diff(base, target)
+        self.assertEqual(ot.apply(base, ops), target)
+        # The long block is replaced, not matched character by character
+        self.assertEqual(ops[:2], [5, -ot.DIFF_CHARACTER_LIMIT - 1])
+
+
+@override_settings(
+    NOTES_COLLAB_CHECKPOINT_DELAY=60, NOTES_COLLAB_CHECKPOINT_MAX_DELAY=60
+)
+class CollabTestCase(TestCase):
+    def setUp(self):
+        sessions.clear()
+        self.user = User.objects.create_user(**AUTH_SAMPLE_DATA)
+        self.other = User.objects.create_user(username="other", password="aB@#2022")
+        self.note = Note.objects.create(
+            title="Test Note", content="hello world", owner=self.user, version=1
+        )
+        self.note.shared_with.add(self.other)
+
+    async def connect(self, user, note_id=None):
+        token = AccessToken.for_user(user)
+        communicator = ApplicationCommunicator(
+            websocket_application,
+            {
+                "type": "websocket",
+                "path": f"/notes/notes/{note_id or self.note.id}/collab/",
+                "query_string": f"token={token}".encode(),
+                "headers": [],
+            },
+        )
+        await communicator.send_input({"type": "websocket.connect"})
+        return communicator
+
+    async def receive(self, communicator):
+        message = await communicator.receive_output()
+        return json.loads(message["text"])
+
+    async def test_edits_are_merged_and_checkpointed(self):
+        owner = await self.connect(self.user)
+        self.assertEqual((await owner.receive_output())["type"], "websocket.accept")
+        init = await self.receive(owner)
+        self.assertEqual(
+            init, {"type": "init", "revision": 0, "content": "hello world"}
+        )
+        other = await self.connect(self.other)
+        await other.receive_output()
+        await self.receive(other)
+
+        # Concurrent edits, both against revision 0
+        await owner.send_input(
+            {
+                "type": "websocket.receive",
+                "text": json.dumps({"type": "op", "revision": 0, "ops": [5, ",", 6]}),
+            }
+        )
+        await other.send_input(
+            {
+                "type": "websocket.receive",
+                "text": json.dumps({"type": "op", "revision": 0, "ops": [11, "!"]}),
+            }
+        )
+        self.assertEqual(await self.receive(owner), {"type": "ack", "revision": 1})
+        self.assertEqual(
+            await self.receive(other), {"type": "op", "revision": 1, "ops": [5, ",", 6]}
+        )
+        self.assertEqual(await self.receive(other), {"type": "ack", "revision": 2})
+        self.assertEqual(
+            await self.receive(owner), {"type": "op", "revision": 2, "ops": [12, "!"]}
+        )
+        # Nothing is written before the checkpoint
+        self.assertEqual(await NoteUpdate.objects.acount(), 0)
+
+        await other.send_input({"type": "websocket.disconnect"})
+        await other.wait()
+        await owner.send_input({"type": "websocket.disconnect"})
+        await owner.wait()
+        await self.note.arefresh_from_db()
+        self.assertEqual(self.note.content, "hello, world!")
+        self.assertEqual(self.note.version, 2)
+        self.assertEqual(await NoteUpdate.objects.acount(), 1)
+
+    async def test_checkpoint_merges_outside_changes(self):
+        owner = await self.connect(self.user)
+        await owner.receive_output()
+        await self.receive(owner)
+        await owner.send_input(
+            {
+                "type": "websocket.receive",
+                "text": json.dumps({"type": "op", "revision": 0, "ops": ["oh ", 11]}),
+            }
+        )
+        await self.receive(owner)
+
+        # A PUT lands while the session is open
+        note = await Note.objects.aget(id=self.note.id)
+        await sync_to_async(commit_version)(note, "hello world, again")
+
+        await owner.send_input({"type": "websocket.disconnect"})
+        await owner.wait()
+        await self.note.arefresh_from_db()
+        self.assertEqual(self.note.content, "oh hello world, again")
+        self.assertEqual(self.note.version, 3)
+
+    async def test_checkpoint_conflict_resyncs(self):
+        session = NoteSession(self.note)
+        subscriber = Subscriber(None, can_write=True)
+        session.subscribers.add(subscriber)
+        session.receive([-5, 6], 0)
+        # The outside change removes the rest: the merged content is empty
+        note = await Note.objects.aget(id=self.note.id)
+        await sync_to_async(commit_version)(note, "hello")
+
+        with self.assertLogs("notes.collab", "WARNING"):
+            await session.flush()
+        messages = [subscriber.queue.get_nowait() for _ in range(2)]
+        self.assertEqual(
+            messages[-1], {"type": "init", "revision": 2, "content": "hello"}
+        )
+        self.assertEqual(session.history, [])
+        await self.note.arefresh_from_db()
+        self.assertEqual((self.note.content, self.note.version), ("hello", 2))
+
+    async def test_failed_sender_is_closed(self):
+        sent = []
+
+        async def send(message):
+            if message["type"] == "websocket.send":
+                raise ConnectionResetError
+            sent.append(message)
+
+        session = NoteSession(self.note)
+        subscriber = Subscriber(send, can_write=True)
+        session.subscribers.add(subscriber)
+        task = asyncio.ensure_future(subscriber.run())
+        task.add_done_callback(functools.partial(sender_done, session, subscriber))
+
+        with self.assertLogs("notes.collab", "ERROR"):
+            subscriber.push({"type": "saved", "version": 2})
+            await asyncio.sleep(0.01)
+        self.assertNotIn(subscriber, session.subscribers)
+        self.assertEqual(sent, [{"type": "websocket.close", "code": 1011}])
+
+    async def test_invalid_operation(self):
+        owner = await self.connect(self.user)
+        await owner.receive_output()
+        await self.receive(owner)
+        await owner.send_input(
+            {
+                "type": "websocket.receive",
+                "text": json.dumps({"type": "op", "revision": 0, "ops": [3, "x"]}),
+            }
+        )
+        message = await self.receive(owner)
+        self.assertEqual(message["type"], "error")
+        await owner.send_input({"type": "websocket.disconnect"})
+        await owner.wait()
+
+    async def test_access_denied(self):
+        stranger = await User.objects.acreate(username="stranger")
+        communicator = await self.connect(stranger)
+        self.assertEqual(
+            await communicator.receive_output(),
+            {"type": "websocket.close", "code": 4403},
+        )
+        communicator = await self.connect(self.user, note_id=self.note.id + 1)
+        self.assertEqual((await communicator.receive_output())["code"], 4404)
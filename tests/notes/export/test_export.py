@@ -0,0 +1,72 @@
+import json
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from notes.history import build_update, commit_version
+from notes.models import Note
+
+AUTH_SAMPLE_DATA = {
+    "username": "johnwick",
+    "password": "aB@#2022",
+    "email": "abc@xyz.com",
+    "first_name": "John",
+    "last_name": "Wick",
+}
+
+
+class ExportTestCase(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(**AUTH_SAMPLE_DATA)
+        other = User.objects.create_user(
+            username="ethanhunt", password="aB@#2022", email="xyz@abc.com"
+        )
+        for owner, title in ((self.user, "Mine"), (other, "Shared")):
+            note = Note.objects.create(
+                title=title, content="v1", owner=owner, version=1
+            )
+            build_update(note, 1, "v1").save()
+            commit_version(note, "v2")
+        note.shared_with.add(self.user)
+        Note.objects.create(title="Private", content="private", owner=other)
+
+    def test_export_ndjson(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("export_notes"))
+        self.assertEqual(response.status_code, 200)
+        records = [
+            json.loads(line)
+            for line in b"".join(response.streaming_content).splitlines()
+        ]
+        self.assertEqual(
+            [(record["type"], record["content"]) for record in records],
+            [
+                ("note", "v2"),
+                ("update", "v1"),
+                ("update", "v2"),
+                ("note", "v2"),
+                ("update", "v1"),
+                ("update", "v2"),
+            ],
+        )
+        self.assertEqual(records[3]["owner"], "ethanhunt")
+
+    def test_export_json(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("export_notes"), {"format": "json"})
+        records = json.loads(b"".join(response.streaming_content))
+        self.assertEqual(len(records), 6)
+
+    def test_export_invalid_format(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("export_notes"), {"format": "xml"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_export_command(self):
+        output = StringIO()
+        call_command("export_notes", "johnwick", "--format", "json", stdout=output)
+        self.assertEqual(len(json.loads(output.getvalue())), 6)
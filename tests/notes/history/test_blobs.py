@@ -0,0 +1,69 @@
+from django.contrib.auth.models import User
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from notes.bulk import bulk_create_notes
+from notes.history import commit_version, create_with_history, get_version
+from notes.models import Blob, Note, NoteUpdate
+
+AUTH_SAMPLE_DATA = {
+    "username": "johnwick",
+    "password": "aB@#2022",
+    "email": "abc@xyz.com",
+    "first_name": "John",
+    "last_name": "Wick",
+}
+
+
+@override_settings(NOTES_HISTORY_DELTA=True, NOTES_HISTORY_KEYFRAME_INTERVAL=1)
+class BlobTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(**AUTH_SAMPLE_DATA)
+
+    def test_identical_bodies_are_stored_once(self):
+        notes = [create_with_history(self.user, "Title", "template") for _ in range(3)]
+        bulk_create_notes(self.user, [{"title": "Title", "content": "template"}] * 2)
+        blob = Blob.objects.get()
+        self.assertEqual((blob.text, blob.refcount), ("template", 5))
+        self.assertEqual(NoteUpdate.objects.filter(content="template").count(), 0)
+        self.assertEqual(get_version(notes[0], 1)[1], "template")
+
+    def test_revert_reuses_the_blob(self):
+        note = create_with_history(self.user, "Title", "one")
+        commit_version(note, "two")
+        commit_version(note, "one")
+        self.assertEqual(
+            sorted(Blob.objects.values_list("size", "refcount")), [(3, 1), (3, 2)]
+        )
+        self.assertEqual(note.updates.get(version=3).blob.refcount, 2)
+        self.assertEqual(get_version(note, 3)[1], "one")
+
+    def test_no_op_save_writes_nothing(self):
+        note = create_with_history(self.user, "Title", "one")
+        update = commit_version(note, "one")
+        self.assertEqual((update.version, note.version), (1, 1))
+        self.assertEqual(note.updates.count(), 1)
+
+        client = Client()
+        client.force_login(self.user)
+        response = client.put(
+            reverse("get_or_update_note", args=[note.id]),
+            {"content": "one", "version": 1},
+            content_type="application/json",
+        )
+        self.assertEqual(response.json()["version"], 1)
+        self.assertEqual(note.updates.count(), 1)
+
+    def test_deleting_notes_releases_blobs(self):
+        first = create_with_history(self.user, "Title", "template")
+        second = create_with_history(self.user, "Title", "template")
+        first.delete()
+        self.assertEqual(Blob.objects.get().refcount, 1)
+        second.delete()
+        self.assertFalse(Blob.objects.exists())
+
+    def test_deleting_a_user_releases_blobs(self):
+        create_with_history(self.user, "Title", "template")
+        self.user.delete()
+        self.assertFalse(Note.objects.exists())
+        self.assertFalse(Blob.objects.exists())
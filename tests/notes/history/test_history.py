@@ -0,0 +1,82 @@
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+
+from notes.delta import apply_delta, encode_delta
+from notes.history import build_update, commit_version, get_history_page, get_version
+from notes.models import Note
+
+AUTH_SAMPLE_DATA = {
+    "username": "johnwick",
+    "password": "aB@#2022",
+    "email": "abc@xyz.com",
+    "first_name": "John",
+    "last_name": "Wick",
+}
+
+
+class DeltaTestCase(TestCase):
+    def test_delta_round_trip(self):
+        base = "first line\nsecond line\nthird line\n"
+        target = "first line\nchanged line\nthird line\nfourth line"
+        delta = encode_delta(base, target)
+        self.assertEqual(apply_delta(base, delta), target)
+
+    def test_delta_from_empty(self):
+        delta = encode_delta("", "new content")
+        self.assertEqual(apply_delta("", delta), "new content")
+
+
+@override_settings(NOTES_HISTORY_DELTA=True, NOTES_HISTORY_KEYFRAME_INTERVAL=3)
+class HistoryTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(**AUTH_SAMPLE_DATA)
+        self.contents = [
+            "".join(
+                (
+                    f"line {line} of version {version}\n"
+                    if line == version
+                    else f"line {line}\n"
+                )
+                for line in range(50)
+            )
+            for version in range(7)
+        ]
+        self.note = Note.objects.create(
+            title="Test Note", content=self.contents[0], owner=self.user, version=1
+        )
+        build_update(self.note, 1, self.contents[0]).save()
+        for content in self.contents[1:]:
+            commit_version(self.note, content)
+
+    def test_keyframes_and_deltas(self):
+        keyframes = list(
+            self.note.updates.filter(is_keyframe=True)
+            .order_by("version")
+            .values_list("version", flat=True)
+        )
+        self.assertEqual(keyframes, [1, 4, 7])
+
+    def test_get_version(self):
+        for version, content in enumerate(self.contents, start=1):
+            update, rebuilt = get_version(self.note, version)
+            self.assertEqual(update.version, version)
+            self.assertEqual(rebuilt, content)
+
+    def test_get_version_not_found(self):
+        self.assertIsNone(get_version(self.note, 42))
+
+    def test_get_history_page(self):
+        history, cursor = get_history_page(self.note, limit=4)
+        self.assertEqual([entry["version"] for entry in history], [7, 6, 5, 4])
+        self.assertEqual([entry["content"] for entry in history], self.contents[:2:-1])
+        history, cursor = get_history_page(self.note, cursor=cursor, limit=4)
+        self.assertEqual([entry["content"] for entry in history], self.contents[2::-1])
+        self.assertIsNone(cursor)
+
+    def test_commit_version_conflict(self):
+        stale = Note.objects.get(id=self.note.id)
+        self.assertIsNotNone(commit_version(self.note, "edit"))
+        self.assertIsNone(commit_version(stale, "stale edit"))
+        self.note.refresh_from_db()
+        self.assertEqual(self.note.content, "edit")
+        self.assertEqual(self.note.version, 8)
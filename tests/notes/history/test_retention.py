@@ -0,0 +1,123 @@
+from datetime import datetime, timedelta, timezone
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from notes.history import build_update, commit_version, get_version
+from notes.models import Blob, Note
+from notes.retention import compact_history
+
+AUTH_SAMPLE_DATA = {
+    "username": "johnwick",
+    "password": "aB@#2022",
+    "email": "abc@xyz.com",
+    "first_name": "John",
+    "last_name": "Wick",
+}
+
+NOW = datetime(2026, 1, 1, 12, tzinfo=timezone.utc)
+
+RETENTION = [(7, None), (30, 3600), (None, 86400)]
+
+# Age of each version, oldest first
+AGES = [
+    timedelta(days=42),
+    timedelta(days=42, hours=-1),
+    timedelta(days=41),
+    timedelta(days=40),
+    timedelta(days=40, hours=-1),
+    timedelta(days=40, hours=-2),
+    timedelta(days=10),
+    timedelta(days=10, minutes=-10),
+    timedelta(days=10, hours=-2),
+    timedelta(days=2),
+    timedelta(days=1),
+]
+
+
+@override_settings(NOTES_HISTORY_DELTA=True, NOTES_HISTORY_KEYFRAME_INTERVAL=3)
+class RetentionTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(**AUTH_SAMPLE_DATA)
+        self.contents = [
+            "".join(
+                f"line {line} of {version}\n" if line == version else "line\n"
+                for line in range(20)
+            )
+            for version in range(len(AGES))
+        ]
+        self.note = self.create_note(self.contents, AGES)
+
+    def create_note(self, contents, ages):
+        note = Note.objects.create(
+            title="Title", content=contents[0], owner=self.user, version=1
+        )
+        build_update(note, 1, contents[0]).save()
+        for content in contents[1:]:
+            commit_version(note, content)
+        for version, age in enumerate(ages, start=1):
+            note.updates.filter(version=version).update(timestamp=NOW - age)
+        return note
+
+    def compact(self, **kwargs):
+        totals = {}
+        for totals in compact_history(RETENTION, now=NOW, **kwargs):
+            pass
+        return totals
+
+    def versions(self, note):
+        return list(note.updates.order_by("version").values_list("version", flat=True))
+
+    def test_retention_policy(self):
+        totals = self.compact(batch=4)
+        self.assertEqual(self.versions(self.note), [2, 3, 6, 8, 9, 10, 11])
+        self.assertEqual(totals["notes"], 1)
+        self.assertEqual(totals["deleted"], 4)
+        self.assertGreater(totals["bytes"], 0)
+
+        for version, content in enumerate(self.contents, start=1):
+            rebuilt = get_version(self.note, version)
+            if version in (1, 4, 5, 7):
+                self.assertIsNone(rebuilt)
+            else:
+                self.assertEqual(rebuilt[1], content)
+
+        # Chains never grow past the keyframe interval
+        keyframes = self.note.updates.filter(is_keyframe=True).values_list(
+            "version", flat=True
+        )
+        self.assertEqual(sorted(keyframes), [2, 8, 10])
+        # Blobs of the deleted keyframes were released
+        self.assertEqual(
+            sum(Blob.objects.values_list("refcount", flat=True)),
+            self.note.updates.filter(blob__isnull=False).count(),
+        )
+
+    def test_compaction_is_idempotent(self):
+        self.compact()
+        totals = self.compact()
+        self.assertEqual((totals["deleted"], totals["rewritten"]), (0, 0))
+
+    def test_dry_run(self):
+        expected = self.compact(dry_run=True)
+        self.assertEqual(self.versions(self.note), list(range(1, 12)))
+        self.assertEqual(self.compact(), expected)
+
+    def test_latest_version_is_kept(self):
+        note = self.create_note(self.contents[:3], [timedelta(days=40)] * 3)
+        self.compact()
+        self.assertEqual(self.versions(note), [3])
+        self.assertEqual(get_version(note, 3)[1], self.contents[2])
+
+    def test_edit_after_compaction(self):
+        self.compact()
+        commit_version(self.note, "new content\n")
+        self.assertEqual(get_version(self.note, 12)[1], "new content\n")
+
+    def test_compact_history_command(self):
+        out = StringIO()
+        call_command("compact_history", "--dry-run", stdout=out)
+        self.assertIn("Would reclaim", out.getvalue())
+        self.assertEqual(self.versions(self.note), list(range(1, 12)))
@@ -0,0 +1,181 @@
+import json
+import tempfile
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from notes.cache import note_cache
+from notes.metrics import Registry, merge, registry, render
+from notes.models import Note
+
+AUTH_SAMPLE_DATA = {
+    "username": "johnwick",
+    "password": "aB@#2022",
+    "email": "abc@xyz.com",
+    "first_name": "John",
+    "last_name": "Wick",
+}
+
+
+def parse_samples(text):
+    """
+    {sample with labels: value} of a Prometheus text exposition
+    """
+    samples = {}
+    for line in text.splitlines():
+        if line and not line.startswith("#"):
+            sample, _, value = line.rpartition(" ")
+            samples[sample] = float(value)
+    return samples
+
+
+class RegistryTestCase(SimpleTestCase):
+    def test_histogram_buckets_are_cumulative(self):
+        metrics = Registry()
+        labels = (("view", "get_note"),)
+        for queries in (0, 2, 2, 7, 500):
+            metrics.observe("notes_db_queries_per_request", labels, queries)
+        counters, histograms = merge([metrics.snapshot()])
+        counts, total, count = histograms[("notes_db_queries_per_request", labels)]
+        self.assertEqual((total, count), (511, 5))
+        # Buckets 0, 1, 2, 3, 5, 10, ... +Inf
+        self.assertEqual(counts[:6], [1, 0, 2, 0, 0, 1])
+        self.assertEqual(counts[-1], 1)
+
+    def test_merge_adds_up_processes(self):
+        first, second = Registry(), Registry()
+        labels = (("view", "share_note"), ("method", "POST"), ("status", "200"))
+        first.inc("notes_http_requests_total", labels)
+        second.inc("notes_http_requests_total", labels, 2)
+        second.observe("notes_http_request_duration_seconds", labels[:1], 0.2)
+        # Snapshots go through JSON between processes
+        snapshots = [json.loads(json.dumps(m.snapshot())) for m in (first, second)]
+        counters, histograms = merge(snapshots)
+        self.assertEqual(counters[("notes_http_requests_total", labels)], 3)
+        self.assertEqual(
+            histograms[("notes_http_request_duration_seconds", labels[:1])][2], 1
+        )
+
+
+class MetricsMiddlewareTestCase(TestCase):
+    def setUp(self):
+        registry.reset()
+        self.user = User.objects.create_user(**AUTH_SAMPLE_DATA)
+        self.client.force_login(self.user)
+        self.note = Note.objects.create(owner=self.user, title="Title", content="x")
+
+    def scrape(self):
+        response = self.client.get("/metrics")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain"))
+        return parse_samples(response.content.decode())
+
+    def test_requests_are_labelled_by_url_name(self):
+        url = reverse("get_or_update_note", args=[self.note.id])
+        self.client.get(url)
+        self.client.get(url)
+        self.client.get("/no/such/route/")
+
+        samples = self.scrape()
+        self.assertEqual(
+            samples[
+                'notes_http_requests_total{view="get_or_update_note",'
+                'method="GET",status="200"}'
+            ],
+            2,
+        )
+        self.assertEqual(
+            samples[
+                'notes_http_requests_total{view="unmatched",method="GET",status="404"}'
+            ],
+            1,
+        )
+        view = '{view="get_or_update_note"}'
+        self.assertEqual(samples[f"notes_http_request_duration_seconds_count{view}"], 2)
+        self.assertEqual(
+            samples[
+                'notes_http_request_duration_seconds_bucket{view="get_or_update_note",le="+Inf"}'
+            ],
+            2,
+        )
+        self.assertGreater(samples[f"notes_db_queries_per_request_sum{view}"], 0)
+        self.assertGreater(samples[f"notes_db_query_duration_seconds_total{view}"], 0)
+        self.assertGreater(samples[f"notes_http_response_size_bytes_sum{view}"], 0)
+
+    def test_unknown_methods_share_a_label(self):
+        self.client.generic("FOO123", "/no/such/route/")
+        self.client.generic("BAR456", "/no/such/route/")
+
+        samples = self.scrape()
+        self.assertEqual(
+            samples[
+                'notes_http_requests_total{view="unmatched",method="other",status="404"}'
+            ],
+            2,
+        )
+        self.assertFalse(any("FOO123" in name for name in samples))
+
+    @override_settings(NOTES_CACHE_TIMEOUT=60)
+    def test_cache_lookups(self):
+        note_cache().clear()
+        url = reverse("get_or_update_note", args=[self.note.id])
+        self.client.get(url)
+        self.client.get(url)
+
+        samples = self.scrape()
+        prefix = 'notes_cache_requests_total{view="get_or_update_note",cache="note"'
+        self.assertEqual(samples[f'{prefix},result="miss"}}'], 1)
+        self.assertEqual(samples[f'{prefix},result="hit"}}'], 1)
+
+    def test_queries_outside_requests_are_not_counted(self):
+        Note.objects.count()
+        self.assertEqual(registry.snapshot(), {"counters": [], "histograms": []})
+
+    def test_workers_share_a_directory(self):
+        with tempfile.TemporaryDirectory() as directory:
+            other = Registry()
+            labels = (("view", "share_note"), ("method", "POST"), ("status", "200"))
+            other.inc("notes_http_requests_total", labels, 5)
+            Path(directory, "metrics-1-other.json").write_text(
+                json.dumps(other.snapshot())
+            )
+            with override_settings(
+                NOTES_METRICS_DIR=directory, NOTES_METRICS_FLUSH_INTERVAL=60
+            ):
+                self.client.post(reverse("share_note"))
+                samples = self.scrape()
+                if registry.timer is not None:
+                    registry.timer.cancel()
+            self.assertEqual(
+                samples[
+                    'notes_http_requests_total{view="share_note",'
+                    'method="POST",status="200"}'
+                ],
+                5,
+            )
+            self.assertIn(
+                'notes_http_requests_total{view="share_note",method="POST",status="400"}',
+                samples,
+            )
+            self.assertEqual(len(list(Path(directory).glob("metrics-*.json"))), 2)
+
+
+@override_settings(ROOT_URLCONF="notes.async_urls")
+class AsyncMetricsTestCase(TestCase):
+    def setUp(self):
+        registry.reset()
+        self.user = User.objects.create_user(**AUTH_SAMPLE_DATA)
+        self.async_client.force_login(self.user)
+        self.note = Note.objects.create(owner=self.user, title="Title", content="x")
+
+    async def test_async_views_count_queries(self):
+        response = await self.async_client.get(
+            reverse("get_or_update_note", args=[self.note.id])
+        )
+        self.assertEqual(response.status_code, 200)
+        samples = parse_samples(render())
+        self.assertGreater(
+            samples['notes_db_queries_per_request_sum{view="get_or_update_note"}'], 0
+        )
@@ -0,0 +1,54 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+
+from notes.models import Note
+from notes.permissions import NO_ACCESS, OWNER, SHARED, get_access, local_cache
+from notes.sharing import share_with, unshare_with
+
+AUTH_SAMPLE_DATA = {
+    "username": "johnwick",
+    "password": "aB@#2022",
+    "email": "abc@xyz.com",
+    "first_name": "John",
+    "last_name": "Wick",
+}
+
+
+class PermissionTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(**AUTH_SAMPLE_DATA)
+        self.other = User.objects.create_user(username="ethanhunt", password="x")
+        self.note = Note.objects.create(
+            title="Test Note", content="This is a test note.", owner=self.user
+        )
+        local_cache.clear()
+        caches[settings.NOTES_PERMISSION_CACHE_ALIAS].clear()
+
+    def test_access_levels(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(get_access(self.user, self.note.id), OWNER)
+        self.assertEqual(get_access(self.other, self.note.id), NO_ACCESS)
+        self.note.shared_with.add(self.other)
+        self.assertEqual(get_access(self.other, self.note.id), SHARED)
+        self.assertIsNone(get_access(self.user, self.note.id + 1))
+
+    @override_settings(NOTES_PERMISSION_CACHE_TIMEOUT=60)
+    def test_cached_access(self):
+        self.assertEqual(get_access(self.other, self.note.id), NO_ACCESS)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_access(self.other, self.note.id), NO_ACCESS)
+
+        # The shared cache answers when the local entry is gone
+        local_cache.clear()
+        with self.assertNumQueries(0):
+            self.assertEqual(get_access(self.other, self.note.id), NO_ACCESS)
+
+    @override_settings(NOTES_PERMISSION_CACHE_TIMEOUT=60)
+    def test_share_invalidates_cache(self):
+        self.assertEqual(get_access(self.other, self.note.id), NO_ACCESS)
+        share_with(self.note, ["ethanhunt"])
+        self.assertEqual(get_access(self.other, self.note.id), SHARED)
+        unshare_with(self.note, ["ethanhunt"])
+        self.assertEqual(get_access(self.other, self.note.id), NO_ACCESS)
@@ -0,0 +1,137 @@
+import marshal
+import pstats
+import tempfile
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from notes.models import Note, RequestProfile
+from notes.profiling import PROFILE_HEADER, PROFILE_ID_HEADER, make_token
+
+AUTH_SAMPLE_DATA = {
+    "username": "johnwick",
+    "password": "aB@#2022",
+    "email": "abc@xyz.com",
+    "first_name": "John",
+    "last_name": "Wick",
+}
+
+
+class ProfilingTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(**AUTH_SAMPLE_DATA)
+        self.staff = User.objects.create_user(
+            username="staff", password="aB@#2022", is_staff=True
+        )
+        self.note = Note.objects.create(owner=self.user, title="Title", content="x")
+        self.url = reverse("get_or_update_note", args=[self.note.id])
+
+    def test_signed_header_profiles_request(self):
+        self.client.force_login(self.user)
+        response = self.client.get(self.url, headers={PROFILE_HEADER: make_token()})
+        self.assertEqual(response.status_code, 200)
+        profile = RequestProfile.objects.get(id=response[PROFILE_ID_HEADER])
+        self.assertEqual(profile.mode, RequestProfile.CPROFILE)
+        self.assertEqual(profile.view, "get_or_update_note")
+        self.assertEqual(profile.user, self.user)
+        self.assertTrue(any("notes_note" in query["sql"] for query in profile.queries))
+
+        self.client.force_login(self.staff)
+        response = self.client.get(
+            reverse("get_profile", args=[profile.id]), {"format": "pstats"}
+        )
+        self.assertEqual(response.status_code, 200)
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory, "profile.prof")
+            path.write_bytes(response.content)
+            stats = pstats.Stats(str(path))
+        self.assertTrue(any(name == "get_or_update_note" for _, _, name in stats.stats))
+
+        response = self.client.get(reverse("get_profile", args=[profile.id]))
+        self.assertIn("get_or_update_note", response.json()["functions"])
+        self.assertEqual(len(response.json()["queries"]), len(profile.queries))
+        response = self.client.get(
+            reverse("get_profile", args=[profile.id]), {"format": "collapsed"}
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_invalid_or_unsigned_requests_are_not_profiled(self):
+        self.client.force_login(self.user)
+        for headers in ({PROFILE_HEADER: "cprofile"}, {PROFILE_HEADER: "x:y:z"}):
+            response = self.client.get(self.url, headers=headers)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn(PROFILE_ID_HEADER, response)
+        # The query parameter is reserved to staff users
+        response = self.client.get(self.url, {"profile": "cprofile"})
+        self.assertNotIn(PROFILE_ID_HEADER, response)
+        self.assertFalse(RequestProfile.objects.exists())
+
+    @override_settings(NOTES_PROFILE_TOKEN_MAX_AGE=-1)
+    def test_expired_token(self):
+        self.client.force_login(self.user)
+        response = self.client.get(self.url, headers={PROFILE_HEADER: make_token()})
+        self.assertNotIn(PROFILE_ID_HEADER, response)
+
+    @override_settings(NOTES_PROFILE_SAMPLE_INTERVAL=0.0001)
+    def test_staff_sampling(self):
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse("list_notes"), {"profile": "sample"})
+        self.assertEqual(response.status_code, 200)
+        profile = RequestProfile.objects.get(id=response[PROFILE_ID_HEADER])
+        self.assertEqual(profile.mode, RequestProfile.SAMPLE)
+        self.assertIsNone(profile.stats)
+
+        response = self.client.get(
+            reverse("get_profile", args=[profile.id]), {"format": "collapsed"}
+        )
+        self.assertEqual(response.status_code, 200)
+        for line in response.content.decode().splitlines():
+            stack, _, count = line.rpartition(" ")
+            self.assertTrue(stack)
+            self.assertGreater(int(count), 0)
+
+    @override_settings(NOTES_PROFILE_KEEP=2)
+    def test_latest_profiles_are_kept(self):
+        self.client.force_login(self.staff)
+        ids = [
+            int(self.client.get(self.url, {"profile": "cprofile"})[PROFILE_ID_HEADER])
+            for _ in range(4)
+        ]
+        response = self.client.get(reverse("list_profiles"))
+        self.assertEqual(
+            [profile["id"] for profile in response.json()["results"]], ids[:1:-1]
+        )
+
+    def test_profiles_are_staff_only(self):
+        profile = RequestProfile.objects.create(
+            mode=RequestProfile.CPROFILE,
+            method="GET",
+            path="/",
+            status=200,
+            duration=0.1,
+            stats=marshal.dumps({}),
+        )
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("list_profiles"))
+        self.assertEqual(response.status_code, 403)
+        response = self.client.get(reverse("get_profile", args=[profile.id]))
+        self.assertEqual(response.status_code, 403)
+
+
+@override_settings(ROOT_URLCONF="notes.async_urls")
+class AsyncProfilingTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(**AUTH_SAMPLE_DATA)
+        self.async_client.force_login(self.user)
+        self.note = Note.objects.create(owner=self.user, title="Title", content="x")
+
+    async def test_async_views_capture_sql(self):
+        response = await self.async_client.get(
+            reverse("get_or_update_note", args=[self.note.id]),
+            headers={PROFILE_HEADER: make_token()},
+        )
+        self.assertEqual(response.status_code, 200)
+        profile = await RequestProfile.objects.aget(id=response[PROFILE_ID_HEADER])
+        self.assertTrue(any("notes_note" in query["sql"] for query in profile.queries))
@@ -0,0 +1,165 @@
+import shutil
+import sqlite3
+import tempfile
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.db import connections
+from django.test import (
+    Client,
+    SimpleTestCase,
+    TestCase,
+    TransactionTestCase,
+    override_settings,
+)
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import AccessToken
+
+from notes.models import Note
+from notes.routers import ReplicaRouter, request_state, sticky_cache, sticky_key
+
+AUTH_SAMPLE_DATA = {
+    "username": "johnwick",
+    "password": "aB@#2022",
+    "email": "abc@xyz.com",
+    "first_name": "John",
+    "last_name": "Wick",
+}
+
+
+@override_settings(NOTES_DATABASE_REPLICAS=["replica0", "replica1"])
+class ReplicaRouterTestCase(SimpleTestCase):
+    def setUp(self):
+        self.router = ReplicaRouter()
+        self.state = {"primary": False, "wrote": False}
+        self.token = request_state.set(self.state)
+
+    def tearDown(self):
+        request_state.reset(self.token)
+
+    def test_reads_use_replicas(self):
+        self.assertIn(self.router.db_for_read(Note), ["replica0", "replica1"])
+        self.assertIsNone(self.router.db_for_read(User))
+
+    def test_write_pins_primary(self):
+        self.assertIsNone(self.router.db_for_write(Note))
+        self.assertTrue(self.state["wrote"])
+        self.assertIsNone(self.router.db_for_read(Note))
+
+    def test_outside_requests_use_primary(self):
+        request_state.set(None)
+        self.assertIsNone(self.router.db_for_read(Note))
+
+    def test_replicas_are_not_migrated(self):
+        self.assertFalse(self.router.allow_migrate("replica0", "notes"))
+        self.assertIsNone(self.router.allow_migrate("default", "notes"))
+
+
+class PrimaryPinningTestCase(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(**AUTH_SAMPLE_DATA)
+        self.client.force_login(self.user)
+
+    def test_request_state_is_reset(self):
+        self.client.get(reverse("list_notes"))
+        self.assertIsNone(request_state.get())
+
+
+REPLICA = "lagging_replica"
+
+
+class ReplicaLagTestCase(TransactionTestCase):
+    """
+    Primary and replica in two SQLite files, the replica is a copy of the
+    primary taken in setUp and never updated, i.e. lagging
+    """
+
+    def setUp(self):
+        self.owner = User.objects.create_user(**AUTH_SAMPLE_DATA)
+        self.other = User.objects.create_user(username="other", password="aB@#2022")
+        self.owner_headers = {
+            "Authorization": f"Bearer {AccessToken.for_user(self.owner)}"
+        }
+        response = Client().post(
+            reverse("create_note"),
+            {"title": "Title", "content": "one"},
+            headers=self.owner_headers,
+        )
+        self.note_id = response.json()["note_id"]
+        self.other_client = Client()
+        self.other_client.force_login(self.other)
+        sticky_cache().clear()
+
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = Path(directory) / "replica.sqlite3"
+        connections["default"].ensure_connection()
+        replica = sqlite3.connect(path)
+        connections["default"].connection.backup(replica)
+        replica.close()
+        connections.settings[REPLICA] = {
+            **connections.settings["default"],
+            "NAME": path,
+        }
+        self.addCleanup(connections.settings.pop, REPLICA)
+        self.addCleanup(connections.__delitem__, REPLICA)
+        self.addCleanup(lambda: connections[REPLICA].close())
+
+        replicas = override_settings(NOTES_DATABASE_REPLICAS=[REPLICA])
+        replicas.enable()
+        self.addCleanup(replicas.disable)
+
+    def get_content(self, client, **kwargs):
+        response = client.get(
+            reverse("get_or_update_note", args=[self.note_id]), **kwargs
+        )
+        self.assertEqual(response.status_code, 200)
+        return response.json()["content"]
+
+    def get_version(self, client, version):
+        # Shared users read notes through their history
+        return client.get(reverse("get_note_version", args=[self.note_id, version]))
+
+    def test_access_checks_use_primary(self):
+        response = Client().post(
+            reverse("share_note"),
+            {"note_id": self.note_id, "usernames": ["other"]},
+            headers=self.owner_headers,
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(
+            Note.objects.using(REPLICA).get(id=self.note_id).shared_with.exists()
+        )
+        response = self.get_version(self.other_client, 1)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["content"], "one")
+
+    def test_history_reads_do_not_pin(self):
+        response = Client().get(
+            reverse("get_note_version", args=[self.note_id, 1]),
+            headers=self.owner_headers,
+        )
+        self.assertEqual(response.json()["content"], "one")
+        self.assertIsNone(sticky_cache().get(sticky_key(self.owner.id)))
+
+    def test_writes_pin_the_user_to_primary(self):
+        Client().post(
+            reverse("share_note"),
+            {"note_id": self.note_id, "usernames": ["other"]},
+            headers=self.owner_headers,
+        )
+        response = Client().put(
+            reverse("get_or_update_note", args=[self.note_id]),
+            {"content": "two"},
+            content_type="application/json",
+            headers=self.owner_headers,
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNotNone(sticky_cache().get(sticky_key(self.owner.id)))
+
+        # Token clients keep no cookies: the user is pinned, not the client
+        self.assertEqual(self.get_content(Client(), headers=self.owner_headers), "two")
+        # Other users still read the lagging replica
+        self.assertEqual(self.get_version(self.other_client, 2).status_code, 404)
+        self.assertIsNone(sticky_cache().get(sticky_key(self.other.id)))
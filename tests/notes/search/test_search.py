@@ -0,0 +1,109 @@
+from io import StringIO
+from unittest import skipUnless
+
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from notes.models import Note
+from notes.search import (
+    FTS_TABLE,
+    DatabaseSearchBackend,
+    PostgresSearchBackend,
+    check_search_index,
+    get_search_backend,
+)
+
+AUTH_SAMPLE_DATA = {
+    "username": "johnwick",
+    "password": "aB@#2022",
+    "email": "abc@xyz.com",
+    "first_name": "John",
+    "last_name": "Wick",
+}
+
+
+class SearchTestCase(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(**AUTH_SAMPLE_DATA)
+        other = User.objects.create_user(username="ethanhunt", password="x")
+        self.mine = Note.objects.create(
+            title="Groceries", content="Buy apples and pears.", owner=self.user
+        )
+        self.shared = Note.objects.create(
+            title="Apples", content="Apple pie recipe.", owner=other
+        )
+        self.shared.shared_with.add(self.user)
+        Note.objects.create(title="Apples", content="Private apples.", owner=other)
+        self.client.force_login(self.user)
+
+    def search(self, **params):
+        return self.client.get(reverse("search_notes"), params)
+
+    def test_search_visible_notes_ranked(self):
+        response = self.search(q="apples")
+        self.assertEqual(response.status_code, 200)
+        ids = [result["id"] for result in response.json()["results"]]
+        # Title matches rank first, private notes are never returned
+        self.assertEqual(ids, [self.shared.id, self.mine.id])
+
+    def test_search_follows_updates(self):
+        self.client.put(
+            reverse("get_or_update_note", args=[self.mine.id]),
+            {"content": "Buy bananas."},
+            content_type="application/json",
+        )
+        ids = [result["id"] for result in self.search(q="bananas").json()["results"]]
+        self.assertEqual(ids, [self.mine.id])
+        self.assertEqual(self.search(q="pears").json()["results"], [])
+
+    def test_search_pagination(self):
+        response = self.search(q="apple", limit=1)
+        self.assertEqual(len(response.json()["results"]), 1)
+        response = self.search(
+            q="apple", limit=1, offset=response.json()["next_offset"]
+        )
+        self.assertEqual(len(response.json()["results"]), 1)
+        self.assertIsNone(response.json()["next_offset"])
+
+    def test_search_query_syntax_is_ignored(self):
+        response = self.search(q='apples" OR (')
+        self.assertEqual(response.status_code, 200)
+
+    def test_search_invalid_params(self):
+        self.assertEqual(self.search(q=" ").status_code, 400)
+        self.assertEqual(self.search(q="apples", limit=0).status_code, 400)
+
+    def test_database_backend(self):
+        results = DatabaseSearchBackend().search(self.user, "apple pie")
+        self.assertEqual([result["id"] for result in results], [self.shared.id])
+
+    def test_default_backend(self):
+        self.assertEqual(type(get_search_backend()).__name__, "SqliteSearchBackend")
+
+    @skipUnless(connection.vendor == "postgresql", "PostgreSQL index")
+    def test_postgres_backend(self):
+        backend = PostgresSearchBackend()
+        self.assertEqual(backend.missing(), [])
+        results = backend.search(self.user, "apple pie")
+        self.assertEqual([result["id"] for result in results], [self.shared.id])
+
+    @skipUnless(connection.vendor == "sqlite", "SQLite triggers")
+    def test_missing_triggers_are_reported(self):
+        self.assertEqual(check_search_index(databases=["default"]), [])
+        with connection.cursor() as cursor:
+            cursor.execute(f"DROP TRIGGER {FTS_TABLE}_insert")
+
+        warnings = check_search_index(databases=["default"])
+        self.assertEqual([warning.id for warning in warnings], ["notes.W001"])
+        with self.assertRaises(CommandError):
+            call_command("rebuild_search_index", check=True)
+
+        call_command("rebuild_search_index", stdout=StringIO())
+        self.assertEqual(check_search_index(databases=["default"]), [])
+        note = Note.objects.create(title="Kiwis", content="Green", owner=self.user)
+        ids = [result["id"] for result in self.search(q="kiwis").json()["results"]]
+        self.assertEqual(ids, [note.id])
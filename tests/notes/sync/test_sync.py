@@ -0,0 +1,117 @@
+from django.contrib.auth.models import User
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from notes.models import Note
+
+AUTH_SAMPLE_DATA = {
+    "username": "johnwick",
+    "password": "aB@#2022",
+    "email": "abc@xyz.com",
+    "first_name": "John",
+    "last_name": "Wick",
+}
+
+
+class SyncTestCase(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(**AUTH_SAMPLE_DATA)
+        self.other = User.objects.create_user(username="other", password="aB@#2022")
+        self.client.force_login(self.user)
+        self.other_client = Client()
+        self.other_client.force_login(self.other)
+
+    def sync(self, client=None, **params):
+        response = (client or self.client).get(reverse("sync_notes"), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def create_note(self, content="one"):
+        response = self.client.post(
+            reverse("create_note"), {"title": "Title", "content": content}
+        )
+        return response.json()["note_id"]
+
+    def share(self, note_id, action="share_note"):
+        self.client.post(reverse(action), {"note_id": note_id, "usernames": ["other"]})
+
+    def test_snapshot_pages_then_syncs_changes(self):
+        note_ids = [self.create_note(str(i)) for i in range(3)]
+
+        page = self.sync(limit=2)
+        self.assertEqual([note["id"] for note in page["notes"]], note_ids[:2])
+        self.assertEqual(page["notes"][0]["owner_username"], "johnwick")
+        self.assertTrue(page["has_more"])
+        cursor = page["cursor"]
+
+        # Changed while paging: replayed by the next incremental sync
+        self.client.put(
+            reverse("get_or_update_note", args=[note_ids[0]]),
+            {"content": "changed"},
+            content_type="application/json",
+        )
+        page = self.sync(cursor=cursor, after=page["after"], limit=2)
+        self.assertEqual([note["id"] for note in page["notes"]], note_ids[2:])
+        self.assertIsNone(page["after"])
+        self.assertEqual(page["cursor"], cursor)
+
+        page = self.sync(cursor=cursor)
+        self.assertEqual(
+            [(note["id"], note["content"]) for note in page["notes"]],
+            [(note_ids[0], "changed")],
+        )
+        self.assertEqual(page["tombstones"], [])
+        self.assertEqual(self.sync(cursor=page["cursor"])["notes"], [])
+
+    def test_share_unshare_and_delete(self):
+        cursor = self.sync(self.other_client)["cursor"]
+        shared_id = self.create_note()
+        deleted_id = self.create_note()
+        self.share(shared_id)
+        self.share(deleted_id)
+
+        page = self.sync(self.other_client, cursor=cursor)
+        self.assertEqual(
+            sorted(note["id"] for note in page["notes"]), [shared_id, deleted_id]
+        )
+        cursor = page["cursor"]
+
+        self.share(shared_id, "unshare_note")
+        Note.objects.filter(id=deleted_id).delete()
+        page = self.sync(self.other_client, cursor=cursor)
+        self.assertEqual(page["notes"], [])
+        self.assertEqual(
+            sorted(page["tombstones"], key=lambda tombstone: tombstone["id"]),
+            [
+                {"id": shared_id, "kind": "unshared"},
+                {"id": deleted_id, "kind": "deleted"},
+            ],
+        )
+
+        page = self.sync(cursor=cursor)
+        self.assertIn({"id": deleted_id, "kind": "deleted"}, page["tombstones"])
+
+    def test_incremental_sync_is_paged(self):
+        cursor = self.sync()["cursor"]
+        for i in range(3):
+            self.create_note(str(i))
+        page = self.sync(cursor=cursor, limit=2)
+        self.assertEqual(len(page["notes"]), 2)
+        self.assertTrue(page["has_more"])
+        page = self.sync(cursor=page["cursor"], limit=2)
+        self.assertEqual(len(page["notes"]), 1)
+        self.assertFalse(page["has_more"])
+
+    def test_deleting_a_user_deletes_their_notes(self):
+        note_id = self.create_note()
+        self.share(note_id)
+        cursor = self.sync(self.other_client)["cursor"]
+        self.user.delete()
+        page = self.sync(self.other_client, cursor=cursor)
+        self.assertEqual(page["tombstones"], [{"id": note_id, "kind": "deleted"}])
+
+    def test_invalid_parameters(self):
+        for params in ({"cursor": "x"}, {"after": "-1"}, {"limit": "0"}):
+            response = self.client.get(reverse("sync_notes"), params)
+            self.assertEqual(response.status_code, 400)
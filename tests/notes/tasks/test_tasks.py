@@ -0,0 +1,219 @@
+import os
+import shutil
+import signal
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from io import StringIO
+from pathlib import Path
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from notes.history import build_update, commit_version, get_version
+from notes.management.commands.run_tasks import Command as RunTasksCommand
+from notes.metrics import registry
+from notes.models import Job, Note
+from notes.tasks import get_backend, metrics, task
+
+AUTH_SAMPLE_DATA = {
+    "username": "johnwick",
+    "password": "aB@#2022",
+    "email": "abc@xyz.com",
+    "first_name": "John",
+    "last_name": "Wick",
+}
+
+calls = []
+
+
+@task(max_attempts=2, retry_delay=0)
+def record(value):
+    calls.append(value)
+
+
+@task(max_attempts=2, retry_delay=60)
+def fail():
+    raise ValueError("boom")
+
+
+@override_settings(NOTES_TASKS_BACKEND="notes.tasks.DatabaseBackend")
+class DatabaseBackendTestCase(TestCase):
+    def setUp(self):
+        calls.clear()
+        metrics.reset()
+        self.backend = get_backend()
+
+    def test_job_runs_and_is_deleted(self):
+        record.delay(1)
+        self.assertEqual(Job.objects.get().name, record.name)
+        self.assertEqual(self.backend.run_pending(), 1)
+        self.assertEqual(calls, [1])
+        self.assertFalse(Job.objects.exists())
+        self.assertEqual(metrics.snapshot()[record.name]["succeeded"], 1)
+
+    def test_counters_are_exported(self):
+        registry.reset()
+        record.delay(1)
+        fail.delay()
+        self.backend.run_pending()
+
+        lines = self.client.get("/metrics").content.decode().splitlines()
+        self.assertIn(
+            f'notes_tasks_total{{task="{record.name}",event="succeeded"}} 1', lines
+        )
+        self.assertIn(
+            f'notes_tasks_total{{task="{fail.name}",event="retried"}} 1', lines
+        )
+        self.assertIn('notes_tasks_queued{status="pending"} 1', lines)
+        self.assertIn('notes_tasks_queued{status="running"} 0', lines)
+        self.assertTrue(
+            any(
+                line.startswith(
+                    f'notes_task_duration_seconds_total{{task="{record.name}"}}'
+                )
+                for line in lines
+            )
+        )
+
+    def test_job_is_rolled_back_with_the_write(self):
+        with transaction.atomic():
+            record.delay(1)
+            transaction.set_rollback(True)
+        self.assertFalse(Job.objects.exists())
+
+    def test_failed_job_is_retried_then_given_up(self):
+        fail.delay()
+        with self.assertLogs("notes.tasks", "ERROR"):
+            self.assertEqual(self.backend.run_pending(), 1)
+        job = Job.objects.get()
+        self.assertEqual((job.status, job.attempts), (Job.PENDING, 1))
+        self.assertGreater(job.run_at, timezone.now())
+        # Not due before its backoff
+        self.assertEqual(self.backend.run_pending(), 0)
+
+        Job.objects.update(run_at=timezone.now())
+        with self.assertLogs("notes.tasks", "ERROR"):
+            self.assertEqual(self.backend.run_pending(), 1)
+        job = Job.objects.get()
+        self.assertEqual((job.status, job.attempts), (Job.FAILED, 2))
+        self.assertIn("boom", job.last_error)
+        counters = metrics.snapshot()[fail.name]
+        self.assertEqual((counters["retried"], counters["failed"]), (1, 1))
+
+    def test_unknown_task_fails(self):
+        Job.objects.create(name="notes.tasks.missing", run_at=timezone.now())
+        with self.assertLogs("notes.tasks", "ERROR"):
+            self.backend.run_pending()
+        self.assertEqual(Job.objects.get().status, Job.FAILED)
+
+    def test_abandoned_job_is_claimed_again(self):
+        locked_at = timezone.now() - timedelta(hours=1)
+        Job.objects.create(
+            name=record.name,
+            args=[2],
+            status=Job.RUNNING,
+            attempts=1,
+            run_at=locked_at,
+            locked_at=locked_at,
+        )
+        Job.objects.create(
+            name=record.name,
+            args=[3],
+            status=Job.RUNNING,
+            attempts=1,
+            run_at=timezone.now(),
+            locked_at=timezone.now(),
+        )
+        self.assertEqual(self.backend.run_pending(), 1)
+        self.assertEqual(calls, [2])
+
+    def test_claimed_job_is_not_claimed_twice(self):
+        record.delay(1)
+        self.assertEqual(len(self.backend.claim()), 1)
+        self.assertEqual(self.backend.claim(), [])
+
+    def test_run_tasks_command(self):
+        record.delay(1)
+        out = StringIO()
+        call_command("run_tasks", "--once", stdout=out)
+        self.assertEqual(calls, [1])
+        self.assertIn("1 succeeded", out.getvalue())
+        self.assertIn("0 pending", out.getvalue())
+
+    def test_supervisor_stops_workers(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+
+        class Command(RunTasksCommand):
+            def work(self, backend, options):
+                # Stands in for the job loop, without the test database
+                stopping = []
+                signal.signal(signal.SIGTERM, lambda *args: stopping.append(True))
+                deadline = time.monotonic() + 10
+                while not stopping and time.monotonic() < deadline:
+                    time.sleep(0.01)
+                if stopping:
+                    (Path(directory) / str(os.getpid())).touch()
+
+        # Stopping the supervisor must stop and wait for both workers
+        def handler(*args):
+            pass
+
+        self.addCleanup(signal.signal, signal.SIGTERM, signal.getsignal(signal.SIGTERM))
+        signal.signal(signal.SIGTERM, handler)
+        timer = threading.Timer(0.5, os.kill, (os.getpid(), signal.SIGTERM))
+        timer.start()
+        Command().handle(processes=2, batch=1, sleep=0, once=False)
+        timer.join()
+        self.assertEqual(len(os.listdir(directory)), 2)
+        self.assertEqual(signal.getsignal(signal.SIGTERM), handler)
+
+    @override_settings(
+        NOTES_HISTORY_DEFER_DELTA=True,
+        NOTES_HISTORY_DELTA=True,
+        NOTES_HISTORY_KEYFRAME_INTERVAL=3,
+    )
+    def test_deferred_history_delta(self):
+        user = User.objects.create_user(**AUTH_SAMPLE_DATA)
+        contents = [
+            "".join(
+                f"line {line} of {version}\n" if line == version else "line\n"
+                for line in range(20)
+            )
+            for version in range(5)
+        ]
+        note = Note.objects.create(
+            title="Title", content=contents[0], owner=user, version=1
+        )
+        build_update(note, 1, contents[0]).save()
+        for content in contents[1:]:
+            commit_version(note, content)
+        self.assertFalse(note.updates.filter(is_keyframe=False).exists())
+        # Version 4 is a keyframe anyway, so it has no job
+        self.assertEqual(Job.objects.count(), 3)
+
+        self.backend.run_pending()
+        keyframes = note.updates.filter(is_keyframe=True).values_list(
+            "version", flat=True
+        )
+        self.assertEqual(sorted(keyframes), [1, 4])
+        for version, content in enumerate(contents, start=1):
+            self.assertEqual(get_version(note, version)[1], content)
+
+
+class ThreadPoolBackendTestCase(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    @override_settings(NOTES_TASKS_BACKEND="notes.tasks.ThreadPoolBackend")
+    def test_task_runs_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            record.delay(1)
+            self.assertEqual(calls, [])
+        get_backend().join()
+        self.assertEqual(calls, [1])
@@ -73,6 +73,13 @@ class NoteTestCase(TestCase):
         response = self.client.get(reverse("get_or_update_note", args=[self.note.id]))
         self.assertEqual(response.status_code, 403)
 
+    def test_get_shared_note_is_owner_only(self):
+        new_user = User.objects.create_user(username="ethanhunt", password="aB@#2022")
+        self.note.shared_with.add(new_user)
+        self.client.force_login(new_user)
+        response = self.client.get(reverse("get_or_update_note", args=[self.note.id]))
+        self.assertEqual(response.status_code, 403)
+
     def test_share_note(self):
         self.client.force_login(self.user)
         ANOTHER_USER = {
@@ -91,6 +98,48 @@ class NoteTestCase(TestCase):
         self.assertEqual(response.status_code, 200)
         self.assertTrue(new_user in self.note.shared_with.all())
 
+    def test_share_note_many_users(self):
+        self.client.force_login(self.user)
+        users = [
+            User.objects.create_user(username=f"user{i}", password="aB@#2022")
+            for i in range(20)
+        ]
+        self.note.shared_with.add(users[0])
+        usernames = [user.username for user in users] + ["nobody"]
+        # session, user, note, users, existing shares, then in a savepoint:
+        # insert shares, insert change log
+        with self.assertNumQueries(9):
+            response = self.client.post(
+                reverse("share_note"),
+                {"note_id": self.note.id, "usernames": usernames},
+            )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()["added"]), 19)
+        self.assertEqual(response.json()["skipped"], ["user0"])
+        self.assertEqual(response.json()["unknown"], ["nobody"])
+        self.assertEqual(self.note.shared_with.count(), 20)
+
+    def test_share_note_unknown_user(self):
+        self.client.force_login(self.user)
+        response = self.client.post(
+            reverse("share_note"),
+            {"note_id": self.note.id, "usernames": ["nobody"]},
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_unshare_note(self):
+        self.client.force_login(self.user)
+        new_user = User.objects.create_user(username="ethanhunt", password="aB@#2022")
+        self.note.shared_with.add(new_user)
+        response = self.client.post(
+            reverse("unshare_note"),
+            {"note_id": self.note.id, "usernames": ["ethanhunt", "nobody"]},
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["removed"], ["ethanhunt"])
+        self.assertEqual(response.json()["unknown"], ["nobody"])
+        self.assertFalse(self.note.shared_with.exists())
+
     def test_share_note_with_self(self):
         self.client.force_login(self.user)
 
@@ -133,6 +182,24 @@ class NoteTestCase(TestCase):
         self.note.refresh_from_db()
         self.assertIn("This is an updated note.", self.note.content)
 
+    def test_update_note_version_conflict(self):
+        self.client.force_login(self.user)
+        response = self.client.put(
+            reverse("get_or_update_note", args=[self.note.id]),
+            {"content": "First edit.", "version": 0},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["version"], 1)
+        response = self.client.put(
+            reverse("get_or_update_note", args=[self.note.id]),
+            {"content": "Stale edit.", "version": 0},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, 409)
+        self.note.refresh_from_db()
+        self.assertEqual(self.note.content, "First edit.")
+
     def test_update_note_forbidden(self):
         ANOTHER_USER = {
             "username": "ethanhunt",
@@ -174,13 +241,56 @@ class NoteTestCase(TestCase):
         self.assertEqual(response.status_code, 200)
         response = self.client.get(reverse("get_note_history", args=[self.note.id]))
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(len(response.json()), 1)
+        self.assertEqual(len(response.json()["results"]), 1)
 
     def test_get_note_history_no_update(self):
         self.client.force_login(self.user)
         response = self.client.get(reverse("get_note_history", args=[self.note.id]))
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(len(response.json()), 0)
+        self.assertEqual(len(response.json()["results"]), 0)
+
+    def test_get_note_version(self):
+        self.client.force_login(self.user)
+        for content in ("First update.", "Second update."):
+            response = self.client.put(
+                reverse("get_or_update_note", args=[self.note.id]),
+                {"content": content},
+                content_type="application/json",
+            )
+            self.assertEqual(response.status_code, 200)
+        response = self.client.get(reverse("get_note_version", args=[self.note.id, 1]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["content"], "First update.")
+
+    def test_get_note_version_not_found(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("get_note_version", args=[self.note.id, 5]))
+        self.assertEqual(response.status_code, 404)
+
+    def test_get_note_history_pagination(self):
+        self.client.force_login(self.user)
+        for index in range(5):
+            self.client.put(
+                reverse("get_or_update_note", args=[self.note.id]),
+                {"content": f"Update {index}."},
+                content_type="application/json",
+            )
+        url = reverse("get_note_history", args=[self.note.id])
+        response = self.client.get(url, {"limit": 2})
+        self.assertEqual(
+            [row["content"] for row in response.json()["results"]],
+            ["Update 4.", "Update 3."],
+        )
+        response = self.client.get(
+            url, {"limit": 2, "cursor": response.json()["next_cursor"]}
+        )
+        self.assertEqual([row["version"] for row in response.json()["results"]], [3, 2])
+        response = self.client.get(url, {"fields": "meta"})
+        self.assertNotIn("content", response.json()["results"][0])
+        response = self.client.get(url, {"until": "2000-01-01T00:00:00"})
+        self.assertEqual(response.json()["results"], [])
+        response = self.client.get(url, {"since": "yesterday"})
+        self.assertEqual(response.status_code, 400)
 
     def test_get_note_history_forbidden(self):
         ANOTHER_USER = {
@@ -199,3 +309,131 @@ class NoteTestCase(TestCase):
             content_type="application/json",
         )
         self.assertEqual(response.status_code, 403)
+
+
+class NoteListTestCase(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(**AUTH_SAMPLE_DATA)
+        self.other = User.objects.create_user(
+            username="ethanhunt", password="aB@#2022", email="xyz@abc.com"
+        )
+        self.notes = [
+            Note.objects.create(title=f"Note {i}", content="content", owner=self.user)
+            for i in range(3)
+        ]
+        self.shared = Note.objects.create(
+            title="Shared", content="shared content", owner=self.other
+        )
+        self.shared.shared_with.add(self.user)
+        Note.objects.create(title="Private", content="private", owner=self.other)
+
+    def test_list_notes_owned_and_shared(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("list_notes"))
+        self.assertEqual(response.status_code, 200)
+        titles = [note["title"] for note in response.json()["results"]]
+        self.assertEqual(titles, ["Shared", "Note 2", "Note 1", "Note 0"])
+        self.assertNotIn("content", response.json()["results"][0])
+        self.assertIsNone(response.json()["next_cursor"])
+
+    def test_list_notes_pagination(self):
+        self.client.force_login(self.user)
+        seen = []
+        cursor = ""
+        while cursor is not None:
+            with self.assertNumQueries(3):  # session, user, page
+                response = self.client.get(
+                    reverse("list_notes"), {"limit": 3, "cursor": cursor}
+                )
+            self.assertEqual(response.status_code, 200)
+            seen += [note["id"] for note in response.json()["results"]]
+            cursor = response.json()["next_cursor"]
+        self.assertEqual(len(seen), 4)
+
+    def test_list_notes_full_content(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("list_notes"), {"fields": "full"})
+        self.assertEqual(response.json()["results"][0]["content"], "shared content")
+
+    def test_list_notes_invalid_params(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse("list_notes"), {"fields": "everything"})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(reverse("list_notes"), {"limit": "zero"})
+        self.assertEqual(response.status_code, 400)
+
+
+class NoteBulkTestCase(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(**AUTH_SAMPLE_DATA)
+        self.client.force_login(self.user)
+
+    def post(self, body):
+        return self.client.post(
+            reverse("bulk_notes"), body, content_type="application/json"
+        )
+
+    def test_bulk_create(self):
+        response = self.post(
+            {
+                "create": [
+                    {"title": "First", "content": "first content"},
+                    {"title": "", "content": "no title"},
+                    {"title": "Second", "content": "second content"},
+                ]
+            }
+        )
+        self.assertEqual(response.status_code, 200)
+        results = response.json()["results"]
+        self.assertEqual(results[1]["error"], "Invalid title")
+        note = Note.objects.get(id=results[2]["note_id"])
+        self.assertEqual(note.content, "second content")
+        self.assertEqual(note.updates.count(), 1)
+        self.assertEqual(Note.objects.count(), 2)
+
+    def test_bulk_update(self):
+        first = Note.objects.create(title="First", content="v0", owner=self.user)
+        second = Note.objects.create(title="Second", content="v0", owner=self.user)
+        response = self.post(
+            {
+                "update": [
+                    {"id": first.id, "content": "v1"},
+                    {"id": second.id, "content": "v1", "version": 3},
+                    {"id": 999, "content": "v1"},
+                ]
+            }
+        )
+        self.assertEqual(response.status_code, 200)
+        results = response.json()["results"]
+        self.assertEqual(results[0]["version"], 1)
+        self.assertEqual(results[1]["error"], "Note was modified by someone else")
+        self.assertEqual(results[2]["error"], "Note not found")
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual((first.content, second.content), ("v1", "v0"))
+
+    def test_bulk_update_duplicate_ids(self):
+        note = Note.objects.create(title="First", content="v0", owner=self.user)
+        response = self.post(
+            {
+                "update": [
+                    {"id": note.id, "content": ""},
+                    {"id": note.id, "content": "v1"},
+                    {"id": True, "content": "v1"},
+                ]
+            }
+        )
+        results = response.json()["results"]
+        self.assertEqual(results[0]["error"], "Invalid content")
+        self.assertEqual(results[1]["error"], "Duplicate id")
+        self.assertEqual(results[2]["error"], "Invalid id")
+        note.refresh_from_db()
+        self.assertEqual(note.content, "v0")
+
+    def test_bulk_invalid_body(self):
+        response = self.post({"create": [], "update": []})
+        self.assertEqual(response.status_code, 400)
+        response = self.post({"create": "not a list"})
+        self.assertEqual(response.status_code, 400)